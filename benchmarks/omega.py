@@ -0,0 +1,167 @@
+# coding=utf-8
+# Copyright (C) Alex Urban (2019)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with GW DetChar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks for the conditioning and scan pipeline of `gwdetchar.omega`
+
+Each benchmark runs on Gaussian noise with a sine-Gaussian injected at
+GPS time 0, over a matrix of sample rates and durations. The ``time_*``
+methods track wall time, and the ``peakmem_*`` methods track peak memory.
+"""
+
+import numpy
+from scipy import signal
+
+from gwpy.timeseries import TimeSeries
+
+from gwdetchar.omega import (config, core)
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+
+SAMPLE_RATES = (256, 1024, 4096, 16384)
+DURATIONS = (8, 32, 64)
+SETTINGS = {
+    'low-q': {
+        'q-range': '3.3166,35.0',
+        'frequency-range': '4.0,Inf',
+    },
+    'high-q': {
+        'q-range': '3.3166,150.0',
+        'frequency-range': '4.0,Inf',
+    },
+    'band-limited': {
+        'q-range': '4.0,64.0',
+        'frequency-range': '32.0,Inf',
+    },
+}
+
+FFTLENGTH = 4
+F_LOW = 8
+
+
+# -- utilities ----------------------------------------------------------------
+
+def simulate(rate, duration, seed=0):
+    """Simulate Gaussian noise with a sine-Gaussian injected at GPS time 0
+
+    Parameters
+    ----------
+    rate : `int`
+        sample rate (Hz) of the simulated data
+
+    duration : `float`
+        duration (seconds) of the simulated data, centred on GPS time 0
+
+    seed : `int`, optional
+        seed for the random number generator, default: 0
+
+    Returns
+    -------
+    data : `~gwpy.timeseries.TimeSeries`
+        the simulated data
+    """
+    rng = numpy.random.RandomState(seed)
+    noise = TimeSeries(rng.normal(size=int(rate * duration)),
+                       sample_rate=rate, epoch=-duration/2.)
+    glitch = TimeSeries(
+        signal.gausspulse(numpy.arange(-1, 1, 1./rate), fc=rate/8., bw=.5),
+        sample_rate=rate, epoch=-1) * 10
+    return noise.inject(glitch)
+
+
+def omega_channel(setting):
+    """Return an `OmegaChannel` with the given named Q-transform settings
+    """
+    return config.OmegaChannel(
+        channelname='X1:BENCHMARK-{}'.format(setting.upper()),
+        section='benchmark', **dict(
+            SETTINGS[setting], **{'plot-time-durations': '1,4',
+                                  'always-plot': 'True'}))
+
+
+# -- benchmarks ---------------------------------------------------------------
+
+class Conditioning(object):
+    """Benchmarks for `highpass`, `whiten`, and `conditioner`
+    """
+    params = (SAMPLE_RATES, DURATIONS)
+    param_names = ('rate', 'duration')
+
+    def setup(self, rate, duration):
+        self.data = simulate(rate, duration)
+
+    def time_highpass(self, rate, duration):
+        core.highpass(self.data, F_LOW)
+
+    def time_whiten(self, rate, duration):
+        core.whiten(self.data, FFTLENGTH)
+
+    def time_conditioner(self, rate, duration):
+        core.conditioner(self.data, FFTLENGTH, f_low=F_LOW)
+
+    def peakmem_conditioner(self, rate, duration):
+        core.conditioner(self.data, FFTLENGTH, f_low=F_LOW)
+
+
+class Scan(object):
+    """Benchmarks for `scan`
+
+    Q-plane tilings are cached between repeats, as they are between
+    channels (and, in `gwdetchar-omega-service` with ``--nproc 1``,
+    between scans) in production.
+    """
+    params = (SAMPLE_RATES, DURATIONS, sorted(SETTINGS))
+    param_names = ('rate', 'duration', 'setting')
+    timeout = 300
+
+    def setup(self, rate, duration, setting):
+        self.channel = omega_channel(setting)
+        self.conditioned = core.conditioner(
+            simulate(rate, duration), FFTLENGTH, f_low=F_LOW)
+
+    def time_scan(self, rate, duration, setting):
+        core.scan(0, self.channel, self.conditioned, FFTLENGTH)
+
+    def peakmem_scan(self, rate, duration, setting):
+        core.scan(0, self.channel, self.conditioned, FFTLENGTH)
+
+    def peakmem_scan_lowmem(self, rate, duration, setting):
+        core.scan(0, self.channel, self.conditioned, FFTLENGTH, lowmem=True)
+
+
+class CrossCorrelate(object):
+    """Benchmarks for `cross_correlate`, with and without a re-usable
+    `MatchedFilter`
+    """
+    params = (SAMPLE_RATES, DURATIONS)
+    param_names = ('rate', 'duration')
+
+    def setup(self, rate, duration):
+        data = simulate(rate, duration)
+        self.hoft = core.primary(0, 2, simulate(rate, duration, seed=1),
+                                 FFTLENGTH, f_low=F_LOW)
+        self.matched = core.MatchedFilter(self.hoft)
+        self.xoft = core.conditioner(data, FFTLENGTH, f_low=F_LOW)[0]
+
+    def time_cross_correlate(self, rate, duration):
+        core.cross_correlate(self.xoft, self.hoft)
+
+    def time_cross_correlate_matched_filter(self, rate, duration):
+        core.cross_correlate(self.xoft, self.matched)
+
+    def peakmem_cross_correlate(self, rate, duration):
+        core.cross_correlate(self.xoft, self.hoft)
@@ -28,16 +28,14 @@ import numpy
 from gwdatafind import find_urls
 
 from gwpy.time import to_gps
-from gwpy.io.gwf import get_channel_names
 from gwpy.timeseries import StateTimeSeries
 
 from . import const
+from .io.toc import get_channel_index
 from .utils import natural_sort
 
 __author__ = 'Duncan Macleod <duncan.macleod@ligo.org>'
 
-_CHANNELS = {}
-
 
 def find_overflows(timeseries, cumulative=True):
     """Find the times of overflows from an overflow counter
@@ -205,11 +203,8 @@ def _ligo_model_overflow_channels_gwf(dcuid, ifo, frametype, gpstime):
         e.args = ('No %s-%s frames found at GPS %d'
                   % (ifo[0], frametype, gpstime),)
         raise
-    try:
-        return _CHANNELS[framefile]
-    except KeyError:
-        _CHANNELS[framefile] = get_channel_names(framefile)
-        return _CHANNELS[framefile]
+    return get_channel_index(framefile).startswith(
+        '{}:FEC-{}_'.format(ifo, dcuid))
 
 
 def find_crossings(timeseries, threshold):
@@ -0,0 +1,255 @@
+# coding=utf-8
+# Copyright (C) Alex Urban (2019)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with GW DetChar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Local read-through cache of data decoded from archived frame files
+
+Data are cached on disk in chunks of `CHUNK` seconds, aligned to multiples
+of `CHUNK` in GPS time, one compressed HDF5 file per channel, frametype,
+and chunk. Repeated analyses of the same times then read only the chunks
+not already cached, and the least recently used chunks are removed once
+the cache grows beyond a maximum size.
+
+The cache is used by `~gwdetchar.io.datafind.get_data` if the
+``GWDETCHAR_DATA_CACHE`` environment variable gives a directory, with a
+maximum size (in GiB) given by ``GWDETCHAR_DATA_CACHE_SIZE``, default: 20.
+"""
+
+import math
+import os
+import tempfile
+
+import h5py
+import numpy
+
+from gwpy.segments import (Segment, SegmentList)
+from gwpy.timeseries import (TimeSeries, TimeSeriesDict)
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+
+# duration (seconds) of each cached chunk
+CHUNK = 64
+
+DEFAULT_CACHE = os.getenv('GWDETCHAR_DATA_CACHE') or None
+DEFAULT_SIZE = float(os.getenv('GWDETCHAR_DATA_CACHE_SIZE', 20)) * 2**30
+
+
+# -- utilities ----------------------------------------------------------------
+
+def chunk_path(cache, channel, frametype, start):
+    """Return the path of a cached chunk of data
+
+    Parameters
+    ----------
+    cache : `str`
+        path to the directory holding cached data
+
+    channel : `str`
+        name of the channel
+
+    frametype : `str`
+        name of the frametype from which data were read
+
+    start : `int`
+        GPS start time of the chunk
+
+    Returns
+    -------
+    path : `str`
+        the path of this chunk, which may not exist
+    """
+    return os.path.join(cache, frametype, channel.replace(':', '-'),
+                        '{}-{}.h5'.format(int(start), CHUNK))
+
+
+def _chunks(start, end):
+    """List the GPS start times of all chunks overlapping ``[start, end)``
+    """
+    first = int(math.floor(start / CHUNK)) * CHUNK
+    return list(range(first, int(math.ceil(end / CHUNK)) * CHUNK, CHUNK))
+
+
+def _read_chunk(path):
+    """Read a chunk of data, or return `None` if it cannot be read
+    """
+    try:
+        with h5py.File(path, 'r') as h5f:
+            dset = h5f['data']
+            series = TimeSeries(
+                dset[()], t0=dset.attrs['t0'],
+                sample_rate=dset.attrs['sample_rate'],
+                unit=dset.attrs['unit'] or None,
+                name=dset.attrs['name'], channel=dset.attrs['name'])
+    except (IOError, OSError, KeyError):  # missing or incomplete
+        return None
+    os.utime(path, None)  # mark as recently used
+    return series
+
+
+def _write_chunk(path, series):
+    """Write a chunk of data, if it is sampled exactly within its chunk
+    """
+    nsamp = CHUNK * series.sample_rate.to('Hz').value
+    if nsamp % 1 or series.size != nsamp:  # cannot be stored exactly
+        return
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    # write then move, so that a partial file is never read, using a
+    # unique temporary file since the cache may be shared by many jobs
+    (fd, tmp) = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    with h5py.File(tmp, 'w') as h5f:
+        dset = h5f.create_dataset('data', data=series.value,
+                                  compression='gzip', compression_opts=1,
+                                  shuffle=True)
+        dset.attrs['t0'] = series.t0.value
+        dset.attrs['sample_rate'] = series.sample_rate.to('Hz').value
+        dset.attrs['unit'] = str(series.unit or '')
+        dset.attrs['name'] = str(series.name)
+    os.rename(tmp, path)
+
+
+def evict(cache, max_size=DEFAULT_SIZE):
+    """Remove the least recently used chunks from a cache
+
+    Parameters
+    ----------
+    cache : `str`
+        path to the directory holding cached data
+
+    max_size : `float`, optional
+        maximum total size (bytes) of cached chunks, default: `DEFAULT_SIZE`
+
+    Returns
+    -------
+    removed : `list` of `str`
+        the paths of all chunks removed
+    """
+    chunks = []
+    for (root, _, files) in os.walk(cache):
+        for name in files:
+            if name.endswith('.h5'):
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:  # removed by another process
+                    continue
+                chunks.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for (_, size, _) in chunks)
+    removed = []
+    for (_, size, path) in sorted(chunks):
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:  # removed by another process
+            pass
+        total -= size
+        removed.append(path)
+    return removed
+
+
+# -- data retrieval -----------------------------------------------------------
+
+def read(channels, start, end, frametype, reader, cache=DEFAULT_CACHE,
+         max_size=DEFAULT_SIZE):
+    """Read data for many channels through an on-disk cache
+
+    Parameters
+    ----------
+    channels : `list` of `str`
+        the names of the channels to read
+
+    start : `float`
+        GPS start time of requested data
+
+    end : `float`
+        GPS end time of requested data
+
+    frametype : `str`
+        name of the frametype from which data are read
+
+    reader : `callable`
+        function to read uncached data, with signature
+        ``reader(channels, start, end)``, returning a
+        `~gwpy.timeseries.TimeSeriesDict`
+
+    cache : `str`, optional
+        path to the directory holding cached data, default: `DEFAULT_CACHE`
+
+    max_size : `float`, optional
+        maximum total size (bytes) of cached chunks, default: `DEFAULT_SIZE`
+
+    Returns
+    -------
+    data : `~gwpy.timeseries.TimeSeriesDict`
+        collection of data for the requested channels in the requested time
+        range
+
+    Notes
+    -----
+    Uncached chunks are read by `reader` over the smallest set of
+    contiguous spans covering them. If any such span cannot be read in
+    full (e.g. at the end of the archive), then the whole request is read
+    by `reader` without the cache.
+
+    Channels whose sample rate does not fit an integer number of samples
+    in a chunk (e.g. minute trends) are never cached.
+    """
+    chunks = _chunks(start, end)
+    paths = {(name, t): chunk_path(cache, name, frametype, t)
+             for name in channels for t in chunks}
+    missing = SegmentList(
+        Segment(t, t + CHUNK) for ((_, t), path) in paths.items()
+        if not os.path.isfile(path)).coalesce()
+
+    # read missing chunks for channels missing any of them
+    fresh = {}
+    for seg in missing:
+        names = [name for name in channels if any(
+            not os.path.isfile(paths[(name, t)]) for t in chunks
+            if seg[0] <= t < seg[1])]
+        try:
+            data = reader(names, seg[0], seg[1])
+        except (IOError, RuntimeError, ValueError):  # cannot read all chunks
+            return reader(channels, start, end)
+        for (name, series) in data.items():
+            for t in range(int(seg[0]), int(seg[1]), CHUNK):
+                fresh[(name, t)] = chunk = series.crop(t, t + CHUNK)
+                if not os.path.isfile(paths[(name, t)]):
+                    _write_chunk(paths[(name, t)], chunk)
+    if missing:
+        evict(cache, max_size=max_size)
+
+    # assemble each channel from its chunks
+    out = TimeSeriesDict()
+    for name in channels:
+        pieces = [fresh[(name, t)] if (name, t) in fresh
+                  else _read_chunk(paths[(name, t)]) for t in chunks]
+        if any(piece is None for piece in pieces):  # not available
+            continue
+        series = TimeSeries(
+            numpy.concatenate([p.value for p in pieces]),
+            t0=pieces[0].t0, sample_rate=pieces[0].sample_rate,
+            unit=pieces[0].unit, name=name, channel=name)
+        out[name] = series.crop(start, end, copy=True)
+    missed = [name for name in channels if name not in out]
+    if missed:  # read whatever could not be assembled from the cache
+        out.update(reader(missed, start, end))
+    return TimeSeriesDict((name, out[name]) for name in channels
+                          if name in out)
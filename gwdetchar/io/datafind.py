@@ -19,26 +19,44 @@
 """Data discovery utilities
 """
 
+import math
 import re
 import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from urllib.error import HTTPError
 from json.decoder import JSONDecodeError
 
+import numpy
+
 import gwdatafind
 
-from ..const import DEFAULT_SEGMENT_SERVER
+from . import (datacache, nds)
+from .segments import query_flag
+from .toc import get_channel_index
+from ..utils import lru_cached
 
-from gwpy.io import gwf as io_gwf
-from gwpy.segments import (Segment, DataQualityFlag)
+from gwpy.io.cache import (cache_segments, sieve as sieve_cache)
+from gwpy.segments import (Segment, SegmentList)
 from gwpy.timeseries import (TimeSeries, TimeSeriesDict)
 
 __author__ = 'Duncan Macleod <duncan.macleod@ligo.org>'
 __credits__ = 'Alex Urban <alexander.urban@ligo.org>'
 
+# duration (seconds) of each chunk of frame data decimated on read
+DECIMATE_STRIDE = 64
+
+# maximum number of frame file queries to hold in memory at any one time
+URL_CACHE_SIZE = 64
+
+# frame file URLs already found by this process, keyed by query
+_URLS = OrderedDict()
+
 
 # -- utilities ----------------------------------------------------------------
 
-def check_flag(flag, gpstime, duration, pad):
+def check_flag(flag, gpstime, duration, pad, cache=None):
     """Check that a state flag is active during an entire analysis segment
 
     Parameters
@@ -55,6 +73,11 @@ def check_flag(flag, gpstime, duration, pad):
     pad : `float`
         amount of extra data to read in at the start and end for filtering
 
+    cache : `str`, optional
+        path to a directory in which to cache segments, see
+        `~gwdetchar.io.segments.query_flag`, default: query the segment
+        database directly
+
     Returns
     -------
     check : `bool`
@@ -66,14 +89,54 @@ def check_flag(flag, gpstime, duration, pad):
     end = gpstime + duration/2. + pad
     seg = Segment(start, end)
     # query for state segments
-    active = DataQualityFlag.query(flag, start, end,
-                                   url=DEFAULT_SEGMENT_SERVER).active
+    active = query_flag(flag, start, end, cache=cache).active
     # check that state flag is active during the entire analysis
     if (not active.intersects_segment(seg)) or (abs(active[0]) < abs(seg)):
         return False
     return True
 
 
+def find_urls(obs, frametype, start, end):
+    """Find the URLs of frame files, re-using an earlier query if possible
+
+    Parameters
+    ----------
+    obs : `str`
+        single-character observatory ID, e.g. `'L'`
+
+    frametype : `str`
+        the frametype to find
+
+    start : `float`
+        GPS start time of the query
+
+    end : `float`
+        GPS end time of the query
+
+    Returns
+    -------
+    urls : `list` of `str`
+        the URLs of frame files found by `gwdatafind.find_urls`
+
+    Notes
+    -----
+    Only queries whose files cover all of ``[start, end)`` are held in
+    memory (at most `URL_CACHE_SIZE` of them), so that frame files not yet
+    available (e.g. for very recent data) are looked for again next time.
+    """
+    key = (obs, frametype, float(start), float(end))
+    if key in _URLS:
+        return lru_cached(_URLS, URL_CACHE_SIZE, key, None)
+    urls = gwdatafind.find_urls(obs, frametype, start, end)
+    try:
+        missing = SegmentList([Segment(start, end)]) - cache_segments(urls)
+    except ValueError:  # cannot parse file names
+        return urls
+    if not abs(missing):
+        lru_cached(_URLS, URL_CACHE_SIZE, key, lambda: urls)
+    return urls
+
+
 def remove_missing_channels(channels, gwfcache):
     """Find and remove channels from a given list that are not available in
     a given cache of frame files
@@ -103,16 +166,16 @@ def remove_missing_channels(channels, gwfcache):
 
     See Also
     --------
-    gwpy.io.gwf.iter_channel_names
+    gwdetchar.io.toc.get_channel_index
         for the utility used to identify frame contents
     """
     # get available channels from the first and last frame file
-    available = set(io_gwf.iter_channel_names(gwfcache[0]))
+    indices = [get_channel_index(gwfcache[0])]
     if len(gwfcache) > 1:
-        available.intersection_update(io_gwf.iter_channel_names(gwfcache[-1]))
+        indices.append(get_channel_index(gwfcache[-1]))
     # work out which channels to keep, and which to reject
     channels = set(channels)
-    keep = channels & available
+    keep = set(c for c in channels if all(c in idx for idx in indices))
     reject = channels - keep
     for channel in reject:
         warnings.warn(
@@ -121,8 +184,48 @@ def remove_missing_channels(channels, gwfcache):
     return list(keep)
 
 
+def stride_segments(segments, stride, overlap=0):
+    """Split segments into consecutive strides of a fixed duration
+
+    Parameters
+    ----------
+    segments : `~gwpy.segments.SegmentList`
+        the segments to split
+
+    stride : `float`
+        duration (seconds) of each stride
+
+    overlap : `float`, optional
+        duration (seconds) by which consecutive strides overlap, default: 0
+
+    Returns
+    -------
+    strides : `~gwpy.segments.SegmentList`
+        the strides covering `segments`, the last of each segment being
+        shortened to end with that segment
+
+    Raises
+    ------
+    ValueError
+        if `overlap` is not shorter than `stride`
+    """
+    if not 0 <= overlap < stride:
+        raise ValueError('overlap ({}) must be non-negative and shorter than '
+                         'stride ({})'.format(overlap, stride))
+    out = SegmentList()
+    for seg in SegmentList(segments).coalesce():
+        t = seg[0]
+        while True:
+            out.append(Segment(t, min(t + stride, seg[1])))
+            t += stride - overlap
+            if t + overlap >= seg[1]:
+                break
+    return out
+
+
 def get_data(channel, start, end, frametype=None, source=None,
-             nproc=1, verbose=False, **kwargs):
+             nproc=1, verbose=False, resample=None,
+             data_cache=datacache.DEFAULT_CACHE, **kwargs):
     """Retrieve data for given channels within a certain time range
 
     Parameters
@@ -144,11 +247,21 @@ def get_data(channel, start, end, frametype=None, source=None,
         default: `None`
 
     nproc : `int`, optional
-        number of parallel processes to use, uses serial process by default
+        number of parallel processes to use for reading frame files, or of
+        connections to use over NDS, uses serial process by default
 
     verbose : `bool`, optional
         print verbose output about NDS progress, default: False
 
+    resample : `float`, optional
+        target sample rate (Hz) of the returned data, default: `None`,
+        to return data at their native sample rate
+
+    data_cache : `str`, optional
+        path to a directory in which to cache data read by `frametype`,
+        or `None` to disable the cache, default:
+        `gwdetchar.io.datacache.DEFAULT_CACHE`
+
     **kwargs : `dict`, optional
         additional keyword arguments to `~gwpy.timeseries.TimeSeries.read`
         or `~gwpy.timeseries.TimeSeries.get`
@@ -173,12 +286,35 @@ def get_data(channel, start, end, frametype=None, source=None,
     from the first or last frame file in the requested time range will be
     ignored.
 
+    Lists of channels are fetched over NDS by `~gwdetchar.io.nds.fetch`,
+    in groups over `nproc` concurrent connections, trying each server in
+    turn, and channels that cannot be fetched are skipped with a
+    `UserWarning` (a `RuntimeError` is raised if none can be fetched).
+
+    Data read from archived frame files by `frametype` are cached in chunks
+    under `data_cache`, if given, so that repeated requests read only the
+    chunks not already cached, at their native sample rate (before any
+    `resample`). Requests using `source` or any additional keyword
+    arguments are never cached.
+
+    If `resample` is given, data read from a list of frame files are
+    decimated on read, in chunks of `DECIMATE_STRIDE` seconds (overlapping
+    to avoid filter transients at their boundaries), so that data at their
+    native sample rate are never held in memory for the whole span. As
+    when reading at the native rate, times not covered by the frame files
+    are filled with the ``pad`` keyword argument, if given, otherwise a
+    `ValueError` is raised.
+
     See Also
     --------
     remove_missing_channels
         a utility that removes channels missing from the frame archive
+    gwdetchar.io.datacache.read
+        the underlying method to read data through a local cache
+    gwdetchar.io.nds.fetch
+        the underlying method to read lists of channels over an NDS server
     gwpy.timeseries.TimeSeries.get
-        the underlying method to read data over an NDS server
+        the underlying method to read a single channel over an NDS server
     gwpy.timeseries.TimeSeries.read
         the underlying method to read data from local files
     """
@@ -188,11 +324,25 @@ def get_data(channel, start, end, frametype=None, source=None,
     else:
         series_class = TimeSeries
 
+    if (data_cache is not None and frametype is not None and
+            source is None and not kwargs):  # read through the cache
+        if resample is not None:  # cache data at their native rate
+            return _read_decimated(
+                channel, start, end, resample, frametype=frametype,
+                nproc=nproc, verbose=verbose, data_cache=data_cache)
+        data = datacache.read(
+            list(channel) if series_class is TimeSeriesDict else [channel],
+            start, end, frametype, partial(
+                get_data, frametype=frametype, nproc=nproc,
+                verbose=verbose, data_cache=None),
+            cache=data_cache)
+        return data if series_class is TimeSeriesDict else data[channel]
+
     if frametype is not None:
         try:  # locate frame files
             ifo = re.search('[A-Z]1', frametype).group(0)
             obs = ifo[0]
-            source = gwdatafind.find_urls(obs, frametype, start, end)
+            source = find_urls(obs, frametype, start, end)
         except AttributeError:
             raise AttributeError(
                 'Could not determine observatory from frametype')
@@ -200,19 +350,193 @@ def get_data(channel, start, end, frametype=None, source=None,
             pass
     if isinstance(source, list) and isinstance(channel, (list, tuple)):
         channel = remove_missing_channels(channel, source)
+    if isinstance(source, list) and resample is not None:  # decimate
+        return _read_decimated(channel, start, end, resample, source,
+                               nproc=nproc, verbose=verbose, **kwargs)
     if source is not None:  # read from frame files
-        return series_class.read(
+        data = series_class.read(
             source, channel, start=start, end=end, nproc=nproc,
             verbose=verbose, **kwargs)
-
-    # read single channel from NDS
-    if not isinstance(channel, (list, tuple)):
-        return series_class.get(
+    elif not isinstance(channel, (list, tuple)):
+        # read single channel from NDS
+        data = series_class.get(
             channel, start, end, verbose=verbose, **kwargs)
+    else:
+        # if all else fails, fetch channels in groups over NDS
+        data = nds.fetch(channel, start, end, nconn=nproc, verbose=verbose,
+                         **kwargs)
+    if resample is None:
+        return data
+    return data.resample(resample)
+
+
+def _read_decimated(channel, start, end, rate, source=None, pad=None,
+                    **kwargs):
+    """Read data from frame files, decimating them one chunk at a time
+
+    Each chunk of `DECIMATE_STRIDE` seconds is read with enough padding
+    either side to absorb the transients of the anti-aliasing filter,
+    which is cropped after resampling to `rate` wherever the chunk meets
+    its neighbour. As for `~gwpy.timeseries.TimeSeries.read`, times not
+    covered by `source` are filled with `pad` if given, otherwise a
+    `ValueError` is raised.
+    """
+    span = Segment(start, end)
+    known = SegmentList([span])
+    if isinstance(source, list):
+        known &= cache_segments(source)
+    if pad is None and abs(known) < abs(span):
+        raise ValueError(
+            'Data files cover only {} of requested interval {}, use pad= to '
+            'fill missing data'.format(list(map(tuple, known)), tuple(span)))
+    edge = max(1, int(math.ceil(32. / rate)))  # 32 output samples
+    strides = stride_segments(known, DECIMATE_STRIDE, overlap=2 * edge)
+    nedge = int(edge * rate)
+    out = None
+    for (i, data) in enumerate(iter_data(
+            channel, start, end, DECIMATE_STRIDE, overlap=2 * edge,
+            segments=known, source=source, **kwargs)):
+        seg = strides[i]
+        left = nedge if i and strides[i - 1][1] > seg[0] else 0
+        right = nedge if (i < len(strides) - 1 and
+                          strides[i + 1][0] < seg[1]) else 0
+        if isinstance(data, TimeSeries):
+            piece = _crop_samples(data.resample(rate), left, right)
+        else:
+            piece = TimeSeriesDict(
+                (key, _crop_samples(series.resample(rate), left, right))
+                for (key, series) in data.items())
+        if out is None:
+            out = piece.copy()
+        else:  # gaps can only remain if they are to be padded
+            out.append(piece, gap='pad', pad=pad)
+    if not isinstance(channel, (list, tuple)):
+        return _pad_span(out, channel, start, end, rate, pad)
+    if out is None:  # nothing to read
+        out = dict.fromkeys(channel)
+    return TimeSeriesDict(
+        (name, _pad_span(series, name, start, end, rate, pad))
+        for (name, series) in out.items())
+
 
-    # if all else fails, process channels in groups of 60
-    data = series_class()
-    for group in [channel[i:i + 60] for i in range(0, len(channel), 60)]:
-        data.append(series_class.get(
-            group, start, end, verbose=verbose, **kwargs))
-    return data
+def _pad_span(series, name, start, end, rate, pad):
+    """Pad a `TimeSeries` with a constant to span ``[start, end)``
+
+    If `series` is `None`, one containing only `pad` is returned.
+    """
+    if series is None:
+        return TimeSeries(numpy.full(int(round((end - start) * rate)), pad),
+                          t0=start, sample_rate=rate, name=name,
+                          channel=name)
+    (before, after) = (int(round((series.span[0] - start) * rate)),
+                       int(round((end - series.span[1]) * rate)))
+    if before or after:
+        series = series.pad((before, after), mode='constant',
+                            constant_values=pad)
+    return series
+
+
+def _crop_samples(series, left, right):
+    """Remove a number of samples from either end of a `TimeSeries`
+    """
+    return series[left:series.size - right]
+
+
+def iter_data(channel, start, end, stride, overlap=0, segments=None,
+              frametype=None, source=None, nproc=1, verbose=False,
+              prefetch=True, **kwargs):
+    """Iterate over data for given channels in strides of fixed duration
+
+    Parameters
+    ----------
+    channel : `str` or `list`
+        either a single channel name, or a list of channel names
+
+    start : `float`
+        GPS start time of requested data
+
+    end : `float`
+        GPS end time of requested data
+
+    stride : `float`
+        duration (seconds) of each chunk of data
+
+    overlap : `float`, optional
+        duration (seconds) by which consecutive chunks overlap, default: 0
+
+    segments : `~gwpy.segments.SegmentList`, optional
+        restrict data to these segments, no chunk spans more than one,
+        default: all of ``[start, end)``
+
+    frametype : `str`, optional
+        name of frametype in which channel(s) are stored, default: `None`
+
+    source : `list`, optional
+        paths of individual data files, no chunk spans times without them,
+        default: `None`
+
+    nproc : `int`, optional
+        number of parallel processes to use for reading frame files, or of
+        connections to use over NDS, uses serial process by default
+
+    verbose : `bool`, optional
+        print verbose output about NDS progress, default: False
+
+    prefetch : `bool`, optional
+        read each chunk of data while the previous one is processed, with
+        a single process (see Notes), default: `True`
+
+    **kwargs : `dict`, optional
+        additional keyword arguments to `get_data`
+
+    Yields
+    ------
+    data : `~gwpy.timeseries.TimeSeries` or `~gwpy.timeseries.TimeSeriesDict`
+        collection of data for the requested channels in each chunk, in
+        time order
+
+    Notes
+    -----
+    Chunks are read by `get_data` over the strides given by
+    `stride_segments`, so only the current chunk (and, with `prefetch`, the
+    next one) is held in memory, however long the requested span. Every
+    channel in a chunk covers the same span.
+
+    With `prefetch`, chunks are read in a background thread, and always
+    with ``nproc=1``: reading with several processes would fork them from
+    that thread while another thread may hold a lock, which can deadlock.
+
+    See Also
+    --------
+    get_data
+        the underlying method to read each chunk of data
+    stride_segments
+        the utility used to split requested data into chunks
+    """
+    spans = SegmentList([Segment(start, end)])
+    if segments is not None:
+        spans &= SegmentList(segments)
+    if isinstance(source, list):
+        spans &= cache_segments(source)
+    strides = stride_segments(spans, stride, overlap=overlap)
+
+    def _read(seg, nproc=nproc):
+        chunk = source
+        if isinstance(source, list):
+            chunk = sieve_cache(source, segment=seg)
+        return get_data(channel, seg[0], seg[1], frametype=frametype,
+                        source=chunk, nproc=nproc, verbose=verbose,
+                        **kwargs)
+
+    if not prefetch:
+        for seg in strides:
+            yield _read(seg)
+        return
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = None
+        for seg in strides:
+            previous, future = future, executor.submit(_read, seg, nproc=1)
+            if previous is not None:
+                yield previous.result()
+        if future is not None:
+            yield future.result()
@@ -0,0 +1,339 @@
+# coding=utf-8
+# Copyright (C) Alex Urban (2019)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with GW DetChar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Concurrent retrieval of data over NDS2
+
+Channels are fetched in groups, several at once, over a bounded pool of
+connections that persists between calls, so that requests for thousands
+of channels (e.g. minute trends for lasso or slow-correlation runs) need
+not be fetched one group at a time over a new connection each.
+"""
+
+import queue
+import threading
+import warnings
+
+from collections import deque
+from concurrent.futures import (FIRST_COMPLETED, ThreadPoolExecutor, wait)
+from contextlib import contextmanager
+
+from gwpy.detector import Channel
+from gwpy.io import nds2 as io_nds2
+from gwpy.timeseries import TimeSeriesDict
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+
+# default number of channels per request
+GROUP_SIZE = 60
+
+# connection pools, keyed by (host, port)
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+# -- connection pool ----------------------------------------------------------
+
+class ConnectionPool(object):
+    """A bounded pool of NDS2 connections to a single server
+
+    Parameters
+    ----------
+    host : `str`
+        the name of the NDS2 server
+
+    port : `int`, optional
+        the port of the NDS2 server, default: chosen by `nds2`
+
+    size : `int`, optional
+        the maximum number of connections open at once, default: 4
+
+    Notes
+    -----
+    Connections are opened only when needed, and idle connections are
+    re-used. A connection in use when an error is raised is discarded,
+    rather than returned to the pool, since it may no longer be usable.
+    """
+    def __init__(self, host, port=None, size=4):
+        self.host = host
+        self.port = port
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def resize(self, size):
+        """Change the maximum number of connections open at once
+
+        Connections already borrowed from this pool are not counted against
+        the new limit.
+        """
+        if size != self.size:
+            self.size = size
+            self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self):
+        """Context manager to borrow a connection from this pool
+
+        Blocks until fewer than `size` connections are in use.
+        """
+        slots = self._slots
+        slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                try:
+                    conn = io_nds2.connect(self.host, self.port)
+                except Exception as exc:  # server unavailable
+                    raise ConnectionFailed(self.host, self.port, exc)
+            try:
+                yield conn
+            except Exception:  # discard this connection
+                _close(conn)
+                raise
+            self._idle.put(conn)
+        finally:
+            slots.release()
+
+    def close(self):
+        """Close all idle connections
+        """
+        while True:
+            try:
+                _close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+class ConnectionFailed(RuntimeError):
+    """Error raised when a connection to an NDS2 server cannot be opened
+    """
+    def __init__(self, host, port, error):
+        super(ConnectionFailed, self).__init__(
+            'Cannot connect to {}:{}: [{}] {}'.format(
+                host, port, type(error).__name__, error))
+        self.host = host
+        self.port = port
+
+
+def _close(conn):
+    """Close an NDS2 connection, ignoring any error
+    """
+    try:
+        conn.close()
+    except Exception:  # already closed or broken
+        pass
+
+
+def get_pool(host, port=None, size=4):
+    """Return the shared connection pool for an NDS2 server
+
+    Parameters
+    ----------
+    host : `str`
+        the name of the NDS2 server
+
+    port : `int`, optional
+        the port of the NDS2 server, default: chosen by `nds2`
+
+    size : `int`, optional
+        the maximum number of connections open at once, default: 4
+
+    Returns
+    -------
+    pool : `ConnectionPool`
+        the pool for this server, created if it does not already exist
+    """
+    with _POOLS_LOCK:
+        try:
+            pool = _POOLS[(host, port)]
+        except KeyError:
+            pool = _POOLS[(host, port)] = ConnectionPool(
+                host, port=port, size=size)
+        pool.resize(size)
+        return pool
+
+
+# -- data retrieval -----------------------------------------------------------
+
+def _fetch_group(pool, group, start, end, **kwargs):
+    """Fetch one group of channels over a connection from `pool`
+    """
+    with pool.connection() as conn:
+        return TimeSeriesDict.fetch(group, start, end, connection=conn,
+                                    **kwargs)
+
+
+def fetch(channels, start, end, host=None, port=None, nconn=4,
+          group_size=GROUP_SIZE, max_group_size=None, retries=1,
+          verbose=False, **kwargs):
+    """Fetch data for many channels over NDS2, several groups at once
+
+    Parameters
+    ----------
+    channels : `list` of `str`
+        the names of the channels to fetch
+
+    start : `float`
+        GPS start time of requested data
+
+    end : `float`
+        GPS end time of requested data
+
+    host : `str`, optional
+        the name of the NDS2 server, default: each server returned by
+        `gwpy.io.nds2.host_resolution_order` for the first channel, in
+        turn
+
+    port : `int`, optional
+        the port of the NDS2 server, default: chosen by `nds2`
+
+    nconn : `int`, optional
+        the maximum number of connections (and groups fetched) at once,
+        default: 4
+
+    group_size : `int`, optional
+        the number of channels in the first group, default: 60
+
+    max_group_size : `int`, optional
+        the largest number of channels in a group, default: four times
+        `group_size`
+
+    retries : `int`, optional
+        the number of times to retry a channel that cannot be fetched on
+        its own, default: 1
+
+    verbose : `bool`, optional
+        print verbose output about NDS progress, default: False
+
+    **kwargs : `dict`, optional
+        additional keyword arguments to
+        `~gwpy.timeseries.TimeSeriesDict.fetch`
+
+    Returns
+    -------
+    data : `~gwpy.timeseries.TimeSeriesDict`
+        collection of data for the requested channels, in the order given
+
+    Raises
+    ------
+    RuntimeError
+        if no data could be fetched for any channel
+
+    Notes
+    -----
+    Group sizes are tuned as channels are fetched: each group of several
+    channels that succeeds doubles the size of the next (up to
+    `max_group_size`), while each group that fails halves it. The channels
+    of a failed group are then retried individually, and any channel still
+    failing after `retries` further attempts is skipped with a
+    `UserWarning`.
+
+    If a connection to a server cannot be opened, channels not yet fetched
+    are requested from the next server in resolution order (if `host` is
+    not given), as for `~gwpy.timeseries.TimeSeriesDict.get`. If the last
+    server fails in this way after some channels were fetched, the rest are
+    also skipped with a `UserWarning`.
+    """
+    channels = list(channels)
+    if not channels:
+        return TimeSeriesDict()
+    if host is None:
+        hosts = io_nds2.host_resolution_order(
+            Channel(channels[0]).ifo, epoch=start)
+    else:
+        hosts = [(host, port)]
+    kwargs['verbose'] = verbose
+
+    out = {}
+    errors = []
+    for (host, port) in hosts:
+        pool = get_pool(host, port=port, size=nconn)
+        try:
+            _fetch_all(pool, [c for c in channels if c not in out], start,
+                       end, out, nconn=nconn, group_size=group_size,
+                       max_group_size=max_group_size or 4 * group_size,
+                       retries=retries, **kwargs)
+        except ConnectionFailed as exc:  # try the next server
+            errors.append(exc)
+            continue
+        break
+    else:  # the last server failed, report channels not yet fetched
+        for name in channels:
+            if out and name not in out:
+                warnings.warn("Skipping {}: [{}] {}".format(
+                    name, type(errors[-1]), str(errors[-1])), UserWarning)
+    if not out:
+        raise RuntimeError(
+            'Cannot fetch data for any of {} channel(s) over NDS{}'.format(
+                len(channels), ': {}'.format('; '.join(map(str, errors)))
+                if errors else ''))
+    return TimeSeriesDict(
+        (name, out[name]) for name in channels if name in out)
+
+
+def _fetch_all(pool, channels, start, end, out, nconn=4,
+               group_size=GROUP_SIZE, max_group_size=4 * GROUP_SIZE,
+               retries=1, **kwargs):
+    """Fetch channels over connections from `pool`, adding data to `out`
+
+    Raises `ConnectionFailed` if a connection cannot be opened, after
+    every request in flight has completed.
+    """
+    size = group_size
+    pending = deque(channels)
+    single = deque()  # channels to retry on their own
+    attempts = dict.fromkeys(channels, 0)
+    failed = None
+    with ThreadPoolExecutor(max_workers=nconn) as executor:
+        running = {}
+        while running or ((pending or single) and failed is None):
+            # fill the pool, retrying failed channels first
+            while ((single or pending) and len(running) < nconn and
+                   failed is None):
+                if single:
+                    group = [single.popleft()]
+                else:
+                    group = [pending.popleft() for _ in
+                             range(min(size, len(pending)))]
+                running[executor.submit(
+                    _fetch_group, pool, group, start, end, **kwargs)] = group
+            (done, _) = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                group = running.pop(future)
+                try:
+                    out.update(future.result())
+                except ConnectionFailed as exc:  # stop submitting requests
+                    failed = exc
+                except (RuntimeError, ValueError, IOError) as exc:
+                    size = max(size // 2, 1)
+                    if len(group) > 1:
+                        single.extend(group)
+                        continue
+                    name = group[0]
+                    attempts[name] += 1
+                    if attempts[name] <= retries:
+                        single.append(name)
+                    else:
+                        warnings.warn("Skipping {}: [{}] {}".format(
+                            name, type(exc), str(exc)), UserWarning)
+                else:
+                    if len(group) > 1:
+                        size = min(size * 2, max_group_size)
+    if failed is not None:
+        raise failed
@@ -0,0 +1,134 @@
+# coding=utf-8
+# Copyright (C) Alex Urban (2019)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with GW DetChar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""On-disk caching of segment database queries
+
+Each flag is cached in its own JSON file, recording the known and active
+segments returned by every query so far, so that repeated queries (e.g. by
+many blocks, or by a batch of nearby scans) only go to the segment server
+for spans not already known.
+"""
+
+import json
+import os
+import tempfile
+
+from gwpy.segments import (DataQualityFlag, Segment, SegmentList)
+
+from ..const import DEFAULT_SEGMENT_SERVER
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+
+
+# -- utilities ----------------------------------------------------------------
+
+def cache_path(cache, flag):
+    """Return the path of the cache file for a flag
+
+    Parameters
+    ----------
+    cache : `str`
+        path to the directory holding cached segments
+
+    flag : `str`
+        name of the flag, e.g. ``'L1:DMT-GRD_ISC_LOCK_NOMINAL:1'``
+
+    Returns
+    -------
+    path : `str`
+        the path of this cache file, which may not exist
+    """
+    return os.path.join(cache, '{}.json'.format(flag.replace(':', '-')))
+
+
+def _read(path):
+    """Read the known and active segments for a flag from its cache file
+    """
+    try:
+        with open(path, 'r') as f:
+            cached = json.load(f)
+    except (IOError, OSError, ValueError):  # missing or incomplete
+        return (SegmentList(), SegmentList())
+    return tuple(SegmentList(Segment(*seg) for seg in cached[key])
+                 for key in ('known', 'active'))
+
+
+def _write(path, flag, known, active):
+    """Write the known and active segments for a flag to its cache file
+    """
+    cache = os.path.dirname(path)
+    if not os.path.isdir(cache):
+        os.makedirs(cache)
+    # write then move, so that a partial file is never read, using a
+    # unique temporary file since the cache may be shared by many jobs
+    (fd, tmp) = tempfile.mkstemp(dir=cache, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump({
+            'name': flag,
+            'known': [list(map(float, seg)) for seg in known],
+            'active': [list(map(float, seg)) for seg in active],
+        }, f)
+    os.rename(tmp, path)
+
+
+def query_flag(flag, start, end, cache=None, url=DEFAULT_SEGMENT_SERVER):
+    """Query the segment database for a flag, via an on-disk cache
+
+    Parameters
+    ----------
+    flag : `str`
+        name of the flag to query
+
+    start : `float`
+        GPS start time of the query
+
+    end : `float`
+        GPS end time of the query
+
+    cache : `str`, optional
+        path to a directory in which to cache segments, default: query the
+        segment database directly
+
+    url : `str`, optional
+        URL of the segment database, default:
+        `~gwdetchar.const.DEFAULT_SEGMENT_SERVER`
+
+    Returns
+    -------
+    flag : `~gwpy.segments.DataQualityFlag`
+        the known and active segments of `flag` within ``[start, end)``
+
+    Notes
+    -----
+    Only the extent of the part of ``[start, end)`` not yet known to the
+    cache is queried, and its results are merged into the cache. Spans the
+    segment database does not know (e.g. because they are too recent) are
+    therefore queried again next time.
+    """
+    if cache is None:
+        return DataQualityFlag.query(flag, start, end, url=url)
+    span = SegmentList([Segment(start, end)])
+    path = cache_path(cache, flag)
+    (known, active) = _read(path)
+    missing = span - known
+    if missing:  # fetch the missing span, and merge it into the cache
+        new = DataQualityFlag.query(flag, *missing.extent(), url=url)
+        known = (known | new.known).coalesce()
+        active = (active | new.active).coalesce()
+        _write(path, flag, known, active)
+    return DataQualityFlag(flag, known=known & span, active=active & span)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) Alex Urban (2019)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gwdetchar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for `gwdetchar.io.datacache`
+"""
+
+import os
+import time
+
+import numpy
+from numpy import testing as nptest
+
+from gwpy.testing.compat import mock
+from gwpy.timeseries import (TimeSeries, TimeSeriesDict)
+
+from .. import (datacache, datafind)
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+
+
+# global test objects
+
+DATA = TimeSeries(numpy.arange(512 * 16.), sample_rate=16, epoch=0,
+                  unit='m')
+
+CHANNELS = ['X1:TEST-CHANNEL_1', 'X1:TEST-CHANNEL_2']
+
+
+def _reader(channels, start, end):
+    return TimeSeriesDict(
+        (name, DATA.crop(start, end, copy=True)) for name in channels)
+
+
+# -- unit tests ---------------------------------------------------------------
+
+def test_chunk_path():
+    assert datacache.chunk_path('cache', 'X1:TEST', 'X1_R', 128) == (
+        os.path.join('cache', 'X1_R', 'X1-TEST', '128-64.h5'))
+
+
+def test_chunks():
+    assert datacache._chunks(64, 128) == [64]
+    assert datacache._chunks(70, 200) == [64, 128, 192]
+
+
+def test_read(tmpdir):
+    cache = str(tmpdir)
+    reader = mock.Mock(side_effect=_reader)
+    data = datacache.read(CHANNELS, 70, 200, 'X1_R', reader, cache=cache)
+    reader.assert_called_once_with(CHANNELS, 64, 256)
+    assert list(data.keys()) == CHANNELS
+    for name in CHANNELS:
+        assert data[name].span == (70, 200)
+        assert data[name].unit == DATA.unit
+        nptest.assert_array_equal(data[name].value, DATA.crop(70, 200).value)
+        assert len(os.listdir(os.path.join(
+            cache, 'X1_R', name.replace(':', '-')))) == 3
+
+    # a repeated request is read entirely from the cache
+    reader.reset_mock()
+    data2 = datacache.read(CHANNELS, 70, 200, 'X1_R', reader, cache=cache)
+    reader.assert_not_called()
+    for name in CHANNELS:
+        nptest.assert_array_equal(data2[name].value, data[name].value)
+        assert data2[name].t0 == data[name].t0
+
+    # an overlapping request reads only the missing chunks
+    data3 = datacache.read(CHANNELS, 100, 300, 'X1_R', reader, cache=cache)
+    reader.assert_called_once_with(CHANNELS, 256, 320)
+    for name in CHANNELS:
+        nptest.assert_array_equal(data3[name].value, DATA.crop(100, 300).value)
+
+
+def test_read_unavailable(tmpdir):
+    cache = str(tmpdir)
+
+    def reader(channels, start, end):
+        if end > 180:  # data not yet archived
+            raise RuntimeError('Cannot find all data')
+        return _reader(channels, start, end)
+
+    # requests that cannot be read in full chunks are not cached
+    data = datacache.read(CHANNELS, 70, 170, 'X1_R', reader, cache=cache)
+    nptest.assert_array_equal(data[CHANNELS[0]].value,
+                              DATA.crop(70, 170).value)
+    assert os.listdir(cache) == []
+
+
+def test_evict(tmpdir):
+    cache = str(tmpdir)
+    datacache.read(CHANNELS[:1], 0, 192, 'X1_R', _reader, cache=cache)
+    paths = [datacache.chunk_path(cache, CHANNELS[0], 'X1_R', t)
+             for t in (0, 64, 128)]
+    for (i, path) in enumerate(paths):  # oldest first
+        os.utime(path, (time.time() - 100 + i,) * 2)
+    size = os.path.getsize(paths[1]) + os.path.getsize(paths[2])
+    assert datacache.evict(cache, max_size=size) == paths[:1]
+    assert not os.path.isfile(paths[0])
+
+    # chunks read are marked as recently used
+    assert datacache._read_chunk(paths[1]).span == (64, 128)
+    assert datacache.evict(cache, max_size=size - 1) == paths[2:]
+
+
+@mock.patch('gwdetchar.io.datafind.gwdatafind.find_urls',
+            return_value=['X-X1_R-0-512.gwf'])
+@mock.patch('gwdetchar.io.datafind.remove_missing_channels',
+            side_effect=lambda channels, source: channels)
+@mock.patch('gwpy.timeseries.TimeSeriesDict.read',
+            side_effect=lambda source, channels, start, end, **kwargs:
+            _reader(channels, start, end))
+def test_get_data(read, remove, find, tmpdir):
+    cache = str(tmpdir)
+    data = datafind.get_data(CHANNELS[0], 70, 200, frametype='X1_R',
+                             data_cache=cache)
+    assert isinstance(data, TimeSeries)
+    nptest.assert_array_equal(data.value, DATA.crop(70, 200).value)
+    assert read.call_count == 1
+    data = datafind.get_data(CHANNELS, 80, 190, frametype='X1_R',
+                             data_cache=cache)
+    assert read.call_count == 2  # only the second channel is read
+    assert read.call_args[0][1] == CHANNELS[1:]
+    assert list(data.keys()) == CHANNELS
+
+    # data decimated on read are drawn from the cache at their native rate
+    data = datafind.get_data(CHANNELS, 80, 190, frametype='X1_R',
+                             data_cache=cache, resample=8)
+    assert read.call_count == 2
+    assert data[CHANNELS[0]].sample_rate.value == 8
+    assert data[CHANNELS[0]].span == (80, 190)
@@ -78,20 +78,38 @@ def test_get_data_from_NDS(tsget):
     nptest.assert_array_equal(data.value, HOFT.value)
 
 
-@mock.patch('gwpy.timeseries.TimeSeriesDict.get',
+@mock.patch('gwdetchar.io.nds.fetch',
             return_value=TimeSeriesDict({'X1:TEST-STRAIN': HOFT}))
-def test_get_data_dict_from_NDS(tsdget):
+def test_get_data_dict_from_NDS(fetch):
     # retrieve data
     start = 33
     end = 64
     channels = ['X1:TEST-STRAIN']
-    data = datafind.get_data(channels, start, end)
+    data = datafind.get_data(channels, start, end, nproc=4)
+    fetch.assert_called_once_with(channels, start, end, nconn=4,
+                                  verbose=False)
 
     # test data products
     assert isinstance(data, TimeSeriesDict)
     nptest.assert_array_equal(data['X1:TEST-STRAIN'].value, HOFT.value)
 
 
+@mock.patch('gwdatafind.find_urls')
+def test_find_urls(find_data):
+    datafind._URLS.clear()
+    # a query whose files do not cover the span is repeated
+    find_data.return_value = ['X-X1_TEST-0-32.gwf']
+    assert datafind.find_urls('X', 'X1_TEST', 0, 64) == ['X-X1_TEST-0-32.gwf']
+    assert not datafind._URLS
+    # a complete query is held in memory
+    find_data.return_value = ['X-X1_TEST-0-32.gwf', 'X-X1_TEST-32-32.gwf']
+    for _ in range(2):
+        assert datafind.find_urls('X', 'X1_TEST', 0, 64) == (
+            find_data.return_value)
+    assert find_data.call_count == 2
+    datafind._URLS.clear()
+
+
 @mock.patch('gwdatafind.find_urls')
 @mock.patch('gwpy.timeseries.TimeSeries.read')
 def test_get_data_from_cache(tsget, find_data):
@@ -141,3 +159,101 @@ def test_get_data_bad_frametype():
     with pytest.raises(AttributeError) as exc:
         datafind.get_data(channel, start=0, end=32, frametype='bad_frametype')
     assert 'Could not determine observatory' in str(exc.value)
+
+
+def test_stride_segments():
+    segs = [(0, 10), (20, 23)]
+    assert datafind.stride_segments(segs, 4) == [
+        (0, 4), (4, 8), (8, 10), (20, 23)]
+    assert datafind.stride_segments(segs, 4, overlap=1) == [
+        (0, 4), (3, 7), (6, 10), (20, 23)]
+    with pytest.raises(ValueError):
+        datafind.stride_segments(segs, 4, overlap=4)
+
+
+@mock.patch('gwdetchar.io.datafind.remove_missing_channels',
+            side_effect=lambda channels, source: channels)
+@mock.patch('gwpy.timeseries.TimeSeriesDict.read',
+            side_effect=lambda source, channels, start, end, **kwargs:
+            TimeSeriesDict((c, HOFT.crop(start, end)) for c in channels))
+def test_iter_data(tsdread, remove):
+    channels = ['X1:TEST-STRAIN']
+    source = ['X-X1_TEST-0-32.gwf', 'X-X1_TEST-32-32.gwf',
+              'X-X1_TEST-64-2.gwf']
+    chunks = list(datafind.iter_data(
+        channels, 8, 60, 16, overlap=2, segments=[(0, 40), (50, 66)],
+        source=source, nproc=4))
+    assert [data[channels[0]].span for data in chunks] == [
+        (8, 24), (22, 38), (36, 40), (50, 60)]
+    for data in chunks:
+        (start, end) = data[channels[0]].span
+        nptest.assert_array_equal(data[channels[0]].value,
+                                  HOFT.crop(start, end).value)
+    # each chunk is read from only the files it needs
+    assert tsdread.call_args_list[0][0][0] == source[:1]
+    assert tsdread.call_args_list[-1][0][0] == source[1:2]
+    # chunks read in the background never fork processes
+    assert set(c[1]['nproc'] for c in tsdread.call_args_list) == {1}
+    # streaming without prefetch gives the same chunks
+    spans = [data[channels[0]].span for data in datafind.iter_data(
+        channels, 8, 60, 16, overlap=2, segments=[(0, 40), (50, 66)],
+        source=source, prefetch=False)]
+    assert spans == [data[channels[0]].span for data in chunks]
+
+
+@mock.patch('gwdetchar.io.datafind.remove_missing_channels',
+            side_effect=lambda channels, source: channels)
+@mock.patch('gwpy.timeseries.TimeSeriesDict.read',
+            side_effect=lambda source, channels, start, end, **kwargs:
+            TimeSeriesDict((c, HOFT.crop(start, end)) for c in channels))
+@mock.patch('gwpy.timeseries.TimeSeries.read',
+            side_effect=lambda source, channel, start, end, **kwargs:
+            HOFT.crop(start, end))
+def test_get_data_resample(tsread, tsdread, remove):
+    channels = ['X1:TEST-STRAIN']
+    source = ['X-X1_TEST-0-66.gwf']
+    target = HOFT.resample(256)
+    with mock.patch.object(datafind, 'DECIMATE_STRIDE', 16):
+        data = datafind.get_data(channels[0], 0, 66, source=source,
+                                 resample=256)
+        dictdata = datafind.get_data(channels, 0, 66, source=source,
+                                     resample=256)
+    # data are decimated in overlapping chunks, matching a single pass
+    assert tsread.call_count == 5
+    for series in (data, dictdata[channels[0]]):
+        assert series.sample_rate.value == 256
+        assert series.span == Segment(0, 66)
+        nptest.assert_allclose(series.value, target.value, atol=1e-10)
+
+
+@mock.patch('gwpy.timeseries.TimeSeries.read',
+            side_effect=lambda source, channel, start, end, **kwargs:
+            HOFT.crop(start, end))
+def test_get_data_resample_gaps(tsread):
+    channel = 'X1:TEST-STRAIN'
+    source = ['X-X1_TEST-0-20.gwf', 'X-X1_TEST-20-20.gwf',
+              'X-X1_TEST-50-16.gwf']
+    with mock.patch.object(datafind, 'DECIMATE_STRIDE', 16):
+        # gaps are filled with pad, data either side are kept in full
+        data = datafind.get_data(channel, 0, 66, source=source,
+                                 resample=256, pad=0)
+        assert data.span == Segment(0, 66)
+        for seg in [(0, 40), (50, 66)]:
+            nptest.assert_allclose(data.crop(*seg).value,
+                                   HOFT.crop(*seg).resample(256).value,
+                                   atol=1e-10)
+        nptest.assert_array_equal(data.crop(40, 50).value, 0)
+
+        # as is any part of the span not covered at all
+        data = datafind.get_data(channel, 0, 44, source=source[:2],
+                                 resample=256, pad=0)
+        assert data.span == Segment(0, 44)
+        nptest.assert_allclose(data.crop(0, 40).value,
+                               HOFT.crop(0, 40).resample(256).value,
+                               atol=1e-10)
+        nptest.assert_array_equal(data.crop(40, 44).value, 0)
+
+        # otherwise missing data are an error
+        with pytest.raises(ValueError) as exc:
+            datafind.get_data(channel, 0, 66, source=source, resample=256)
+        assert 'use pad=' in str(exc.value)
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) Alex Urban (2019)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gwdetchar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for `gwdetchar.io.nds`
+"""
+
+import threading
+import time
+import pytest
+
+import numpy
+from numpy import testing as nptest
+
+from gwpy.testing.compat import mock
+from gwpy.timeseries import (TimeSeries, TimeSeriesDict)
+
+from .. import nds
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+
+
+# global test objects
+
+DATA = TimeSeries(numpy.arange(64 * 16.), sample_rate=16, epoch=0)
+
+CHANNELS = ['X1:TEST-CHANNEL_{}'.format(i) for i in range(12)]
+
+
+class _Connection(object):
+    """Stand-in for an `nds2.connection`
+    """
+    def __init__(self, server):
+        self.server = server
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class _Server(object):
+    """Stand-in for an NDS2 server
+
+    Requests for more than `limit` channels fail, as do requests including
+    any channel in `missing`, and the first request including any channel
+    in `flaky`.
+    """
+    def __init__(self, limit=None, missing=(), flaky=()):
+        self.limit = limit
+        self.missing = set(missing)
+        self.flaky = set(flaky)
+        self.connections = []
+        self.requests = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def connect(self, host, port=None):
+        conn = _Connection(self)
+        self.connections.append(conn)
+        return conn
+
+    def fetch(self, channels, start, end, connection=None, **kwargs):
+        assert connection.server is self and not connection.closed
+        with self._lock:
+            self.requests.append(list(channels))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(.01)  # let requests overlap
+            if self.limit and len(channels) > self.limit:
+                raise RuntimeError('Requested data too large')
+            for name in channels:
+                if name in self.missing:
+                    raise RuntimeError('{} not found'.format(name))
+            with self._lock:
+                if self.flaky & set(channels):
+                    self.flaky -= set(channels)
+                    raise RuntimeError('Connection reset')
+            return TimeSeriesDict(
+                (name, DATA.crop(start, end)) for name in channels)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def _serve(server):
+    """Patch NDS2 connections and fetches through `server`
+    """
+    def decorator(func):
+        func = mock.patch('gwpy.timeseries.TimeSeriesDict.fetch',
+                          side_effect=server.fetch)(func)
+        return mock.patch('gwpy.io.nds2.connect',
+                          side_effect=server.connect)(func)
+    return decorator
+
+
+# -- unit tests ---------------------------------------------------------------
+
+def test_connection_pool():
+    server = _Server()
+    pool = nds.ConnectionPool('test', size=2)
+    with mock.patch('gwpy.io.nds2.connect', side_effect=server.connect):
+        with pool.connection() as conn1:
+            with pool.connection() as conn2:
+                assert conn1 is not conn2
+        # idle connections are re-used
+        with pool.connection() as conn3:
+            assert conn3 in (conn1, conn2)
+        # a connection in use when an error is raised is discarded
+        with pytest.raises(RuntimeError):
+            with pool.connection() as conn4:
+                raise RuntimeError('test')
+        assert conn4.closed
+    assert len(server.connections) == 2
+    pool.close()
+    assert all(conn.closed for conn in server.connections)
+
+
+def test_get_pool():
+    pool = nds.get_pool('test-get-pool', port=31200, size=2)
+    assert nds.get_pool('test-get-pool', port=31200, size=3) is pool
+    assert pool.size == 3
+    assert nds.get_pool('test-get-pool', port=31201) is not pool
+
+
+SERVER = _Server()
+
+
+@_serve(SERVER)
+def test_fetch(fetch, connect):
+    data = nds.fetch(CHANNELS, 16, 48, host='test-fetch', nconn=3,
+                     group_size=2, max_group_size=2)
+    assert list(data.keys()) == CHANNELS
+    for name in CHANNELS:
+        nptest.assert_array_equal(data[name].value, DATA.crop(16, 48).value)
+    assert sorted(sum(SERVER.requests, [])) == sorted(CHANNELS)
+    # requests were concurrent, over at most three connections
+    assert 1 < SERVER.peak <= 3
+    assert len(SERVER.connections) <= 3
+
+
+ADAPTIVE = _Server(limit=4)
+
+
+@_serve(ADAPTIVE)
+def test_fetch_adaptive(fetch, connect):
+    data = nds.fetch(CHANNELS, 16, 48, host='test-adaptive', nconn=1,
+                     group_size=8)
+    assert list(data.keys()) == CHANNELS
+    # the first group fails, and its channels are retried individually
+    # before the group size is halved for the rest
+    assert [len(group) for group in ADAPTIVE.requests] == [8] + [1] * 8 + [4]
+
+
+FLAKY = _Server(missing=CHANNELS[:1], flaky=CHANNELS[1:2])
+
+
+@_serve(FLAKY)
+def test_fetch_retry(fetch, connect):
+    with pytest.warns(UserWarning, match='Skipping {}'.format(CHANNELS[0])):
+        data = nds.fetch(CHANNELS[:4], 16, 48, host='test-retry', nconn=1,
+                         retries=2)
+    assert list(data.keys()) == CHANNELS[1:4]
+    # the missing channel is tried once in its group, then three times alone
+    assert sum(group == CHANNELS[:1] for group in FLAKY.requests) == 3
+    # connections are discarded when a request fails
+    assert sum(conn.closed for conn in FLAKY.connections) == 5
+
+
+def test_fetch_empty():
+    assert nds.fetch([], 16, 48) == TimeSeriesDict()
+
+
+FAILOVER = _Server()
+
+
+def _connect_failover(host, port=None):
+    if host == 'test-down':
+        raise RuntimeError('Failed to establish a connection')
+    return FAILOVER.connect(host, port=port)
+
+
+@mock.patch('gwpy.io.nds2.host_resolution_order',
+            return_value=[('test-down', None), ('test-up', None)])
+@mock.patch('gwpy.timeseries.TimeSeriesDict.fetch',
+            side_effect=FAILOVER.fetch)
+@mock.patch('gwpy.io.nds2.connect', side_effect=_connect_failover)
+def test_fetch_failover(connect, fetch, hro):
+    # channels are fetched from the next server if one is down
+    data = nds.fetch(CHANNELS, 16, 48, nconn=2, group_size=4)
+    assert list(data.keys()) == CHANNELS
+    assert [call[0][0] for call in connect.call_args_list[:1]] == [
+        'test-down']
+    assert sorted(sum(FAILOVER.requests, [])) == sorted(CHANNELS)
+
+    # but it is an error if no server can be reached
+    hro.return_value = [('test-down', None)]
+    with pytest.raises(RuntimeError) as exc:
+        nds.fetch(CHANNELS, 16, 48)
+    assert 'Cannot connect to test-down' in str(exc.value)
+
+
+DROPPED = _Server(flaky=CHANNELS[2:3])
+
+
+def _connect_drop(host, port=None):
+    if DROPPED.connections:  # the server goes down after one connection
+        raise RuntimeError('Failed to establish a connection')
+    return DROPPED.connect(host, port=port)
+
+
+@mock.patch('gwpy.timeseries.TimeSeriesDict.fetch',
+            side_effect=DROPPED.fetch)
+@mock.patch('gwpy.io.nds2.connect', side_effect=_connect_drop)
+def test_fetch_dropped(connect, fetch):
+    # the only server drops out after its connection is discarded
+    with pytest.warns(UserWarning) as record:
+        data = nds.fetch(CHANNELS[:6], 16, 48, host='test-drop', nconn=1,
+                         group_size=2, max_group_size=2)
+    assert list(data.keys()) == CHANNELS[:2]
+    # every channel not fetched is reported
+    for name in CHANNELS[2:6]:
+        assert any('Skipping {}'.format(name) in str(w.message) and
+                   'Cannot connect to test-drop' in str(w.message)
+                   for w in record)
+
+
+MISSING = _Server(missing=CHANNELS)
+
+
+@_serve(MISSING)
+def test_fetch_nothing(fetch, connect):
+    with pytest.raises(RuntimeError) as exc, pytest.warns(UserWarning):
+        nds.fetch(CHANNELS[:2], 16, 48, host='test-nothing', retries=0)
+    assert 'Cannot fetch data for any of 2 channel(s)' in str(exc.value)
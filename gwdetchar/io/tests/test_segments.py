@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) Alex Urban (2019)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gwdetchar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for `gwdetchar.io.segments`
+"""
+
+import os
+
+from gwpy.testing.compat import mock
+from gwpy.segments import (DataQualityFlag, Segment, SegmentList)
+
+from .. import (datafind, segments)
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+
+
+# global test objects
+
+NAME = 'X1:TEST-FLAG:1'
+
+# the segment database knows this flag only up to GPS 1000
+SERVER = DataQualityFlag(NAME, known=[(0, 1000)],
+                         active=[(0, 100), (150, 1000)])
+
+
+def _query(flag, start, end, **kwargs):
+    """Stand-in for the segment database
+    """
+    span = SegmentList([Segment(start, end)])
+    return DataQualityFlag(flag, known=SERVER.known & span,
+                           active=SERVER.active & span)
+
+
+# -- unit tests ---------------------------------------------------------------
+
+def test_cache_path():
+    path = segments.cache_path('cache', NAME)
+    assert path == os.path.join('cache', 'X1-TEST-FLAG-1.json')
+
+
+@mock.patch('gwpy.segments.DataQualityFlag.query', side_effect=_query)
+def test_query_flag(query, tmpdir):
+    cache = str(tmpdir.join('segments'))
+    flag = segments.query_flag(NAME, 50, 200, cache=cache)
+    query.assert_called_once_with(NAME, 50, 200,
+                                  url=segments.DEFAULT_SEGMENT_SERVER)
+    assert flag.known == [(50, 200)]
+    assert flag.active == [(50, 100), (150, 200)]
+    assert os.path.isfile(segments.cache_path(cache, NAME))
+
+    # a covered span is served from the cache
+    query.reset_mock()
+    flag = segments.query_flag(NAME, 60, 160, cache=cache)
+    query.assert_not_called()
+    assert flag.active == [(60, 100), (150, 160)]
+
+    # only the missing span is fetched
+    flag = segments.query_flag(NAME, 100, 300, cache=cache)
+    query.assert_called_once_with(NAME, 200, 300,
+                                  url=segments.DEFAULT_SEGMENT_SERVER)
+    assert flag.known == [(100, 300)]
+    assert flag.active == [(150, 300)]
+
+    # spans unknown to the server are queried again
+    query.reset_mock()
+    for _ in range(2):
+        flag = segments.query_flag(NAME, 900, 1100, cache=cache)
+    assert query.call_count == 2
+    assert query.call_args[0] == (NAME, 1000, 1100)
+    assert flag.known == [(900, 1000)]
+
+    # without a cache, every query goes to the server
+    query.reset_mock()
+    segments.query_flag(NAME, 60, 160)
+    query.assert_called_once()
+
+
+@mock.patch('gwpy.segments.DataQualityFlag.query', side_effect=_query)
+def test_check_flag_cache(query, tmpdir):
+    cache = str(tmpdir)
+    assert datafind.check_flag(NAME, 50, 60, pad=1, cache=cache) is True
+    assert datafind.check_flag(NAME, 110, 60, pad=1, cache=cache) is False
+    assert datafind.check_flag(NAME, 60, 60, pad=1, cache=cache) is True
+    assert query.call_count == 2
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) Alex Urban (2019)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gwdetchar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for `gwdetchar.io.toc`
+"""
+
+import os
+
+from gwpy.testing.compat import mock
+
+from .. import toc
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+
+
+# global test objects
+
+CHANNELS = [
+    'X1:TEST-CHANNEL_2',
+    'X1:FEC-1_ADC_OVERFLOW_0_1',
+    'X1:TEST-CHANNEL_1',
+    'X1:FEC-10_ADC_OVERFLOW_0_1',
+    'X1:TEST-CHANNEL_1.mean',
+]
+
+INDEX = toc.ChannelIndex(CHANNELS)
+
+
+# -- unit tests ---------------------------------------------------------------
+
+def test_channel_index():
+    assert len(INDEX) == len(CHANNELS)
+    assert list(INDEX) == sorted(CHANNELS)
+    for name in CHANNELS:
+        assert name in INDEX
+    assert 'X1:TEST-CHANNEL' not in INDEX
+    assert 'X1:TEST-CHANNEL_3' not in INDEX
+    assert 'Z1:TEST' not in INDEX
+
+
+def test_channel_index_startswith():
+    assert INDEX.startswith('X1:FEC-1_') == ['X1:FEC-1_ADC_OVERFLOW_0_1']
+    assert INDEX.startswith('X1:TEST-') == sorted(CHANNELS)[2:]
+    assert INDEX.startswith('Y1:') == []
+    assert INDEX.startswith('') == sorted(CHANNELS)
+
+
+def test_channel_index_search():
+    assert INDEX.search(r'\.mean\Z') == ['X1:TEST-CHANNEL_1.mean']
+    assert INDEX.search('OVERFLOW') == sorted(CHANNELS)[:2]
+
+
+def test_cache_path():
+    assert toc.cache_path(
+        'cache', 'file://localhost/frames/X-X1_R-0-64.gwf', 'abc') == (
+        os.path.join('cache', 'X-X1_R-0-64-abc.txt.gz'))
+
+
+@mock.patch('gwpy.io.gwf.iter_channel_names', return_value=CHANNELS)
+def test_get_channel_index(iter_names, tmpdir):
+    cache = str(tmpdir.mkdir('toc'))
+    gwf = tmpdir.join('X-X1_R-0-64.gwf')
+    gwf.write('test')
+    path = str(gwf)
+    index = toc.get_channel_index(path, cache=cache)
+    assert list(index) == sorted(CHANNELS)
+    iter_names.assert_called_once_with(path)
+    key = toc.index_key(path)
+    assert os.path.isfile(toc.cache_path(cache, path, key))
+
+    # the index is then held in memory
+    iter_names.reset_mock()
+    assert toc.get_channel_index('file://localhost' + path,
+                                 cache=cache) is index
+    iter_names.assert_not_called()
+
+    # and on disk, for other processes
+    toc._INDEX.clear()
+    assert list(toc.get_channel_index(path, cache=cache)) == list(index)
+    iter_names.assert_not_called()
+
+    # a modified file is indexed again
+    gwf.write('modified')
+    toc.get_channel_index(path, cache=cache)
+    iter_names.assert_called_once_with(path)
+    assert len(os.listdir(cache)) == 2
+
+
+@mock.patch('gwpy.io.gwf.iter_channel_names', return_value=CHANNELS)
+@mock.patch('gwdetchar.io.toc.INDEX_CACHE_SIZE', 1)
+def test_get_channel_index_bounded(iter_names, tmpdir):
+    paths = []
+    for gps in (0, 64):
+        gwf = tmpdir.join('X-X1_R-{}-64.gwf'.format(gps))
+        gwf.write('test')
+        paths.append(str(gwf))
+    toc._INDEX.clear()
+    # only the most recently used index is held in memory
+    for path in paths:
+        toc.get_channel_index(path, cache=None)
+    assert list(toc._INDEX) == [toc.index_key(paths[1])]
+    toc.get_channel_index(paths[0], cache=None)
+    assert iter_names.call_count == 3
+    toc._INDEX.clear()
+
+
+@mock.patch('gwpy.io.gwf.iter_channel_names', return_value=CHANNELS)
+def test_get_channel_index_remote(iter_names, tmpdir):
+    cache = str(tmpdir)
+    # files that cannot be found locally are not cached
+    for _ in range(2):
+        index = toc.get_channel_index('X-X1_R-0-64.gwf', cache=cache)
+    assert list(index) == sorted(CHANNELS)
+    assert iter_names.call_count == 2
+    assert os.listdir(cache) == []
+
+
+@mock.patch('gwpy.io.gwf.iter_channel_names', return_value=CHANNELS)
+def test_get_channel_index_unwritable(iter_names, tmpdir):
+    gwf = tmpdir.join('X-X1_R-0-64.gwf')
+    gwf.write('test')
+    path = str(gwf)
+    # a cache that cannot be written falls back to memory
+    cache = tmpdir.join('cache')
+    cache.write('not a directory')
+    toc._INDEX.clear()
+    index = toc.get_channel_index(path, cache=str(cache))
+    assert list(index) == sorted(CHANNELS)
+    assert toc.get_channel_index(path, cache=str(cache)) is index
+    iter_names.assert_called_once_with(path)
+
+    # and a failed write leaves no temporary files behind
+    directory = tmpdir.mkdir('toc')
+    with mock.patch('os.rename', side_effect=OSError('quota exceeded')):
+        assert toc._write(str(directory.join('test.txt.gz')), index) is False
+    assert directory.listdir() == []
@@ -0,0 +1,254 @@
+# coding=utf-8
+# Copyright (C) Alex Urban (2019)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with GW DetChar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Persistent index of the channels stored in GWF frame files
+
+Reading the table of contents of a raw frame file, with 100k+ channels,
+takes tens of seconds. The channel names found in each file are therefore
+cached on disk, keyed by the path, size, and modification time of that
+file, and shared by every process using the same cache directory.
+
+The default cache directory is ``$GWDETCHAR_TOC_CACHE``, if set, otherwise
+``gwdetchar/toc`` under ``$XDG_CACHE_HOME`` (or ``~/.cache``). Setting
+``GWDETCHAR_TOC_CACHE`` to an empty string disables the on-disk cache.
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+
+from bisect import bisect_left
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from gwpy.io import gwf as io_gwf
+
+from ..utils import lru_cached
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+
+DEFAULT_CACHE = os.getenv('GWDETCHAR_TOC_CACHE', os.path.join(
+    os.getenv('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+    'gwdetchar', 'toc')) or None
+
+# maximum number of indices to hold in memory at any one time
+INDEX_CACHE_SIZE = 32
+
+# indices already loaded by this process, keyed by `index_key`
+_INDEX = OrderedDict()
+
+
+# -- channel index ------------------------------------------------------------
+
+class ChannelIndex(object):
+    """A sorted index of channel names
+
+    Parameters
+    ----------
+    names : `iterable` of `str`
+        the channel names to index, in any order
+
+    Notes
+    -----
+    Membership tests and prefix queries use a binary search of the sorted
+    names, so cost O(log N) for N channels.
+    """
+    def __init__(self, names):
+        self.names = sorted(set(names))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name):
+        i = bisect_left(self.names, name)
+        return i < len(self.names) and self.names[i] == name
+
+    def startswith(self, prefix):
+        """Return all channel names that start with a given prefix
+
+        Parameters
+        ----------
+        prefix : `str`
+            the prefix to match, e.g. ``'L1:FEC-'``
+
+        Returns
+        -------
+        names : `list` of `str`
+            the matching channel names, in sorted order
+        """
+        start = bisect_left(self.names, prefix)
+        end = start
+        while end < len(self.names) and self.names[end].startswith(prefix):
+            end += 1
+        return self.names[start:end]
+
+    def search(self, pattern):
+        """Return all channel names matching a regular expression
+
+        Parameters
+        ----------
+        pattern : `str`
+            the regular expression to search for, as in `re.search`
+
+        Returns
+        -------
+        names : `list` of `str`
+            the matching channel names, in sorted order
+        """
+        regex = re.compile(pattern)
+        return [name for name in self.names if regex.search(name)]
+
+
+# -- utilities ----------------------------------------------------------------
+
+def _local_path(path):
+    """Return the local path of a frame file, which may be a URL
+    """
+    if path.startswith('file:'):
+        return urlparse(path).path
+    return path
+
+
+def index_key(path):
+    """Return the key identifying the contents of a frame file
+
+    Parameters
+    ----------
+    path : `str`
+        the path (or ``file://`` URL) of a frame file
+
+    Returns
+    -------
+    key : `str`
+        a short hexadecimal digest of the absolute path, size, and
+        modification time of `path`
+
+    Raises
+    ------
+    OSError
+        if `path` cannot be found
+    """
+    path = os.path.abspath(_local_path(path))
+    stat = os.stat(path)
+    params = (path, stat.st_size, stat.st_mtime)
+    return hashlib.sha1(repr(params).encode('utf-8')).hexdigest()[:16]
+
+
+def cache_path(cache, path, key):
+    """Return the path of the cached index for a frame file
+
+    Parameters
+    ----------
+    cache : `str`
+        path to the directory holding cached indices
+
+    path : `str`
+        the path of the frame file
+
+    key : `str`
+        the key for this file, see `index_key`
+
+    Returns
+    -------
+    path : `str`
+        the path of this cached index, which may not exist
+    """
+    base = os.path.splitext(os.path.basename(_local_path(path)))[0]
+    return os.path.join(cache, '{}-{}.txt.gz'.format(base, key))
+
+
+def _read(path):
+    """Read a cached index, or return `None` if it cannot be read
+    """
+    try:
+        with gzip.open(path, 'rt') as f:
+            return ChannelIndex(f.read().split())
+    except (IOError, OSError, EOFError):  # missing or incomplete
+        return None
+
+
+def _write(path, index):
+    """Write an index to the cache, returning `False` if it cannot be
+    written (e.g. if the cache directory is read-only or out of quota)
+    """
+    cache = os.path.dirname(path)
+    tmp = None
+    try:
+        if not os.path.isdir(cache):
+            os.makedirs(cache)
+        # write then move, so that a partial file is never read, using a
+        # unique temporary file since the cache may be shared by many jobs
+        (fd, tmp) = tempfile.mkstemp(dir=cache, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt') as f:
+            f.write('\n'.join(index))
+        os.rename(tmp, path)
+    except (IOError, OSError):
+        if tmp is not None and os.path.exists(tmp):  # clean up
+            os.remove(tmp)
+        return False
+    return True
+
+
+def get_channel_index(path, cache=DEFAULT_CACHE):
+    """Return the index of channels stored in a frame file
+
+    Parameters
+    ----------
+    path : `str`
+        the path (or ``file://`` URL) of a frame file
+
+    cache : `str`, optional
+        path to a directory in which to cache indices, or `None` to cache
+        them only in memory, default: `DEFAULT_CACHE`
+
+    Returns
+    -------
+    index : `ChannelIndex`
+        the index of channel names in this file
+
+    Notes
+    -----
+    Indices are looked up in memory, then in `cache`, before reading the
+    table of contents of `path`. If `path` cannot be found locally (e.g.
+    if it is a remote URL) then its table of contents is always read.
+    If an index cannot be written to `cache`, it is held only in memory.
+    At most `INDEX_CACHE_SIZE` indices are held in memory; once full, the
+    least recently used index is evicted (but is still found in `cache`).
+    """
+    try:
+        key = index_key(path)
+    except (IOError, OSError):  # cannot key this file
+        return ChannelIndex(io_gwf.iter_channel_names(path))
+
+    def _build():
+        index = None
+        if cache is not None:
+            cached = cache_path(cache, path, key)
+            index = _read(cached)
+        if index is None:
+            index = ChannelIndex(io_gwf.iter_channel_names(_local_path(path)))
+            if cache is not None:
+                _write(cached, index)
+        return index
+
+    return lru_cached(_INDEX, INDEX_CACHE_SIZE, key, _build)
@@ -0,0 +1,525 @@
+# coding=utf-8
+# Copyright (C) LIGO Scientific Collaboration (2015-)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with GW DetChar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Compute an omega scan for a list of channels around a given GPS time
+
+This utility can be used to process an arbitrary list of detector channels
+with minimal effort in finding data. The input should be an INI-formatted
+configuration file that lists processing options and channels in contextual
+blocks. For more information, see gwdetchar.omega.config.
+"""
+
+import os
+import sys
+import time
+import numpy
+
+from matplotlib import use
+use('agg')  # noqa
+
+from gwpy.table import Table
+from gwpy.time import to_gps
+
+from .. import cli
+from ..io.datafind import get_data
+from . import (config, core, html, parallel, plot, timing)
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+__credits__ = 'Duncan Macleod <duncan.macleod@ligo.org>'
+
+logger = cli.logger('gwdetchar.omega')
+
+
+# -- parse command line -------------------------------------------------------
+
+def create_parser():
+    """Create a command-line parser for `gwdetchar-omega`
+    """
+    parser = cli.create_parser(description=__doc__)
+    parser.add_argument('gpstime', type=to_gps,
+                        help='GPS time or datestring to scan')
+    cli.add_ifo_option(parser, required=False)
+    parser.add_argument('-o', '--output-directory',
+                        help='output directory for the omega scan, '
+                             'default: ~/public_html/wdq/{IFO}_{gpstime}')
+    parser.add_argument('-f', '--config-file', action='append', default=None,
+                        help='path to configuration file to use, can be '
+                             'given multiple times (files read in order), '
+                             'default: choose a standard one based on IFO '
+                             'and GPS time')
+    parser.add_argument('-d', '--disable-correlation', action='store_true',
+                        default=False, help='disable cross-correlation of '
+                                            'aux channels, default: False')
+    parser.add_argument('-D', '--disable-checkpoint', action='store_true',
+                        default=False, help='disable checkpointing from '
+                                            'previous runs, default: False')
+    parser.add_argument('--checkpoint-store', default=None,
+                        help='directory in which to store the signal '
+                             'processing products of each channel (several '
+                             'MB each, compressed), so that an interrupted '
+                             'scan can resume, or be re-plotted, without '
+                             'repeating it, default: do not store')
+    parser.add_argument('-R', '--replot', action='store_true', default=False,
+                        help='regenerate all plots and HTML, reusing signal '
+                             'processing from the --checkpoint-store of a '
+                             'previous run, e.g. after a change of colormap '
+                             'or plot time durations, default: False')
+    parser.add_argument('-s', '--ignore-state-flags', action='store_true',
+                        default=False, help='ignore state flag definitions '
+                                            'in the configuration, '
+                                            'default: False')
+    parser.add_argument('--segment-cache', default=None,
+                        help='directory in which to cache state flag '
+                             'segments, which can be shared by many scans, '
+                             'default: query the segment database for every '
+                             'block')
+    parser.add_argument('-t', '--far-threshold', type=float,
+                        default=3.171e-8,
+                        help='white noise false alarm rate threshold (Hz) '
+                             'for processing channels, default: %(default)s')
+    parser.add_argument('-P', '--disable-prefilter', action='store_true',
+                        default=False, help='disable the coarse significance '
+                                            'pre-filter applied before each '
+                                            'full Q-transform, '
+                                            'default: False')
+    parser.add_argument('-m', '--low-memory', action='store_true',
+                        default=False, help='release intermediate data '
+                                            'products as soon as possible, '
+                                            'store spectrograms in single '
+                                            'precision, and report the peak '
+                                            'memory used for each channel '
+                                            'and stage, default: False')
+    parser.add_argument('-F', '--fused-conditioning', action='store_true',
+                        default=False, help='high-pass and whiten data in a '
+                                            'single frequency-domain pass, '
+                                            'which agrees with the default '
+                                            'conditioning except near the '
+                                            'highpass corner, default: False')
+    parser.add_argument('-B', '--block-conditioning', action='store_true',
+                        default=False, help='condition all channels in a '
+                                            'block that share a sample rate '
+                                            'at once, before scanning them, '
+                                            'ignored with --cluster-cache, '
+                                            'default: False')
+    parser.add_argument('--quicklook', action='store_true', default=False,
+                        help='first scan every channel at coarse resolution, '
+                             'plotting only whitened Q-scans over the '
+                             'shortest plot time duration, with blocks '
+                             'containing the primary and GW channels first, '
+                             'then refine into the full set of outputs, '
+                             'reading the data for each block again, '
+                             'default: False')
+    parser.add_argument('-c', '--colormap', default='viridis',
+                        help='name of colormap to use, default: %(default)s')
+    parser.add_argument('-w', '--html-interval', type=float, default=60,
+                        help='minimum time (seconds) between full rewrites '
+                             'of the HTML page while the scan is in '
+                             'progress, default: %(default)s')
+    cli.add_nproc_option(parser)
+    parser.add_argument('-J', '--nproc-scan', type=int, default=None,
+                        help='number of processes to use for scanning '
+                             'channels, default: same as --nproc')
+    parser.add_argument('--nproc-plot', type=int, default=None,
+                        help='number of processes to use for rendering plots '
+                             'while channels are scanned serially, ignored '
+                             'unless --nproc-scan is 1, default: same as '
+                             '--nproc')
+    parser.add_argument('--prefetch', type=int, default=1,
+                        help='maximum number of frametype groups of channel '
+                             'blocks to read (each with a single process) in '
+                             'the background while the current group is '
+                             'scanned, default: %(default)s')
+    parser.add_argument('--cluster-span', type=float, nargs=2, default=None,
+                        metavar=('GPSSTART', 'GPSEND'),
+                        help='GPS span of a cluster of nearby scans, if given '
+                             'then data are read and conditioned once over '
+                             'this span and shared via --cluster-cache, used '
+                             'by gwdetchar-omega-batch --cluster-window')
+    parser.add_argument('--cluster-cache', default=None,
+                        help='directory in which to cache data conditioned '
+                             'over --cluster-span')
+    return parser
+
+
+# -- main function ------------------------------------------------------------
+
+def main(args=None, pools=None):
+    """Parse command-line arguments, then compute and write an omega scan
+
+    Parameters
+    ----------
+    args : `list` of `str`, optional
+        command-line arguments, default: `sys.argv[1:]`
+
+    pools : `dict`, optional
+        pools of worker processes (see `parallel.worker_pool`) keyed by
+        their number of processes, any of which is re-used by this scan,
+        and to which any new pool is added and left open on exit, so
+        that a caller running many scans (e.g. `service.serve`) starts
+        each pool only once, default: start (and close) a new pool
+
+    Notes
+    -----
+    The working directory is changed to the output directory of the scan.
+    """
+    parser = create_parser()
+    args = parser.parse_args(args=args)
+    if args.replot and args.disable_checkpoint:
+        parser.error('--replot cannot be used with --disable-checkpoint')
+    if args.replot and not args.checkpoint_store:
+        parser.error('--replot requires --checkpoint-store')
+    if bool(args.cluster_span) != bool(args.cluster_cache):
+        parser.error(
+            '--cluster-span and --cluster-cache must be given together')
+
+    # get run parameters
+    if args.ifo:
+        ifo = args.ifo
+    else:
+        ifo = 'Network'
+    gps = numpy.around(float(args.gpstime), 2)
+
+    logger.info("{} Omega Scan {}".format(ifo, gps))
+
+    # get default configuration
+    if args.config_file is None:
+        args.config_file = config.get_default_configuration(ifo, gps)
+
+    # parse configuration files
+    args.config_file = [os.path.abspath(f) for f in args.config_file]
+    logger.debug('Parsing the following configuration files:')
+    for fname in args.config_file:
+        logger.debug(''.join([' -- ', fname]))
+    cp = config.parse_configuration(args.config_file, ifo=ifo)
+
+    # parse primary channel
+    if not args.disable_correlation:
+        try:
+            primary = config.OmegaChannelList(
+                'primary', **dict(cp.items('primary')))
+        except config.configparser.NoSectionError:
+            logger.warning(
+                'No primary configured, continuing without cross-correlation')
+            args.disable_correlation = True
+    cp.remove_section('primary')
+
+    # get contextual channel blocks
+    blocks = cp.get_channel_blocks()
+
+    # set up analyzed channel dict
+    if sys.version_info >= (3, 7):  # python 3.7+
+        analyzed = {}
+    else:
+        from collections import OrderedDict
+        analyzed = OrderedDict()
+
+    # record channels in configuration order, and those analyzed so far
+    order = [c for b in blocks.values() for c in b.channels]
+    scanned = {}
+    lastwrite = time.time()
+
+    # record the time (and, with --low-memory, memory) used by each stage
+    timer = timing.Timer(memory=args.low_memory)
+
+    # prepare html variables
+    htmlv = {
+        'title': '{} Qscan | {}'.format(ifo, gps),
+        'config': args.config_file,
+        'refresh': True,
+    }
+    if not args.disable_correlation:  # so that summary tables include it
+        htmlv['correlated'] = True
+        htmlv['primary'] = primary.channel.name
+
+    # set output directory
+    outdir = args.output_directory
+    if outdir is None:
+        outdir = os.path.expanduser('~/public_html/wdq/{ifo}_{gps}'.format(
+            ifo=ifo, gps=gps))
+    outdir = os.path.abspath(outdir)
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+    if args.checkpoint_store:
+        args.checkpoint_store = os.path.abspath(args.checkpoint_store)
+    if args.cluster_cache:
+        args.cluster_cache = os.path.abspath(args.cluster_cache)
+        if not os.path.isdir(args.cluster_cache):
+            os.makedirs(args.cluster_cache)
+    os.chdir(outdir)
+    logger.debug('Output directory created as {}'.format(outdir))
+
+    # -- compute Qscan --------------------------
+
+    # make subdirectories
+    plotdir = 'plots'
+    aboutdir = 'about'
+    datadir = 'data'
+    for d in [plotdir, aboutdir, datadir]:
+        if not os.path.isdir(d):
+            os.makedirs(d)
+
+    # determine checkpoints
+    summary = os.path.join(datadir, 'summary.csv')
+    if args.disable_checkpoint or not args.checkpoint_store:
+        store = None
+    else:
+        store = args.checkpoint_store
+        if not os.path.isdir(store):
+            os.makedirs(store)
+    if args.replot and os.path.exists(summary):
+        logger.debug('Replotting from {}'.format(store))
+        os.remove(summary)
+    if os.path.exists(summary) and not args.disable_checkpoint:
+        logger.debug('Checkpointing from {}'.format(
+            os.path.abspath(summary)))
+        record = Table.read(summary)
+        completed = {name: i for (i, name) in enumerate(record['Channel'])}
+        if not args.disable_correlation and ('Standard Deviation'
+                                             not in record.colnames):
+            raise KeyError(
+                'Cross-correlation is not available from this record, '
+                'consider running without correlation or starting from '
+                'scratch with --disable-checkpoint')
+    else:
+        record = []
+        completed = {}
+
+    def write_progress(force=False):
+        """Rebuild the table of contents in configuration order, then
+        rewrite the HTML page and summary tables if at least
+        `--html-interval` seconds have passed since the last rewrite (or
+        if `force=True`)
+        """
+        nonlocal lastwrite
+        if not force and (time.time() - lastwrite < args.html_interval):
+            return
+        analyzed.clear()
+        for c in order:
+            if c.name in scanned:
+                html.update_toc(analyzed, scanned[c.name],
+                                name=blocks[c.section].name)
+        htmlv['toc'] = analyzed
+        htmlv['timing'] = timer.summary()
+        timer.write(os.path.join(datadir, 'timing.json'), ifo=ifo, gps=gps)
+        with timer.stage('html'):
+            html.write_qscan_page(ifo, gps, analyzed, **htmlv)
+        lastwrite = time.time()
+
+    # set up html output
+    logger.debug('Setting up HTML at {}/index.html'.format(outdir))
+    html.write_qscan_page(ifo, gps, analyzed, **htmlv)
+
+    # start worker processes now (or re-use those of an earlier scan),
+    # before any thread reads data in the background
+    nproc = args.nproc_scan or args.nproc
+    nproc_plot = args.nproc_plot or args.nproc
+    owner = pools is None
+    pools = {} if owner else pools
+    size = nproc if nproc > 1 else nproc_plot
+    if size > 1 and size not in pools:
+        pools[size] = parallel.worker_pool(nproc, nproc_plot)
+    pool = pools.get(size)
+
+    def prefetch_blocks():
+        """Iterate over blocks in scan order, reading their data ahead
+        """
+        return parallel.prefetch_blocks(
+            scanorder, gps, ahead=args.prefetch,
+            skip=list(completed) + stored,
+            ignore_state_flags=args.ignore_state_flags,
+            span=args.cluster_span, cache=args.cluster_cache, timer=timer,
+            segment_cache=args.segment_cache, fused=args.fused_conditioning,
+            verbose='Reading block:'.rjust(30))
+
+    def condition_block(block, channels, data):
+        """Condition data for some channels from a block together, if
+        `--block-conditioning` was given
+        """
+        if args.block_conditioning and data and not args.cluster_cache:
+            with timer.stage('conditioner', block=block.key):
+                data = parallel.condition_channels(
+                    channels, data, block.fftlength, resample=block.resample,
+                    fused=args.fused_conditioning)
+        return data
+
+    def scan_block(block, channels, data, **kwargs):
+        """Scan some channels from a block, given data from
+        `condition_block`, yielding the results of `parallel.scan_channels`
+        """
+        return parallel.scan_channels(
+            channels, data, gps, block.fftlength, nproc=nproc,
+            nproc_plot=nproc_plot, resample=block.resample,
+            fthresh=args.far_threshold, search=block.search,
+            prefilter=not args.disable_prefilter, correlate=correlate,
+            dt=block.dt, colormap=args.colormap, cache=args.cluster_cache,
+            duration=block.duration, lowmem=args.low_memory,
+            fused=args.fused_conditioning, pool=pool, **kwargs)
+
+    # make sure that workers are stopped at once if the scan fails
+    try:
+        # launch omega scans
+        logger.info('Launching omega scans')
+
+        # construct a matched-filter from primary channel
+        if not args.disable_correlation:
+            logger.debug('Processing primary channel')
+            duration = primary.duration
+            fftlength = primary.fftlength
+            # process `duration` seconds of data centered on gps
+            name = primary.channel.name
+            start = gps - duration/2. - 1
+            end = gps + duration/2. + 1
+            with timer.stage('get_data', channel=name):
+                correlate = get_data(
+                    name, start, end, frametype=primary.frametype,
+                    source=primary.source, nproc=args.nproc,
+                    verbose='Reading primary:'.rjust(30))
+            with timer.stage('conditioner', channel=name):
+                correlate = core.primary(
+                    gps, primary.length, correlate, fftlength,
+                    resample=primary.resample, f_low=primary.flow,
+                    fused=args.fused_conditioning)
+            plot.timeseries_plot(correlate, gps, primary.length, name,
+                                 'plots/primary.png',
+                                 ylabel='Whitened Amplitude')
+            correlate = core.MatchedFilter(correlate)
+        else:
+            correlate = None
+
+        # range over channel blocks
+        stored = [c.name for b in blocks.values() for c in b.channels if
+                  parallel.is_stored(c, gps, b.fftlength, resample=b.resample,
+                                     fthresh=args.far_threshold,
+                                     search=b.search, duration=b.duration,
+                                     store=store,
+                                     fused=args.fused_conditioning)]
+        if args.quicklook:
+            scanorder = parallel.quicklook_order(
+                list(blocks.values()), primary=htmlv.get('primary'))
+        else:
+            scanorder = list(blocks.values())
+
+        # make provisional, coarse scans of every channel not yet
+        # checkpointed, which are replaced on the same page as each is
+        # refined below; data are then read again, so that at most
+        # --prefetch blocks are held in memory
+        if args.quicklook:
+            logger.info('Launching quick-look scans')
+            for (block, active, data) in prefetch_blocks():
+                channels = [c.quicklook() for c in block.channels if
+                            c.name not in completed and c.name not in stored]
+                if not (active and channels):
+                    continue
+                data = condition_block(block, channels, data)
+                logger.debug('Quick-look scan of block {}'.format(block.key))
+                for (_, channel, significant) in scan_block(
+                        block, channels, data, nt=parallel.QUICKLOOK_NT,
+                        nf=parallel.QUICKLOOK_NF,
+                        plottypes=parallel.QUICKLOOK_PLOTS):
+                    if channel is None:  # scan failed
+                        continue
+                    timer.extend(channel.timing, block=block.key,
+                                 quicklook=True)
+                    if significant:
+                        scanned[channel.name] = channel
+                data = None
+                write_progress(force=True)
+            logger.info(
+                'Quick-look scans complete, refining at full resolution')
+
+        for (block, active, data) in prefetch_blocks():
+            logger.debug('Processing block {}'.format(block.key))
+            chans = [c.name for c in block.channels]
+            # check that analysis flag was active for all of `duration`
+            if not active:
+                logger.info(
+                    ' -- {} not active, skipping block'.format(block.flag))
+                continue
+
+            # load checkpoints
+            for channel in block.channels:
+                if channel.name in completed:
+                    logger.info(' -- Checkpointing {} from a previous '
+                                'run'.format(channel.name))
+                    channel.load_loudest_tile_features(
+                        record[completed[channel.name]],
+                        correlated=correlate is not None)
+                    scanned[channel.name] = channel
+            if set(chans) & set(completed):
+                write_progress(force=True)
+
+            # process individual channels
+            channels = [c for c in block.channels if c.name not in completed]
+            logger.info(' -- Scanning {} channels with {} processes'.format(
+                len(channels), nproc))
+            data = condition_block(block, channels, data)
+            for (i, channel, significant) in scan_block(
+                    block, channels, data, store=store):
+                # drop any provisional result for this channel
+                scanned.pop(channels[i].name, None)
+                if channel is None:  # scan failed
+                    continue
+                timer.extend(channel.timing, block=block.key)
+                if args.low_memory:
+                    logger.info(' -- Peak memory for {}: {:.1f} MiB'.format(
+                        channel.name, channel.peak_memory / 2.**20))
+                if not significant:
+                    logger.warning(
+                        ' -- Channel {} not significant at white noise false '
+                        'alarm rate {} Hz'.format(channel.name,
+                                                  args.far_threshold))
+                    continue
+                logger.info(
+                    ' -- Completed omega scan of {}'.format(channel.name))
+                scanned[channel.name] = channel
+                # record a checkpoint, then update the page if it is due
+                html.append_summary_row(
+                    channel, correlated=correlate is not None)
+                write_progress()
+    except BaseException:  # e.g. within a service, do not re-use workers
+        if pool is not None:
+            pools.pop(size, None)
+            pool.terminate()
+            pool.join()
+            pool = None
+        timer.stop()
+        raise
+    finally:
+        if owner and pool is not None:
+            pool.close()
+            pool.join()
+
+    # -- prepare HTML ---------------------------
+
+    # write HTML page and finish
+    logger.debug('Finalizing HTML at {}/index.html'.format(outdir))
+    htmlv['refresh'] = False  # turn off auto-refresh
+    if scanned:
+        write_progress(force=True)
+    else:
+        reason = ('No significant channels found during active analysis '
+                  'segments')
+        htmlv['timing'] = timer.summary()
+        timer.write(os.path.join(datadir, 'timing.json'), ifo=ifo, gps=gps)
+        html.write_null_page(ifo, gps, reason, **htmlv)
+    timer.stop()
+    logger.info("-- index.html written, all done --")
+
+
+if __name__ == "__main__":  # pragma: no-cover
+    sys.exit(main())
@@ -25,6 +25,7 @@ from getpass import getuser
 from distutils.spawn import find_executable
 from pycondor import (Dagman, Job)
 
+from . import service
 from .. import condor
 
 __author__ = 'Alex Urban <alexander.urban@ligo.org>'
@@ -41,7 +42,11 @@ ACCOUNTING_GROUP_USER = os.getenv(
 
 def get_command_line_flags(ifo, colormap='viridis', nproc=8, far=3.171e-8,
                            config_file=None, disable_correlation=False,
-                           disable_checkpoint=False, ignore_state_flags=False):
+                           disable_checkpoint=False, checkpoint_store=None,
+                           ignore_state_flags=False,
+                           disable_prefilter=False, low_memory=False,
+                           fused_conditioning=False,
+                           block_conditioning=False, segment_cache=None):
     """Get a list of optional command-line arguments to `gwdetchar-omega`
     """
     flags = [
@@ -56,8 +61,20 @@ def get_command_line_flags(ifo, colormap='viridis', nproc=8, far=3.171e-8,
         flags.append("--disable-correlation")
     if disable_checkpoint:
         flags.append("--disable-checkpoint")
+    if checkpoint_store is not None:
+        flags.extend(("--checkpoint-store", os.path.abspath(checkpoint_store)))
     if ignore_state_flags:
         flags.append("--ignore-state-flags")
+    if disable_prefilter:
+        flags.append("--disable-prefilter")
+    if low_memory:
+        flags.append("--low-memory")
+    if fused_conditioning:
+        flags.append("--fused-conditioning")
+    if block_conditioning:
+        flags.append("--block-conditioning")
+    if segment_cache is not None:
+        flags.extend(("--segment-cache", os.path.abspath(segment_cache)))
     return flags
 
 
@@ -86,9 +103,34 @@ def get_condor_arguments(accounting_group=ACCOUNTING_GROUP,
     return condorcmds
 
 
+def cluster_times(times, window):
+    """Group GPS times into clusters of nearby times
+
+    Parameters
+    ----------
+    times : `list` of `float`
+        list of GPS times
+
+    window : `float`
+        maximum span (seconds) of each cluster
+
+    Returns
+    -------
+    clusters : `list` of `list` of `float`
+        sorted clusters of sorted times
+    """
+    clusters = []
+    for t in sorted(times):
+        if clusters and (t - clusters[-1][0] <= window):
+            clusters[-1].append(t)
+        else:
+            clusters.append([t])
+    return clusters
+
+
 def generate_dag(times, flags=[], tag='gwdetchar-omega-batch',
                  submit=False, outdir=os.getcwd(), universe='vanilla',
-                 condor_commands=get_condor_arguments()):
+                 condor_commands=get_condor_arguments(), cluster_window=None):
     """Construct a Directed Acyclic Graph (DAG) for a batch of omega scans
 
     Parameters
@@ -118,6 +160,12 @@ def generate_dag(times, flags=[], tag='gwdetchar-omega-batch',
         list of condor settings to process with, defaults to the output of
         `get_condor_arguments`
 
+    cluster_window : `float`, optional
+        if given, times are grouped by `cluster_times` with this window, and
+        each cluster of more than one time is processed by a single
+        `gwdetchar-omega-service` job that reads and conditions data once
+        over the whole cluster, default: one job per time
+
     Returns
     -------
     dagman : `~pycondor.Dagman`
@@ -125,26 +173,52 @@ def generate_dag(times, flags=[], tag='gwdetchar-omega-batch',
     """
     logdir = os.path.join(outdir, 'logs')
     subdir = os.path.join(outdir, 'condor')
-    executable = find_executable('gwdetchar-omega')
     # create DAG and jobs
     dagman = Dagman(name=tag, submit=subdir)
-    job = Job(
-        dag=dagman,
-        name=os.path.basename(executable),
-        executable=executable,
-        universe=universe,
-        submit=subdir,
-        error=logdir,
-        output=logdir,
-        getenv=True,
-        request_memory=4096 if universe != "local" else None,
-        extra_lines=condor_commands
-    )
-    # make a node in the workflow for each event time
-    for t in times:
-        cmd = " ".join([str(t)] + [
-            "--output-directory", os.path.join(outdir, str(t))] + flags)
-        job.add_arg(cmd, name=str(t).replace(".", "_"))
+    jobs = {}
+
+    def _job(exe):
+        if exe not in jobs:
+            executable = find_executable(exe)
+            jobs[exe] = Job(
+                dag=dagman,
+                name=os.path.basename(executable),
+                executable=executable,
+                universe=universe,
+                submit=subdir,
+                error=logdir,
+                output=logdir,
+                getenv=True,
+                request_memory=4096 if universe != "local" else None,
+                extra_lines=condor_commands
+            )
+        return jobs[exe]
+
+    # make a node in the workflow for each event time, or cluster of times
+    if cluster_window:
+        clusters = cluster_times(times, cluster_window)
+    else:
+        clusters = [[t] for t in times]
+    for cluster in clusters:
+        if len(cluster) == 1:
+            t = cluster[0]
+            cmd = " ".join([str(t)] + [
+                "--output-directory", os.path.join(outdir, str(t))] + flags)
+            _job('gwdetchar-omega').add_arg(
+                cmd, name=str(t).replace(".", "_"))
+            continue
+        # queue each time for a service sharing one span of data
+        name = "{}-{}".format(cluster[0], cluster[-1])
+        queue = os.path.join(outdir, 'clusters', name)
+        shared = [
+            "--cluster-span", str(cluster[0]), str(cluster[-1]),
+            "--cluster-cache", os.path.join(queue, service.CACHE_DIR)]
+        for t in cluster:
+            service.submit(queue, t, flags=flags + shared,
+                           outdir=os.path.join(outdir, str(t)))
+        _job('gwdetchar-omega-service').add_arg(
+            " ".join([queue, "--exit-when-empty"]),
+            name=name.replace(".", "_"))
     # write and submit the DAG
     dagman.build(fancyname=False)
     print("Workflow generated for {} times".format(len(times)))
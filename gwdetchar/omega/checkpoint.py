@@ -0,0 +1,274 @@
+# coding=utf-8
+# Copyright (C) Alex Urban (2019)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with GW DetChar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""HDF5 checkpoints of the signal-processing products of omega scans
+
+Each channel is stored in its own file, named for the channel and a hash of
+every setting that affects its signal processing, so that lookups are O(1)
+and a change of plot settings does not invalidate the store.
+"""
+
+import hashlib
+import os
+
+import h5py
+import numpy
+
+from gwpy.segments import Segment
+from gwpy.signal.qtransform import (QGram, QPlane)
+from gwpy.spectrogram import Spectrogram
+from gwpy.timeseries import TimeSeries
+
+from .core import interpolate_qgrams
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+
+SERIES_KEYS = ('raw', 'highpassed', 'whitened')
+# options for every dataset, matching `gwdetchar.io.datacache`
+DATASET_KWARGS = {'compression': 'gzip', 'compression_opts': 1,
+                  'shuffle': True}
+QGRAM_KEYS = ('whitened', 'highpassed')
+
+
+# -- utilities ----------------------------------------------------------------
+
+def config_hash(gps, channel, fftlength, duration, resample=None,
+                search=0.5, fthresh=1e-10, fused=False):
+    """Hash the settings that determine the signal processing of a channel
+
+    Parameters
+    ----------
+    gps : `float`
+        the GPS time (seconds) to scan
+
+    channel : `OmegaChannel`
+        `OmegaChannel` object corresponding to this data stream
+
+    fftlength : `float`
+        FFT integration length (in seconds) for ASD estimation
+
+    duration : `float`
+        duration (seconds) of data to scan
+
+    resample : `int`, optional
+        desired sampling rate (Hz) of the output if different from the input,
+        default: no resampling
+
+    search : `float`, optional
+        time window (seconds) around `gps` in which to find peak energies,
+        default: 0.5
+
+    fthresh : `float`, optional
+        threshold on false alarm rate (Hz) for this channel to be considered
+        interesting, default: 1e-10
+
+    fused : `bool`, optional
+        whether data are conditioned by `~gwdetchar.omega.whiten_highpass`,
+        default: `False`
+
+    Returns
+    -------
+    chash : `str`
+        a short hexadecimal digest of these settings
+    """
+    params = (
+        float(gps), channel.name, tuple(map(float, channel.qrange)),
+        tuple(map(float, channel.frange)), float(channel.mismatch),
+        bool(channel.always_plot), float(fftlength), float(duration or 0),
+        int(resample or 0), float(search), float(fthresh), bool(fused),
+    )
+    return hashlib.sha1(repr(params).encode('utf-8')).hexdigest()[:16]
+
+
+def checkpoint_path(store, channel, chash):
+    """Return the path of the checkpoint for a channel in a store
+
+    Parameters
+    ----------
+    store : `str`
+        path to the directory holding checkpoints
+
+    channel : `OmegaChannel`
+        `OmegaChannel` object corresponding to this data stream
+
+    chash : `str`
+        the hash of its settings, see `config_hash`
+
+    Returns
+    -------
+    path : `str`
+        the path of this checkpoint, which may not exist
+    """
+    return os.path.join(store, '{}-{}.h5'.format(
+        channel.name.replace(':', '-'), chash))
+
+
+def _write_series(group, key, series):
+    dset = group.create_dataset(key, data=series.value, **DATASET_KWARGS)
+    dset.attrs['t0'] = series.t0.value
+    dset.attrs['sample_rate'] = series.sample_rate.to('Hz').value
+    dset.attrs['name'] = str(series.name or '')
+
+
+def _read_series(dset):
+    return TimeSeries(dset[()], t0=dset.attrs['t0'],
+                      sample_rate=dset.attrs['sample_rate'],
+                      name=dset.attrs['name'] or None)
+
+
+def _write_qgram(group, key, qgram, search):
+    sub = group.create_group(key)
+    plane = qgram.plane
+    sub.attrs['q'] = plane.q
+    sub.attrs['frange'] = list(plane.frange)
+    sub.attrs['duration'] = plane.duration
+    sub.attrs['sampling'] = plane.sampling
+    sub.attrs['mismatch'] = plane.mismatch
+    sub.attrs['search'] = list(search)
+    for i, energy in enumerate(qgram.energies):
+        _write_series(sub, str(i), energy)
+
+
+def _read_qgram(sub):
+    plane = QPlane(sub.attrs['q'], tuple(sub.attrs['frange']),
+                   sub.attrs['duration'], sub.attrs['sampling'],
+                   mismatch=sub.attrs['mismatch'])
+    energies = [_read_series(sub[str(i)]) for i in range(len(sub))]
+    return QGram(plane, energies, Segment(*sub.attrs['search']))
+
+
+def _write_spectrogram(group, key, spec):
+    dset = group.create_dataset(key, data=spec.value, **DATASET_KWARGS)
+    dset.attrs['t0'] = spec.t0.value
+    dset.attrs['dt'] = spec.dt.value
+    dset.attrs['frequencies'] = spec.frequencies.value
+    dset.attrs['q'] = spec.q
+
+
+def _read_spectrogram(dset, lowmem=False):
+    data = dset[()]
+    if lowmem:
+        data = data.astype('float32', copy=False)
+    spec = Spectrogram(data, t0=dset.attrs['t0'],
+                       dt=dset.attrs['dt'],
+                       frequencies=dset.attrs['frequencies'])
+    spec.q = dset.attrs['q']
+    return spec
+
+
+def write_checkpoint(path, series, gps, search=0.5, pranges=None):
+    """Write the signal-processing products of a channel to a checkpoint
+
+    Parameters
+    ----------
+    path : `str`
+        the path of the checkpoint, see `checkpoint_path`
+
+    series : `tuple` or `None`
+        the output of `~gwdetchar.omega.scan`, or `None` to record that the
+        channel was not significant
+
+    gps : `float`
+        the GPS time (seconds) that was scanned
+
+    search : `float`, optional
+        time window (seconds) around `gps` in which to find peak energies,
+        default: 0.5
+
+    pranges : `list` of `int`, optional
+        plot time durations over which the spectrograms in `series` were
+        interpolated, default: `None`
+
+    Notes
+    -----
+    Every dataset is compressed, and stored in the precision of `series`.
+    Files are first written to a temporary path, then moved into place, so
+    that a checkpoint is never read while incomplete.
+    """
+    tmp = '{}.tmp'.format(path)
+    with h5py.File(tmp, 'w') as h5f:
+        h5f.attrs['significant'] = series is not None
+        if series is not None:
+            search = Segment(gps - search/2, gps + search/2)
+            (xoft, hpxoft, wxoft, qgram, rqgram, qspec, rqspec) = series
+            group = h5f.create_group('series')
+            for (key, ts) in zip(SERIES_KEYS, (xoft, hpxoft, wxoft)):
+                _write_series(group, key, ts)
+            group = h5f.create_group('qgram')
+            for (key, qg) in zip(QGRAM_KEYS, (qgram, rqgram)):
+                _write_qgram(group, key, qg, search)
+            group = h5f.create_group('spectrogram')
+            group.attrs['pranges'] = list(pranges or [])
+            for (key, spec) in zip(QGRAM_KEYS, (qspec, rqspec)):
+                _write_spectrogram(group, key, spec)
+    os.rename(tmp, path)
+
+
+def read_checkpoint(path, gps, pranges, nt=1400, nf=700, lowmem=False):
+    """Read the signal-processing products of a channel from a checkpoint
+
+    Parameters
+    ----------
+    path : `str`
+        the path of the checkpoint, see `checkpoint_path`
+
+    gps : `float`
+        the GPS time (seconds) that was scanned
+
+    pranges : `list` of `int`
+        plot time durations for the interpolated spectrograms; if these
+        differ from those stored, the spectrograms are re-interpolated
+
+    nt : `int`, optional
+        number of points on the time axis of the interpolated `Spectrogram`,
+        default: 1400
+
+    nf : `int`, optional
+        number of points on the (log-sampled) frequency axis of the
+        interpolated `Spectrogram`, default: 700
+
+    lowmem : `bool`, optional
+        whether to return the interpolated spectrograms in single precision,
+        default: `False`, in which case they are returned in the precision
+        in which they were stored
+
+    Returns
+    -------
+    series : `tuple` or `None`
+        the same products as returned by `~gwdetchar.omega.scan`, or `None`
+        if the channel was not significant
+    """
+    with h5py.File(path, 'r') as h5f:
+        if not h5f.attrs['significant']:
+            return None
+        (xoft, hpxoft, wxoft) = [
+            _read_series(h5f['series'][key]) for key in SERIES_KEYS]
+        (qgram, rqgram) = [
+            _read_qgram(h5f['qgram'][key]) for key in QGRAM_KEYS]
+        group = h5f['spectrogram']
+        if numpy.array_equal(group.attrs['pranges'], pranges):
+            (qspec, rqspec) = [
+                _read_spectrogram(group[key], lowmem=lowmem)
+                for key in QGRAM_KEYS]
+            return (xoft, hpxoft, wxoft, qgram, rqgram, qspec, rqspec)
+    # re-interpolate for new plot durations
+    tres = min(pranges) / nt
+    outseg = Segment(gps - max(pranges)/2, gps + max(pranges)/2)
+    (qspec, rqspec) = interpolate_qgrams(
+        (qgram, rqgram), tres, nf, outseg, lowmem=lowmem)
+    return (xoft, hpxoft, wxoft, qgram, rqgram, qspec, rqspec)
@@ -136,26 +136,34 @@ An example using many of the above options would look something like this:
 
 import sys
 import ast
+import copy
 import os.path
 import configparser
 import numpy
 
+from collections import OrderedDict
+
 from gwpy.detector import Channel
 
 from .. import const
 from ..io.html import FancyPlot
-
-if sys.version_info < (3, 7):
-    from collections import OrderedDict
+from ..utils import lru_cached
 
 __author__ = 'Alex Urban <alexander.urban@ligo.org>'
 __credits__ = 'Duncan Macleod <duncan.macleod@ligo.org>'
 
+# maximum number of parsed configurations to hold in memory at any one time
+CONFIG_CACHE_SIZE = 8
+
+# configurations already parsed by this process, keyed by file
+_CONFIGS = OrderedDict()
+
 
 # -- define parser ------------------------------------------------------------
 
 class OmegaConfigParser(configparser.ConfigParser):
-    def __init__(self, ifo=None, defaults=dict(), **kwargs):
+    def __init__(self, ifo=None, defaults=None, **kwargs):
+        defaults = dict(defaults or {})
         if ifo is not None:
             defaults.setdefault('IFO', ifo)
         configparser.ConfigParser.__init__(self, defaults=defaults, **kwargs)
@@ -202,6 +210,48 @@ def get_default_configuration(ifo, gpstime):
                 epoch=epoch, obs=ifo[0], ifo=ifo))]
 
 
+def parse_configuration(filenames, ifo=None):
+    """Parse configuration files, re-using an earlier parse if possible
+
+    Parameters
+    ----------
+    filenames : `list` of `str`
+        paths of the configuration files to read, in order
+
+    ifo : `str`, optional
+        interferometer ID string, e.g. `'L1'`, used as the default value
+        of ``IFO``
+
+    Returns
+    -------
+    cp : `OmegaConfigParser`
+        a new parser holding the contents of `filenames`, which can be
+        modified without affecting later calls
+
+    Notes
+    -----
+    At most `CONFIG_CACHE_SIZE` parses are held in memory, keyed by the
+    path and modification time of each file, so that any file edited since
+    it was last parsed is read again.
+    """
+    try:
+        key = (ifo,) + tuple((f, os.path.getmtime(f)) for f in filenames)
+    except OSError as exc:
+        raise IOError("Cannot read file %r" % exc.filename)
+
+    def _parse():
+        cp = OmegaConfigParser(ifo=ifo)
+        cp.read(filenames)
+        sections = OrderedDict([(cp.default_section, cp.defaults())])
+        for section in cp.sections():
+            sections[section] = OrderedDict(cp.items(section, raw=True))
+        return sections
+
+    cp = OmegaConfigParser(ifo=ifo)
+    cp.read_dict(lru_cached(_CONFIGS, CONFIG_CACHE_SIZE, key, _parse))
+    return cp
+
+
 def get_fancyplots(channel, plottype, duration, caption=None):
     """Construct FancyPlot objects for output HTML pages
 
@@ -269,6 +319,28 @@ class OmegaChannel(Channel):
                                         for t in self.pranges]
         self.section = section
         self.params = params.copy()
+        self.provisional = False
+
+    def quicklook(self):
+        """Return a provisional copy of this channel for a quick-look scan
+
+        Returns
+        -------
+        channel : `OmegaChannel`
+            a shallow copy of this channel, to be plotted only over the
+            shortest of its `pranges`, with ``provisional = True``
+
+        Notes
+        -----
+        The copy writes its plots to the same files as this channel, so
+        that they are overwritten once this channel is fully scanned.
+        """
+        out = copy.copy(self)
+        i = self.pranges.index(min(self.pranges))
+        out.pranges = [self.pranges[i]]
+        out.plots = {key: [plots[i]] for (key, plots) in self.plots.items()}
+        out.provisional = True
+        return out
 
     def save_loudest_tile_features(self, qgram, correlate=None, gps=0, dt=0.1):
         """Store properties of the loudest time-frequency tile
@@ -19,17 +19,674 @@
 """Core utilities for implementing omega scans
 """
 
-from scipy.signal import butter
+from collections import OrderedDict
+
+import numpy
+from scipy.fftpack import next_fast_len
+from scipy.interpolate import make_interp_spline
+from scipy.signal import (butter, get_window, sosfiltfilt, sosfreqz, welch)
 
 from gwpy.segments import Segment
-from gwpy.signal.qtransform import q_scan
+from gwpy.signal.filter_design import fir_from_transfer
+from gwpy.signal.qtransform import (QPlane, QTile, QTiling)
+from gwpy.spectrogram import Spectrogram
+from gwpy.timeseries import TimeSeries
+
+from . import timing
+from ..utils import lru_cached
 
 __author__ = 'Alex Urban <alexander.urban@ligo.org>'
 __credits__ = 'Duncan Macleod <duncan.macleod@ligo.org>'
 
+# maximum number of Q-tilings to hold in memory at any one time
+TILING_CACHE_SIZE = 8
+
+_TILINGS = OrderedDict()
+
+# maximum number of interpolation grids to hold in memory at any one time
+GRID_CACHE_SIZE = 8
+
+_GRIDS = OrderedDict()
+
+# maximum number of highpass filters (and their responses) to hold in
+# memory at any one time
+FILTER_CACHE_SIZE = 8
+
+_FILTERS = OrderedDict()
+_RESPONSES = OrderedDict()
+
+# default coarse mismatch and energy margin of the significance pre-filter
+PREFILTER_MISMATCH = 0.35
+PREFILTER_MARGIN = 2
+
+
+# -- cached Q-tilings ---------------------------------------------------------
+
+class _CachedQTile(QTile):
+    """`QTile` whose window and data indices are computed only once
+    """
+    def __init__(self, q, frequency, duration, sampling, mismatch=0.2):
+        super(_CachedQTile, self).__init__(
+            q, frequency, duration, sampling, mismatch=mismatch)
+        self._ntiles = QTile.ntiles.fget(self)
+        self._padding = QTile.padding.fget(self)
+        self._window = QTile.get_window(self)
+        indices = QTile.get_data_indices(self)
+        if (numpy.diff(indices) == 1).all():  # use a (faster) slice
+            indices = slice(indices[0], indices[-1] + 1)
+        self._indices = indices
+
+    @property
+    def ntiles(self):
+        return self._ntiles
+
+    @property
+    def padding(self):
+        return self._padding
+
+    def get_window(self):
+        return self._window
+
+    def get_data_indices(self):
+        return self._indices
+
+
+class _CachedQPlane(QPlane):
+    """`QPlane` whose rows of tiles are computed only once
+    """
+    def __init__(self, q, frange, duration, sampling, mismatch=0.2):
+        super(_CachedQPlane, self).__init__(
+            q, frange, duration, sampling, mismatch=mismatch)
+        self._frequencies = QPlane.frequencies.fget(self)
+        self._tiles = [
+            _CachedQTile(self.q, f, self.duration, self.sampling,
+                         mismatch=self.mismatch) for f in self._frequencies]
+
+    def __iter__(self):
+        return iter(self._tiles)
+
+    @property
+    def frequencies(self):
+        return self._frequencies
+
+
+class _CachedQTiling(QTiling):
+    """`QTiling` whose planes are computed only once
+    """
+    def __init__(self, duration, sampling, qrange, frange, mismatch=0.2):
+        super(_CachedQTiling, self).__init__(
+            duration, sampling, qrange=qrange, frange=frange,
+            mismatch=mismatch)
+        self._planes = [
+            _CachedQPlane(q, self.frange, self.duration, self.sampling,
+                          mismatch=self.mismatch) for q in self._iter_qs()]
+        # estimated number of statistically independent tiles
+        weight = 1 + numpy.log10(self.qrange[1] / self.qrange[0]) / 2**(1/2.)
+        nind = sum(1 + row.ntiles * row.deltam
+                   for plane in self._planes for row in plane)
+        self._nind = nind * weight / len(self._planes)
+
+    def __iter__(self):
+        return iter(self._planes)
+
+    def transform(self, fseries, **kwargs):
+        if not numpy.isfinite(fseries).all():
+            raise ValueError('Input signal contains non-numerical values')
+        (out, peak) = (None, 0)
+        # identify the plane with the loudest tile
+        for plane in self:
+            result = plane.transform(fseries, **kwargs)
+            if (out is None) or (result.peak['energy'] > peak):
+                out = result
+                peak = out.peak['energy']
+        return (out, self._nind)
+    transform.__doc__ = QTiling.transform.__doc__
+
+
+def get_tiling(duration, sampling, qrange, frange, mismatch=0.2):
+    """Retrieve a `QTiling` from an in-memory cache, building it if needed
+
+    Parameters
+    ----------
+    duration : `float`
+        the duration (seconds) of the data to be Q-transformed
+
+    sampling : `float`
+        sampling rate (Hz) of the data to be Q-transformed
+
+    qrange : `tuple` of `float`
+        `(low, high)` range of Qs to scan
+
+    frange : `tuple` of `float`
+        `(low, high)` range of frequencies to scan
+
+    mismatch : `float`, optional
+        maximum allowed fractional mismatch between neighbouring tiles,
+        default: 0.2
+
+    Returns
+    -------
+    tiling : `~gwpy.signal.qtransform.QTiling`
+        a tiling whose planes, tile windows, and data indices are computed
+        only once
+
+    Notes
+    -----
+    Tilings are keyed by all of the input parameters, and at most
+    `TILING_CACHE_SIZE` are held in memory; once full, the least recently
+    used tiling is evicted from the cache.
+    """
+    key = (float(duration), float(sampling), tuple(map(float, qrange)),
+           tuple(map(float, frange)), float(mismatch))
+    return lru_cached(_TILINGS, TILING_CACHE_SIZE, key, lambda: _CachedQTiling(
+        duration, sampling, qrange=qrange, frange=frange, mismatch=mismatch))
+
+
+# -- batched interpolation ----------------------------------------------------
+
+class InterpolationGrid(object):
+    """A regular time and log-frequency grid onto which to interpolate
+    `QGram` energies
+
+    Parameters
+    ----------
+    frequencies : `numpy.ndarray`
+        central frequencies (Hz) of the rows of the `QPlane` to interpolate
+
+    frange : `tuple` of `float`
+        `(low, high)` range of frequencies on the output grid
+
+    tres : `float`
+        time resolution (seconds) of the output grid
+
+    nf : `int`
+        number of log-sampled frequencies on the output grid
+
+    outseg : `~gwpy.segments.Segment`
+        GPS `[start, stop)` segment of the output grid
+
+    Notes
+    -----
+    This reproduces `QGram.interpolate` with ``logf=True``: each row of
+    energies is cast onto the output time axis with a cubic spline, then
+    each time sample is interpolated across frequency with a cubic spline,
+    holding values beyond the outermost rows constant. The latter step is
+    linear in the data, so it is reduced to a matrix of weights that is
+    computed once per grid and applied to every `QGram` with one matrix
+    product.
+    """
+    def __init__(self, frequencies, frange, tres, nf, outseg):
+        self.tres = float(tres)
+        self.outseg = Segment(*outseg)
+        self.times = numpy.arange(outseg[0], outseg[1], step=tres)
+        self.frequencies = numpy.logspace(
+            numpy.log10(frange[0]), numpy.log10(frange[1]), num=int(nf))
+        inner = numpy.clip(self.frequencies, frequencies[0], frequencies[-1])
+        self.weights = make_interp_spline(
+            frequencies, numpy.eye(len(frequencies)), k=3)(inner).T
+
+    def interpolate(self, qgrams):
+        """Interpolate `QGram` objects from the same `QPlane` onto this grid
+
+        Parameters
+        ----------
+        qgrams : `list` of `~gwpy.signal.qtransform.QGram`
+            the Q-grams to interpolate, whose rows of energies must all be
+            sampled identically, e.g. the whitened and high-passed Q-grams
+            of one channel
+
+        Returns
+        -------
+        specs : `list` of `~gwpy.spectrogram.Spectrogram`
+            the interpolated spectrogram of each input, with its Q recorded
+            as ``spec.q``
+        """
+        dtype = qgrams[0].energies[0].dtype
+        rows = numpy.empty(
+            (len(qgrams), self.times.size, len(qgrams[0].energies)),
+            dtype=dtype)
+        # cast each row onto the output time axis, for all inputs at once
+        for (i, row) in enumerate(qgrams[0].energies):
+            xrow = numpy.arange(row.x0.value, (row.x0 + row.duration).value,
+                                row.dx.value)
+            energies = numpy.column_stack(
+                [qgram.energies[i].value for qgram in qgrams])
+            rows[:, :, i] = make_interp_spline(
+                xrow, energies, k=3)(self.times).T
+        specs = []
+        for (qgram, energies) in zip(qgrams, rows):
+            spec = Spectrogram(
+                energies.dot(self.weights).astype(dtype, copy=False),
+                t0=self.outseg[0], dt=self.tres,
+                frequencies=self.frequencies)
+            spec.q = qgram.plane.q
+            specs.append(spec)
+        return specs
+
+
+def get_grid(plane, tres, nf, outseg):
+    """Retrieve an `InterpolationGrid` from an in-memory cache, building it
+    if needed
+
+    Parameters
+    ----------
+    plane : `~gwpy.signal.qtransform.QPlane`
+        the plane of the `QGram` objects to interpolate
+
+    tres : `float`
+        time resolution (seconds) of the output grid
+
+    nf : `int`
+        number of log-sampled frequencies on the output grid
+
+    outseg : `~gwpy.segments.Segment`
+        GPS `[start, stop)` segment of the output grid
+
+    Returns
+    -------
+    grid : `InterpolationGrid`
+        a grid whose frequency interpolation weights are computed only once
+
+    Notes
+    -----
+    Grids are keyed by the parameters of `plane` and of the output grid,
+    and at most `GRID_CACHE_SIZE` are held in memory; once full, the least
+    recently used grid is evicted from the cache.
+    """
+    key = (float(plane.q), tuple(map(float, plane.frange)),
+           float(plane.duration), float(plane.sampling),
+           float(plane.mismatch), float(tres), int(nf),
+           tuple(map(float, outseg)))
+    return lru_cached(_GRIDS, GRID_CACHE_SIZE, key, lambda: InterpolationGrid(
+        plane.frequencies, plane.frange, tres, nf, outseg))
+
+
+def interpolate_qgrams(qgrams, tres, nf, outseg, lowmem=False):
+    """Interpolate `QGram` objects from the same `QPlane` onto a shared grid
+
+    Parameters
+    ----------
+    qgrams : `list` of `~gwpy.signal.qtransform.QGram`
+        the Q-grams to interpolate, e.g. the whitened and high-passed
+        Q-grams of one channel
+
+    tres : `float`
+        time resolution (seconds) of the output `Spectrogram`
+
+    nf : `int`
+        number of log-sampled frequencies of the output `Spectrogram`
+
+    outseg : `~gwpy.segments.Segment`
+        GPS `[start, stop)` segment of the output `Spectrogram`
+
+    lowmem : `bool`, optional
+        whether to return spectrograms in single precision, default: `False`
+
+    Returns
+    -------
+    specs : `list` of `~gwpy.spectrogram.Spectrogram`
+        the interpolated spectrogram of each input, equivalent to
+        ``qgram.interpolate(tres=tres, fres=nf, logf=True, outseg=outseg)``
+
+    See Also
+    --------
+    get_grid
+        for the cache of grids shared between calls
+    """
+    specs = get_grid(qgrams[0].plane, tres, nf, outseg).interpolate(qgrams)
+    if lowmem:
+        for (i, spec) in enumerate(specs):
+            specs[i] = spec.astype('float32')
+            specs[i].q = spec.q
+    return specs
+
+
+def q_plane(fseries, q, frange, duration, sampling, mismatch=0.2,
+            **kwargs):
+    """Q-transform frequency-domain data over a single plane of fixed Q
+
+    Parameters
+    ----------
+    fseries : `numpy.ndarray`
+        the complex FFT of a time-series data set, as returned by
+        `~gwpy.timeseries.TimeSeries.fft`
+
+    q : `float`
+        the Q-value for this plane
+
+    frange : `tuple` of `float`
+        `(low, high)` range of frequencies for this plane
+
+    duration : `float`
+        the duration (seconds) of the data to be Q-transformed
+
+    sampling : `float`
+        sampling rate (Hz) of the data to be Q-transformed
+
+    mismatch : `float`, optional
+        maximum allowed fractional mismatch between neighbouring tiles,
+        default: 0.2
+
+    **kwargs : `dict`, optional
+        additional keyword arguments to `QPlane.transform`, including
+        ``'epoch'`` and ``'search'``
+
+    Returns
+    -------
+    qgram : `~gwpy.signal.qtransform.QGram`
+        signal energies over the time-frequency plane
+
+    Notes
+    -----
+    If a matching plane is found among the cached tilings (see
+    `get_tiling`), its tile windows and data indices are reused, otherwise
+    a new plane is constructed but not cached.
+    """
+    if not numpy.isfinite(fseries).all():
+        raise ValueError('Input signal contains non-numerical values')
+    plane = _find_plane(q, frange, duration, sampling, mismatch)
+    if plane is None:
+        plane = _CachedQPlane(q, frange, duration, sampling,
+                              mismatch=mismatch)
+    return plane.transform(fseries, **kwargs)
+
+
+def _find_plane(q, frange, duration, sampling, mismatch):
+    """Find a matching plane among cached tilings, or return `None`
+    """
+    frange = list(map(float, frange))
+    for tiling in reversed(list(_TILINGS.values())):
+        if (tiling.duration, tiling.sampling, tiling.mismatch) != (
+                duration, sampling, mismatch):
+            continue
+        for plane in tiling:
+            if plane.q == q and list(plane.frange) == frange:
+                return plane
+
+
+def q_scan(data, mismatch=0.2, qrange=(4, 64), frange=(0, float('inf')),
+           duration=None, sampling=None, **kwargs):
+    """Transform data by scanning over a cached `QTiling`
+
+    Parameters
+    ----------
+    data : `~gwpy.timeseries.TimeSeries` or `numpy.ndarray`
+        the time-domain input data, or its complex FFT
+
+    mismatch : `float`, optional
+        maximum allowed fractional mismatch between neighbouring tiles,
+        default: 0.2
+
+    qrange : `tuple` of `float`, optional
+        `(low, high)` range of Qs to scan, default: `(4, 64)`
+
+    frange : `tuple` of `float`, optional
+        `(low, high)` range of frequencies to scan, default: `(0, inf)`
+
+    duration : `float`, optional
+        duration (seconds) of input, required if `data` is not a `TimeSeries`
+
+    sampling : `float`, optional
+        sample rate (Hz) of input, required if `data` is not a `TimeSeries`
+
+    **kwargs : `dict`, optional
+        additional keyword arguments to `QTiling.transform`, including
+        ``'epoch'`` and ``'search'``
+
+    Returns
+    -------
+    qgram : `~gwpy.signal.qtransform.QGram`
+        the raw output of `QTiling.transform`
+
+    far : `float`
+        expected false alarm rate (Hz) of white Gaussian noise with the
+        same peak energy and total duration as `qgram`
+
+    See Also
+    --------
+    get_tiling
+        for details on how tilings are cached
+    gwpy.signal.qtransform.q_scan
+        for the equivalent, uncached utility
+    """
+    if isinstance(data, TimeSeries):
+        duration = abs(data.span)
+        sampling = data.sample_rate.to('Hz').value
+        kwargs.update({'epoch': data.t0.value})
+        data = data.fft().value
+    tiling = get_tiling(duration, sampling, qrange, frange, mismatch=mismatch)
+    qgram, N = tiling.transform(data, **kwargs)
+    far = 1.5 * N * numpy.exp(-qgram.peak['energy']) / duration
+    return (qgram, far)
+
+
+def screen_significance(fseries, duration, sampling, qrange, frange,
+                        fthresh, mismatch=0.2, coarse=PREFILTER_MISMATCH,
+                        margin=PREFILTER_MARGIN, **kwargs):
+    """Screen frequency-domain data for significance with a coarse Q-tiling
+
+    Parameters
+    ----------
+    fseries : `numpy.ndarray`
+        the complex FFT of a whitened time-series data set
+
+    duration : `float`
+        the duration (seconds) of the data
+
+    sampling : `float`
+        sampling rate (Hz) of the data
+
+    qrange : `tuple` of `float`
+        `(low, high)` range of Qs to scan
+
+    frange : `tuple` of `float`
+        `(low, high)` range of frequencies to scan
+
+    fthresh : `float`
+        threshold on false alarm rate (Hz) for the full-resolution scan
+
+    mismatch : `float`, optional
+        maximum fractional mismatch of the full-resolution tiling,
+        default: 0.2
+
+    coarse : `float`, optional
+        maximum fractional mismatch of the coarse tiling used for
+        screening, default: `PREFILTER_MISMATCH`
+
+    margin : `float`, optional
+        extra normalized energy added to the coarse peak before it is
+        compared against `fthresh`, default: `PREFILTER_MARGIN`
+
+    **kwargs : `dict`, optional
+        additional keyword arguments to `QTiling.transform`, including
+        ``'epoch'`` and ``'search'``
+
+    Returns
+    -------
+    significant : `bool`
+        `False` if the data cannot plausibly reach a false alarm rate below
+        `fthresh` on the full-resolution tiling, otherwise `True`
+
+    Notes
+    -----
+    The loudest coarse tile recovers at least ``1 - coarse`` of the energy
+    of the loudest full-resolution tile, while the full-resolution tiling
+    draws on more independent tiles than the coarse one. The coarse peak
+    energy is therefore corrected for both effects, then padded by
+    `margin`, so that this screen is conservative: it should only ever
+    reject data that the full-resolution scan would also reject.
+
+    If `coarse` is no larger than `mismatch`, no screening is done.
+    """
+    if coarse <= mismatch:
+        return True
+    fine = get_tiling(duration, sampling, qrange, frange, mismatch=mismatch)
+    (qgram, N) = get_tiling(
+        duration, sampling, qrange, frange, mismatch=coarse,
+    ).transform(fseries, **kwargs)
+    energy = (qgram.peak['energy'] / (1 - coarse) +
+              numpy.log(fine._nind / N) + margin)
+    far = 1.5 * fine._nind * numpy.exp(-energy) / duration
+    return far < fthresh
+
 
 # -- basic utilities ----------------------------------------------------------
 
+def get_highpass(order, corner, fs, analog=False, ftype='sos'):
+    """Retrieve a Butterworth highpass filter from an in-memory cache,
+    designing it if needed
+
+    Parameters
+    ----------
+    order : `int`
+        order of the filter
+
+    corner : `float`
+        corner frequency (Hz) of the filter
+
+    fs : `float`
+        sampling rate (Hz) of the data to be filtered
+
+    analog : `bool`, optional
+        when True, return an analog filter, otherwise a digital filter is
+        returned, default: False
+
+    ftype : `str`, optional
+        type of filter: numerator/denominator (`'ba'`), pole-zero (`'zpk'`), or
+        second-order sections (`'sos'`), default: `'sos'`
+
+    Returns
+    -------
+    hpfilt : `numpy.ndarray` or `tuple`
+        the filter, as returned by `scipy.signal.butter`, which should not
+        be modified in-place
+
+    Notes
+    -----
+    At most `FILTER_CACHE_SIZE` filters are held in memory; once full, the
+    least recently used filter is evicted from the cache.
+    """
+    key = (int(order), float(corner), float(fs), bool(analog), str(ftype))
+    return lru_cached(_FILTERS, FILTER_CACHE_SIZE, key, lambda: butter(
+        order, corner, btype='highpass', analog=analog, output=ftype, fs=fs))
+
+
+def _highpass_response(order, corner, fs, size):
+    """Squared magnitude response of a cached highpass on an FFT grid
+
+    This is the (zero-phase) response of the filter applied forwards and
+    backwards, evaluated at the `numpy.fft.rfftfreq` of `size` samples.
+    """
+    def _build():
+        freqs = numpy.fft.rfftfreq(size, d=1./fs)
+        sos = get_highpass(order, corner, fs)
+        return numpy.abs(sosfreqz(sos, worN=freqs, fs=fs)[1]) ** 2
+
+    key = (int(order), float(corner), float(fs), int(size))
+    return lru_cached(_RESPONSES, FILTER_CACHE_SIZE, key, _build)
+
+
+def _detrend(values):
+    """Remove the least-squares linear trend along the last axis of an
+    array in-place
+    """
+    times = numpy.arange(values.shape[-1]) - (values.shape[-1] - 1) / 2.
+    values -= values.mean(axis=-1, keepdims=True)
+    values -= numpy.multiply.outer(
+        values.dot(times) / times.dot(times), times)
+    return values
+
+
+def _odd_ext(values, n):
+    """Extend each row of a 2-D array by `n` samples at either end, by
+    point reflection about its end samples, as `scipy.signal.filtfilt` does
+    """
+    left = 2 * values[:, :1] - values[:, n:0:-1]
+    right = 2 * values[:, -1:] - values[:, -2:-n - 2:-1]
+    return numpy.concatenate((left, values, right), axis=-1)
+
+
+def _resample(stack, fs, rate):
+    """Resample the rows of a 2-D array with `TimeSeries.resample`
+
+    Each row is resampled in turn, so that the anti-aliasing filter (and
+    its treatment of the edges) is exactly that used by `conditioner`.
+    """
+    if numpy.isclose(fs / rate, 1., rtol=1e-9, atol=0.):
+        return stack
+    return numpy.stack([TimeSeries(row, sample_rate=fs).resample(rate).value
+                        for row in stack])
+
+
+def _asd(stack, fs, fftlength, overlap, method, window):
+    """ASD of each row of a 2-D array, interpolated onto its FFT grid
+    """
+    try:
+        average = {'median': 'median', 'welch': 'mean'}[method]
+    except KeyError:
+        raise ValueError("Unsupported FFT-averaging method '{}'".format(
+            method))
+    (freqs, psd) = welch(stack, fs=fs, window=window,
+                         nperseg=int(fftlength * fs),
+                         noverlap=int(overlap * fs), average=average,
+                         axis=-1)
+    # linear interpolation, with weights shared by every row
+    index = numpy.interp(numpy.fft.rfftfreq(stack.shape[-1], d=1./fs),
+                         freqs, numpy.arange(freqs.size))
+    low = numpy.floor(index).astype(int)
+    high = numpy.minimum(low + 1, freqs.size - 1)
+    weight = index - low
+    asd = numpy.sqrt(psd)
+    return asd[:, low] * (1 - weight) + asd[:, high] * weight
+
+
+def _whiten_stack(stack, fs, fftlength, overlap=None, f_low=None,
+                  fused=False, order=12, method='median', window='hann',
+                  fduration=2):
+    """High-pass and whiten each row of a 2-D array
+
+    This follows `highpass` and `whiten` (to within rounding error), or
+    `whiten_highpass` if `fused` is `True`, and returns the whitened and
+    high-passed arrays; the latter is `stack` itself if `f_low` is `None`.
+    """
+    if overlap is None:
+        overlap = fftlength / 2
+    size = stack.shape[-1]
+    ntaps = int(fduration * fs)
+    edge = 0  # samples of padding either side of each row
+    if fused and f_low is not None:  # apply the highpass response
+        edge = min(ntaps, size - 1)
+        nfft = next_fast_len(size + 2 * edge)
+        fseries = numpy.fft.rfft(_odd_ext(_detrend(stack.copy()), edge),
+                                 nfft, axis=-1)
+        fseries *= _highpass_response(order, f_low / 1.5, fs, nfft)
+        hpstack = numpy.fft.irfft(fseries, nfft, axis=-1)[
+            :, edge:edge + size]
+    else:  # filter forwards and backwards, then taper the edges
+        hpstack = stack if f_low is None else sosfiltfilt(
+            get_highpass(order, f_low / 1.5, fs), stack, axis=-1)
+        in_ = _detrend(hpstack.copy())
+        pad = int(numpy.ceil(ntaps / 2))
+        taper = get_window(window, ntaps)
+        in_[:, :pad] *= taper[:pad]
+        in_[:, -pad:] *= taper[-pad:]
+        nfft = next_fast_len(size + ntaps - 1)
+        fseries = numpy.fft.rfft(in_, nfft, axis=-1)
+        del in_
+    # design each whitening filter as `TimeSeries.whiten` would
+    asd = _asd(hpstack, fs, fftlength, overlap, method, window)
+    kernels = numpy.zeros((stack.shape[0], nfft))
+    for (kernel, row) in zip(kernels, asd):
+        kernel[:ntaps] = fir_from_transfer(1 / row, ntaps=ntaps,
+                                           window=window)
+    fseries *= numpy.fft.rfft(kernels, axis=-1)
+    del kernels
+    # centre the convolution on each input sample and normalise
+    wstack = numpy.roll(numpy.fft.irfft(fseries, nfft, axis=-1),
+                        -((ntaps - 1) // 2), axis=-1)[:, edge:edge + size]
+    return (_detrend(wstack * numpy.sqrt(2. / fs)), hpstack)
+
+
 def highpass(series, f_low, order=12, analog=False, ftype='sos'):
     """High-pass a `TimeSeries` with a Butterworth filter
 
@@ -62,6 +719,9 @@ def highpass(series, f_low, order=12, analog=False, ftype='sos'):
     This utility designs a Butterworth filter of order `order` with corner
     frequency `f_low / 1.5`, then applies this filter to the input.
 
+    Filters are designed once per `(order, corner, fs)`, see
+    `get_highpass`.
+
     See Also
     --------
     scipy.signal.butter
@@ -69,8 +729,7 @@ def highpass(series, f_low, order=12, analog=False, ftype='sos'):
     """
     corner = f_low / 1.5
     fs = series.sample_rate.to('Hz').value
-    hpfilt = butter(order, corner, btype='highpass', analog=analog,
-                    output=ftype, fs=fs)
+    hpfilt = get_highpass(order, corner, fs, analog=analog, ftype=ftype)
     hpseries = series.filter(hpfilt, filtfilt=True)
     return hpseries
 
@@ -118,10 +777,81 @@ def whiten(series, fftlength, overlap=None, method='median', window='hann',
                          detrend=detrend, method=method).detrend(detrend)
 
 
+def whiten_highpass(series, f_low, fftlength, overlap=None, order=12,
+                    method='median', window='hann', fduration=2):
+    """High-pass and whiten a `TimeSeries` in a single frequency-domain pass
+
+    Parameters
+    ----------
+    series : `~gwpy.timeseries.TimeSeries`
+        the `TimeSeries` data to condition
+
+    f_low : `float`
+        lower cutoff frequency (Hz) of the filter
+
+    fftlength : `float`
+        FFT integration length (in seconds) for ASD estimation
+
+    overlap : `float`, optional
+        seconds of overlap between FFTs, defaults to half the FFT length
+
+    order : `int`, optional
+        order of the Butterworth highpass, default: 12
+
+    method : `str`, optional
+        FFT-averaging method, default: ``'median'``
+
+    window : `str`, optional
+        window function to apply to timeseries prior to FFT, and to the
+        whitening filter, default: ``'hann'``
+
+    fduration : `float`, optional
+        duration (seconds) of the whitening filter, default: 2
+
+    Returns
+    -------
+    wxoft : `~gwpy.timeseries.TimeSeries`
+        a whitened version of the input data with zero mean and unit variance
+
+    hpxoft : `~gwpy.timeseries.TimeSeries`
+        high-passed version of the input data
+
+    Notes
+    -----
+    The detrended input is transformed once; the squared magnitude
+    response of the highpass (that of `highpass`, which filters forwards
+    and backwards) and the transfer function of the truncated inverse-ASD
+    filter used by `~gwpy.timeseries.TimeSeries.whiten` are then applied
+    as products on the same frequency grid, so that only one inverse
+    transform is needed for each output.
+
+    To keep these (circular) products from wrapping one edge of the data
+    onto the other, the input is first extended by `fduration` seconds at
+    either end by point reflection, as `highpass` pads its input, and the
+    extension is discarded afterwards; the edge taper of `whiten` is not
+    applied. Compared with the output of `conditioner` (without
+    ``fused``), more than 2 seconds from either edge, ``hpxoft`` agrees to
+    within 0.1% RMS, and ``wxoft`` agrees to within 2% RMS above
+    ``2 * f_low``. Closer to `f_low` the whitened outputs differ by more,
+    since the ASD there is dominated by the (different) edge effects of
+    each highpass, which whitening then amplifies.
+    """
+    fs = series.sample_rate.to('Hz').value
+    (wstack, hpstack) = _whiten_stack(
+        series.value.astype('float64')[numpy.newaxis], fs, fftlength,
+        overlap=overlap, f_low=f_low, fused=True, order=order,
+        method=method, window=window, fduration=fduration)
+    wxoft = type(series)(wstack[0])
+    wxoft.__array_finalize__(series)
+    hpxoft = type(series)(hpstack[0])
+    hpxoft.__array_finalize__(series)
+    return (wxoft, hpxoft)
+
+
 # -- omega scans --------------------------------------------------------------
 
 def conditioner(xoft, fftlength, overlap=None, resample=None, f_low=None,
-                **kwargs):
+                fused=False, **kwargs):
     """Condition some input data for an omega scan
 
     Parameters
@@ -142,8 +872,14 @@ def conditioner(xoft, fftlength, overlap=None, resample=None, f_low=None,
     f_low : `float`, optional
         lower cutoff frequency (Hz) of the filter, default: `None`
 
+    fused : `bool`, optional
+        whether to high-pass and whiten in a single frequency-domain pass,
+        see `omega.whiten_highpass` for its tolerance against the default
+        (time-domain) path, ignored if `f_low` is `None`, default: `False`
+
     **kwargs : `dict`, optional
-        additional arguments to `omega.highpass`
+        additional arguments to `omega.highpass`, or to
+        `omega.whiten_highpass` if `fused` is `True`
 
     Returns
     -------
@@ -163,12 +899,88 @@ def conditioner(xoft, fftlength, overlap=None, resample=None, f_low=None,
     if f_low is None:
         wxoft = whiten(xoft, fftlength, overlap=overlap)
         return (wxoft, xoft)
+    elif fused:
+        wxoft, hpxoft = whiten_highpass(
+            xoft, f_low, fftlength, overlap=overlap, **kwargs)
+        return (wxoft, hpxoft, xoft)
     else:
         hpxoft = highpass(xoft, f_low, **kwargs)
         wxoft = whiten(hpxoft, fftlength, overlap=overlap)
         return (wxoft, hpxoft, xoft)
 
 
+def condition_block(data, fftlength, overlap=None, resample=None, f_low=None,
+                    fused=False, order=12):
+    """Condition many data streams for omega scans at once
+
+    Parameters
+    ----------
+    data : `dict` of `~gwpy.timeseries.TimeSeries`
+        the data to condition, keyed by channel name, e.g. a
+        `~gwpy.timeseries.TimeSeriesDict`
+
+    fftlength : `float`
+        FFT integration length (in seconds) for ASD estimation
+
+    overlap : `float`, optional
+        seconds of overlap between FFTs, defaults to half the FFT length
+
+    resample : `int`, optional
+        desired sampling rate (Hz) of the output if different from the input,
+        default: no resampling
+
+    f_low : `float`, optional
+        lower cutoff frequency (Hz) of the filter, default: `None`
+
+    fused : `bool`, optional
+        whether to high-pass and whiten in a single frequency-domain pass,
+        see `omega.whiten_highpass`, ignored if `f_low` is `None`,
+        default: `False`
+
+    order : `int`, optional
+        order of the Butterworth highpass, default: 12
+
+    Returns
+    -------
+    conditioned : `collections.OrderedDict`
+        for each channel in `data`, in order, the same tuple of
+        `~gwpy.timeseries.TimeSeries` as returned by `omega.conditioner`
+
+    Notes
+    -----
+    Data that share a sample rate, start time, and length are stacked into
+    one 2-D array, so that high-pass filtering, ASD estimation, and
+    whitening each run as a single vectorised call along the time axis;
+    only resampling (by `~gwpy.timeseries.TimeSeries.resample`, so that
+    edges are treated identically) and the design of each whitening filter
+    loop over channels.
+    The results agree with those of `omega.conditioner` to within rounding
+    error, and each is a view of one row of its conditioned array.
+    """
+    groups = OrderedDict()
+    for (name, series) in data.items():
+        key = (series.sample_rate.to('Hz').value, series.t0.value,
+               series.size)
+        groups.setdefault(key, []).append(name)
+    out = {}
+    for ((fs, _, _), names) in groups.items():
+        rate = float(resample or fs)
+        stack = _resample(numpy.stack(
+            [data[name].value for name in names]).astype('float64'),
+            fs, rate)
+        (wstack, hpstack) = _whiten_stack(
+            stack, rate, fftlength, overlap=overlap, f_low=f_low,
+            fused=fused, order=order)
+        stacks = (wstack, stack) if f_low is None else (
+            wstack, hpstack, stack)
+        for (i, name) in enumerate(names):
+            series = data[name]
+            out[name] = tuple(type(series)(
+                arr[i], t0=series.t0, sample_rate=rate, name=series.name,
+                channel=series.channel, unit=series.unit) for arr in stacks)
+    return OrderedDict((name, out[name]) for name in data)
+
+
 def primary(gps, length, hoft, fftlength, resample=None, f_low=None,
             **kwargs):
     """Condition the primary channel for use as a matched-filter
@@ -210,6 +1022,96 @@ def primary(gps, length, hoft, fftlength, resample=None, f_low=None,
     return out.crop(gps - length/2, gps + length/2).taper()
 
 
+class MatchedFilter(object):
+    """A reusable matched-filter, built once from a conditioned primary
+
+    Parameters
+    ----------
+    hoft : `~gwpy.timeseries.TimeSeries`
+        the conditioned primary channel, e.g. the output of `omega.primary`
+
+    window : `str`, optional
+        window function to apply to the boundaries of each input,
+        default: ``'hann'``
+
+    detrend : `str`, optional
+        type of detrending to apply to each input and to the filter,
+        default: ``'linear'``
+
+    Notes
+    -----
+    For each sample rate encountered, a resampled and detrended copy of the
+    primary is cached, along with its FFT at each required length, so that
+    correlating many channels of the same length and sample rate costs one
+    forward and one inverse FFT per channel. The output is equivalent to
+    that of `~gwpy.timeseries.TimeSeries.correlate`.
+    """
+    def __init__(self, hoft, window='hann', detrend='linear'):
+        self.hoft = hoft
+        self.window = window
+        self.detrend = detrend
+        self._filters = {}
+        self._ffts = {}
+
+    def _get_filter(self, rate):
+        """Return the time-reversed filter and its norm at this sample rate
+        """
+        try:
+            return self._filters[rate]
+        except KeyError:
+            hoft = self.hoft
+            if hoft.sample_rate.to('Hz').value != rate:
+                hoft = hoft.resample(rate)
+            fir = hoft.detrend(self.detrend).value[::-1]
+            self._filters[rate] = (fir, numpy.sqrt((fir ** 2).sum()))
+            return self._filters[rate]
+
+    def _get_fft(self, rate, nfft):
+        """Return the FFT of the filter at this sample rate and length
+        """
+        try:
+            return self._ffts[rate, nfft]
+        except KeyError:
+            fir, _ = self._get_filter(rate)
+            self._ffts[rate, nfft] = numpy.fft.rfft(fir, nfft)
+            return self._ffts[rate, nfft]
+
+    def correlate(self, xoft):
+        """Cross-correlate a `TimeSeries` with this matched-filter
+
+        Parameters
+        ----------
+        xoft : `~gwpy.timeseries.TimeSeries`
+            the `TimeSeries` data to analyze
+
+        Returns
+        -------
+        out : `~gwpy.timeseries.TimeSeries`
+            the output of a single phase matched-filter
+        """
+        # make sure series have consistent sample rates
+        rate = min(xoft.sample_rate.to('Hz').value,
+                   self.hoft.sample_rate.to('Hz').value)
+        if xoft.sample_rate.to('Hz').value > rate:
+            xoft = xoft.resample(rate)
+        fir, stdev = self._get_filter(rate)
+        # window the boundaries of the detrended input
+        in_ = xoft.detrend(self.detrend).value
+        pad = int(numpy.ceil(fir.size / 2))
+        window = get_window(self.window, fir.size)
+        in_[:pad] *= window[:pad]
+        in_[-pad:] *= window[-pad:]
+        # convolve in one pass, keeping the central (same-size) output
+        nfull = in_.size + fir.size - 1
+        nfft = next_fast_len(nfull)
+        conv = numpy.fft.irfft(
+            numpy.fft.rfft(in_, nfft) * self._get_fft(rate, nfft), nfft)
+        start = (fir.size - 1) // 2
+        out = type(xoft)(conv[start:start+in_.size] / stdev)
+        out.__array_finalize__(xoft)
+        return out
+
+
 def cross_correlate(xoft, hoft):
     """Cross-correlate two `TimeSeries` by matched-filter
 
@@ -218,14 +1120,17 @@ def cross_correlate(xoft, hoft):
     xoft : `~gwpy.timeseries.TimeSeries`
         the `TimeSeries` data to analyze
 
-    hoft : `~gwpy.timeseries.TimeSeries`
-        a `TimeSeries` data to use as a matched-filter
+    hoft : `~gwpy.timeseries.TimeSeries` or `MatchedFilter`
+        a `TimeSeries` data to use as a matched-filter, or a pre-built
+        `MatchedFilter`
 
     Returns
     -------
     out : `~gwpy.timeseries.TimeSeries`
         the output of a single phase matched-filter
     """
+    if isinstance(hoft, MatchedFilter):
+        return hoft.correlate(xoft)
     # make sure series have consistent sample rates
     if hoft.sample_rate.value < xoft.sample_rate.value:
         xoft = xoft.resample(hoft.sample_rate.value)
@@ -236,7 +1141,8 @@ def cross_correlate(xoft, hoft):
 
 
 def scan(gps, channel, xoft, fftlength, resample=None, fthresh=1e-10,
-         search=0.5, nt=1400, nf=700, **kwargs):
+         search=0.5, nt=1400, nf=700, prefilter=True, lowmem=False,
+         timer=None, **kwargs):
     """Scan a channel for evidence of transients
 
     Parameters
@@ -247,15 +1153,16 @@ def scan(gps, channel, xoft, fftlength, resample=None, fthresh=1e-10,
     channel : `OmegaChannel`
         `OmegaChannel` object corresponding to this data stream
 
-    xoft : `~gwpy.timeseries.TimeSeries`
-        the `TimeSeries` data to analyze
+    xoft : `~gwpy.timeseries.TimeSeries` or `tuple`
+        the `TimeSeries` data to analyze, or a ``(wxoft, hpxoft, xoft)``
+        tuple of data already conditioned by `omega.conditioner`
 
     fftlength : `float`
         FFT integration length (in seconds) for ASD estimation
 
     resample : `int`, optional
         desired sampling rate (Hz) of the output if different from the input,
-        default: no resampling
+        ignored if `xoft` is already conditioned, default: no resampling
 
     fthresh : `float`, optional
         threshold on false alarm rate (Hz) for this channel to be considered
@@ -273,6 +1180,20 @@ def scan(gps, channel, xoft, fftlength, resample=None, fthresh=1e-10,
         number of points on the (log-sampled) frequency axis of the
         interpolated `Spectrogram`, default: 700
 
+    prefilter : `bool`, optional
+        whether to screen the whitened data with a coarse Q-tiling before
+        the full-resolution scan, ignored if `channel.always_plot` is
+        `True`, default: `True`
+
+    lowmem : `bool`, optional
+        whether to store the interpolated spectrograms in single precision,
+        halving their memory footprint, default: `False`
+
+    timer : `~gwdetchar.omega.timing.Timer`, optional
+        a timer in which to record the ``'conditioner'``, ``'prefilter'``,
+        ``'q_scan'``, and ``'interpolate'`` stages of this scan,
+        default: do not record
+
     **kwargs : `dict`, optional
         additional arguments to `omega.conditioner`
 
@@ -285,27 +1206,48 @@ def scan(gps, channel, xoft, fftlength, resample=None, fthresh=1e-10,
         interpolated whitened `Spectrogram`, and interpolated high-passed
         `Spectrogram`
     """
+    timer = timer or timing.NullTimer()
     # condition data
-    wxoft, hpxoft, xoft = conditioner(
-        xoft, fftlength, resample=resample, f_low=channel.frange[0], **kwargs)
+    if isinstance(xoft, tuple):
+        wxoft, hpxoft, xoft = xoft
+    else:
+        with timer.stage('conditioner', channel=channel.name):
+            wxoft, hpxoft, xoft = conditioner(
+                xoft, fftlength, resample=resample, f_low=channel.frange[0],
+                **kwargs)
     # compute whitened Q-gram
     search = Segment(gps - search/2, gps + search/2)
-    qgram, far = q_scan(
-        wxoft, mismatch=channel.mismatch, qrange=channel.qrange,
-        frange=channel.frange, search=search)
-    if (far >= fthresh) and (not channel.always_plot):
-        return None  # series is insignificant
-    # compute raw Q-gram
-    Q = qgram.plane.q
-    rqgram, _ = q_scan(
-        hpxoft, mismatch=channel.mismatch, qrange=(Q, Q),
-        frange=qgram.plane.frange, search=search)
+    qkwargs = {
+        'duration': abs(wxoft.span),
+        'sampling': wxoft.sample_rate.to('Hz').value,
+        'epoch': wxoft.t0.value,
+        'search': search,
+    }
+    wfft = wxoft.fft().value
+    if prefilter and not channel.always_plot:
+        with timer.stage('prefilter', channel=channel.name):
+            significant = screen_significance(
+                wfft, qrange=channel.qrange, frange=channel.frange,
+                fthresh=fthresh, mismatch=channel.mismatch, **qkwargs)
+        if not significant:
+            return None  # series is insignificant
+    with timer.stage('q_scan', channel=channel.name):
+        qgram, far = q_scan(
+            wfft, mismatch=channel.mismatch, qrange=channel.qrange,
+            frange=channel.frange, **qkwargs)
+        del wfft
+        if (far >= fthresh) and (not channel.always_plot):
+            return None  # series is insignificant
+        # compute raw Q-gram
+        rqgram = q_plane(
+            hpxoft.fft().value, qgram.plane.q, qgram.plane.frange,
+            abs(hpxoft.span), hpxoft.sample_rate.to('Hz').value,
+            mismatch=channel.mismatch, epoch=hpxoft.t0.value, search=search)
     # compute interpolated spectrograms
     tres = min(channel.pranges) / nt
     outseg = Segment(
         gps - max(channel.pranges)/2, gps + max(channel.pranges)/2)
-    qspec = qgram.interpolate(tres=tres, fres=nf, logf=True,
-                              outseg=outseg)
-    rqspec = rqgram.interpolate(tres=tres, fres=nf, logf=True,
-                                outseg=outseg)
+    with timer.stage('interpolate', channel=channel.name):
+        (qspec, rqspec) = interpolate_qgrams(
+            (qgram, rqgram), tres, nf, outseg, lowmem=lowmem)
     return (xoft, hpxoft, wxoft, qgram, rqgram, qspec, rqspec)
@@ -20,6 +20,7 @@
 """
 
 import os
+import csv
 import numpy
 from functools import wraps
 from collections import OrderedDict
@@ -36,6 +37,11 @@ from ..io import html as htmlio
 __author__ = 'Alex Urban <alexander.urban@ligo.org>'
 __credit__ = 'Duncan Macleod <duncan.macleod@ligo.org>'
 
+# columns of the summary table, with and without cross-correlation
+SUMMARY_COLUMNS = ('Channel', 'Central Time', 'Central Frequency (Hz)', 'Q',
+                   'Energy', 'SNR')
+CORRELATION_COLUMNS = ('Correlation', 'Standard Deviation', 'Delay (ms)')
+
 # -- HTML construction --------------------------------------------------------
 
 def update_toc(toc, channel, name='GW'):
@@ -134,8 +140,9 @@ def wrap_html(func):
             if iargs['base'] == os.path.curdir:
                 iargs['base'] = os.path.pardir
             iargs['toc'] = toc
-            about = write_about_page(ifo, gpstime, config, outdir=aboutdir,
-                                     **iargs)
+            about = write_about_page(
+                ifo, gpstime, config, timing=kwargs.pop('timing', None),
+                outdir=aboutdir, **iargs)
             if os.path.basename(about) == 'index.html':
                 about = about[:-10]
         # open page
@@ -207,6 +214,10 @@ def write_summary_table(blocks, correlated, base=os.path.curdir):
 
     base : `str`
         the path for the `<base>` tag to link in the `<head>`
+
+    Notes
+    -----
+    Provisional channels, from a quick-look scan, are not recorded.
     """
     # record summary data for each channel
     channel, time, freq, Q, energy, snr = ([], [], [], [], [], [])
@@ -214,6 +225,8 @@ def write_summary_table(blocks, correlated, base=os.path.curdir):
         corr, stdev, delay = ([], [], [])
     for block in blocks.values():
         for chan in block['channels']:
+            if chan.provisional:
+                continue
             channel.append(chan.name)
             time.append(chan.t)
             freq.append(chan.f)
@@ -227,13 +240,10 @@ def write_summary_table(blocks, correlated, base=os.path.curdir):
     # store in a table
     if correlated:
         data = Table([channel, time, freq, Q, energy, snr, corr, stdev, delay],
-                     names=('Channel', 'Central Time',
-                            'Central Frequency (Hz)', 'Q', 'Energy', 'SNR',
-                            'Correlation', 'Standard Deviation', 'Delay (ms)'))
+                     names=SUMMARY_COLUMNS + CORRELATION_COLUMNS)
     else:
-        data = Table([channel, time, freq, Q, energy, snr], names=(
-            'Channel', 'Central Time', 'Central Frequency (Hz)', 'Q', 'Energy',
-            'SNR'))
+        data = Table([channel, time, freq, Q, energy, snr],
+                     names=SUMMARY_COLUMNS)
     # write in several formats
     datadir = os.path.join(base, 'data')
     fname = os.path.join(datadir, 'summary')
@@ -242,6 +252,57 @@ def write_summary_table(blocks, correlated, base=os.path.curdir):
     data.write(fname + '.tex', format='latex', overwrite=True)
 
 
+def append_summary_row(channel, correlated, base=os.path.curdir):
+    """Append a single channel to the CSV summary table
+
+    Parameters
+    ----------
+    channel : `OmegaChannel`
+        the channel to record, with its loudest tile features stored
+
+    correlated : `bool`
+        Boolean switch to determine if cross-correlation is included
+
+    base : `str`
+        the path for the `<base>` tag to link in the `<head>`
+
+    Notes
+    -----
+    This is a cheap alternative to `write_summary_table` for recording
+    checkpoints as each channel is scanned, since it does not rewrite
+    previous rows. The header row is written if the file does not already
+    exist. If it exists with a different header, e.g. without the
+    correlation columns, it is rewritten with the right one, keeping only
+    those rows that match it. Only the CSV format is updated, the full set
+    of formats is written by the next call to `write_summary_table`.
+    """
+    fname = os.path.join(base, 'data', 'summary.csv')
+    row = [channel.name, channel.t, channel.f, channel.Q, channel.energy,
+           channel.snr]
+    header = SUMMARY_COLUMNS
+    if correlated:
+        row.extend([channel.corr, channel.stdev, channel.delay])
+        header = header + CORRELATION_COLUMNS
+    header = list(header)
+    rows = []
+    if os.path.isfile(fname):
+        with open(fname, 'r') as f:
+            rows = [next(csv.reader(f), [])]
+    if rows == [header]:  # append to a valid table
+        with open(fname, 'a') as f:
+            csv.writer(f, lineterminator='\n').writerow(row)
+        return
+    if rows:  # keep any rows that match the header
+        with open(fname, 'r') as f:
+            rows = [r for r in list(csv.reader(f))[1:] if
+                    len(r) == len(header)]
+    with open(fname, 'w') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(header)
+        writer.writerows(rows)
+        writer.writerow(row)
+
+
 # -- Qscan HTML ---------------------------------------------------------------
 
 def write_summary(
@@ -323,6 +384,55 @@ def write_summary(
     return page()
 
 
+def write_timing(timing,
+                 tableclass='table table-condensed table-hover table-bordered'
+                            ' table-responsive'):
+    """Write a table of the time and memory used by each processing stage
+
+    Parameters
+    ----------
+    timing : `dict`
+        summary of processing time by stage, as returned by
+        `~gwdetchar.omega.timing.Timer.summary`
+
+    tableclass : `str`, optional
+        the ``class`` for the ``<table>``
+
+    Returns
+    -------
+    page : `~MarkupPy.markup.page`
+        the formatted markup object containing the table
+    """
+    page = markup.page()
+    page.div(class_='row')
+    page.div(class_='col-md-12')
+    page.h2('Processing time')
+    page.p('The total wall time, CPU time (of the thread running it), and '
+           'memory used by each stage of this analysis are listed below. '
+           'The RSS growth is the largest increase in the peak resident '
+           'memory of the process during any call. The python heap is the '
+           'largest increase in memory allocated by python, recorded only '
+           'with --low-memory on python 3.9 or later. Records for each '
+           'channel and block are available in %s.' % (
+               markup.oneliner.a('data/timing.json',
+                                 href='../data/timing.json')))
+
+    def _mib(value):
+        return '-' if value is None else '%.1f' % (value / 2.**20)
+
+    data = [[stage, str(info['count']), '%.2f' % info['wall'],
+             '%.2f' % info['cpu'], _mib(info.get('rss')),
+             _mib(info.get('peak'))]
+            for (stage, info) in timing.items()]
+    page.add(htmlio.table(
+        headers=['Stage', 'Calls', 'Wall time (s)', 'CPU time (s)',
+                 'RSS growth (MiB)', 'Python heap (MiB)'],
+        data=data, separator='\n', table=tableclass))
+    page.div.close()  # col-md-12
+    page.div.close()  # row
+    return page()
+
+
 def write_ranking(toc, primary, thresh=6.5,
                   tableclass='table table-condensed table-hover table-bordered'
                              ' table-responsive'):
@@ -432,18 +542,19 @@ def write_ranking(toc, primary, thresh=6.5,
     return page()
 
 
-def write_block(blockkey, block, context,
-                tableclass='table table-condensed table-hover table-bordered '
-                           'table-responsive desktop-only'):
-    """Write the HTML summary for a specific block of channels
+def write_channel(channel, index, context,
+                  tableclass='table table-condensed table-hover '
+                             'table-bordered table-responsive desktop-only'):
+    """Write the HTML summary for a single channel
 
     Parameters
     ----------
-    blockkey: `str`
-        the key labeling the channel block
+    channel : `OmegaChannel`
+        the channel to summarize, with its loudest tile features stored
 
-    block : `dict` of `OmegaChannel`
-        a list of channels and their analysis attributes
+    index : `int`
+        the position of this channel in its block, used to label the plot
+        toggle buttons
 
     context : `str`
         the type of Bootstrap ``<panel>`` object to use, color-coded by GWO
@@ -455,83 +566,138 @@ def write_block(blockkey, block, context,
 
     Returns
     -------
-    page : `~MarkupPy.markup.page`
-        the formatted HTML for this block
+    html : `str`
+        the formatted HTML list item for this channel
+
+    Notes
+    -----
+    The rendered HTML is stored on the channel, and re-used by later calls
+    with the same arguments, so that each channel is rendered only once
+    as the results page is rewritten during an analysis. A provisional,
+    quick-look result is rendered again once it is refined.
     """
+    key = (index, context, tableclass, channel.provisional)
+    cached = getattr(channel, '_html', None)
+    if cached is not None and cached[0] == key:
+        return cached[1]
     page = markup.page()
-    page.div(class_='panel well panel-%s' % context)
-    # -- make heading
-    page.div(class_='panel-heading clearfix')
-    page.h3(': '.join([blockkey, block['name']]), class_='panel-title')
-    page.div.close()  # panel-heading
+    page.li(class_='list-group-item')
+    page.div(class_='container')
 
-    # -- make body
-    page.ul(class_='list-group')
-
-    # -- range over channels in this block
-    for i, channel in enumerate(block['channels']):
-        page.li(class_='list-group-item')
-        page.div(class_='container')
-
-        page.div(class_='row')
+    page.div(class_='row')
 
-        # channel name
-        chanid = channel.name.lower().replace(':', '-')
-        page.h4(htmlio.cis_link(channel.name), id_=chanid)
+    # channel name
+    chanid = channel.name.lower().replace(':', '-')
+    page.h4(htmlio.cis_link(channel.name), id_=chanid)
 
-        page.div(class_='row')
+    page.div(class_='row')
 
-        # summary table
-        page.div(class_='col-md-7')
-        try:
-            columns = ['GPS Time', 'Frequency', 'Q', 'Energy', 'SNR',
-                       'Correlation', 'Delay']
-            entries = [[str(channel.t), '%s Hz' % channel.f, str(channel.Q),
-                        str(channel.energy), str(channel.snr),
-                        str(channel.corr), '%s ms' % channel.delay]]
-        except:
-            columns = ['GPS Time', 'Frequency', 'Q', 'Energy', 'SNR']
-            entries = [[str(channel.t), '%s Hz' % channel.f, str(channel.Q),
-                        str(channel.energy), str(channel.snr)]]
-        page.add(
-            htmlio.table(columns, entries, separator='\n', table=tableclass))
-        page.div.close()  # col-sm-7
-
-        # plot toggle buttons
-        page.div(class_='col-xs-12 col-md-5')
+    # summary table
+    page.div(class_='col-md-7')
+    try:
+        columns = ['GPS Time', 'Frequency', 'Q', 'Energy', 'SNR',
+                   'Correlation', 'Delay']
+        entries = [[str(channel.t), '%s Hz' % channel.f, str(channel.Q),
+                    str(channel.energy), str(channel.snr),
+                    str(channel.corr), '%s ms' % channel.delay]]
+    except:
+        columns = ['GPS Time', 'Frequency', 'Q', 'Energy', 'SNR']
+        entries = [[str(channel.t), '%s Hz' % channel.f, str(channel.Q),
+                    str(channel.energy), str(channel.snr)]]
+    page.add(
+        htmlio.table(columns, entries, separator='\n', table=tableclass))
+    page.div.close()  # col-sm-7
+
+    # plot toggle buttons
+    page.div(class_='col-xs-12 col-md-5')
+    if channel.provisional:  # only whitened qscans are plotted
+        page.p('<strong>Note</strong>: This is a provisional, '
+               'quick-look result, which will be refined.')
+    else:
         page.div(class_='btn-group', role='group')
         for ptitle, pclass, ptypes in [
-            ('Timeseries', 'timeseries', ('raw', 'highpassed', 'whitened')),
-            ('Spectrogram', 'qscan', ('highpassed', 'whitened', 'autoscaled')),
+            ('Timeseries', 'timeseries', (
+                'raw', 'highpassed', 'whitened')),
+            ('Spectrogram', 'qscan', (
+                'highpassed', 'whitened', 'autoscaled')),
             ('Eventgram', 'eventgram', (
                 'highpassed', 'whitened', 'autoscaled')),
         ]:
-            _id = 'btnGroup{0}{1}'.format(pclass.title(), i)
+            _id = 'btnGroup{0}{1}'.format(pclass.title(), index)
             page.div(class_='btn-group', role='group')
             page.button(id_=_id, type='button',
                         class_='btn btn-%s dropdown-toggle' % context,
                         **{'data-toggle': 'dropdown'})
-            page.add('{0} view <span class="caret"></span>'.format(ptitle))
+            page.add('{0} view <span class="caret"></span>'.format(
+                ptitle))
             page.button.close()
             page.ul(class_='dropdown-menu', role='menu',
                     **{'aria-labelledby': _id})
             for ptype in ptypes:
-                page.li(toggle_link('{0}_{1}'.format(pclass, ptype), channel,
-                                    channel.pranges))
+                page.li(toggle_link('{0}_{1}'.format(pclass, ptype),
+                                    channel, channel.pranges))
             page.ul.close()  # dropdown-menu
             page.div.close()  # btn-group
         page.div.close()  # btn-group
-        page.div.close()  # col-sm-5
+    page.div.close()  # col-sm-5
+
+    page.div.close()  # row
 
-        page.div.close()  # row
+    # plots
+    page.add(htmlio.scaffold_plots(
+        channel.plots['qscan_whitened'],
+        nperrow=min(len(channel.pranges), 3)))
 
-        # plots
-        page.add(htmlio.scaffold_plots(
-            channel.plots['qscan_whitened'],
-            nperrow=min(len(channel.pranges), 3)))
+    page.div.close()  # container anchor
+    page.li.close()
+    channel._html = (key, page())
+    return channel._html[1]
 
-        page.div.close()  # container anchor
-        page.li.close()
+
+def write_block(blockkey, block, context,
+                tableclass='table table-condensed table-hover table-bordered '
+                           'table-responsive desktop-only'):
+    """Write the HTML summary for a specific block of channels
+
+    Parameters
+    ----------
+    blockkey: `str`
+        the key labeling the channel block
+
+    block : `dict` of `OmegaChannel`
+        a list of channels and their analysis attributes
+
+    context : `str`
+        the type of Bootstrap ``<panel>`` object to use, color-coded by GWO
+        standards (must be one of 'default', 'primary', 'success', 'info',
+        'warning', or 'danger')
+
+    tableclass : `str`, optional
+        the ``class`` for the summary ``<table>``
+
+    Returns
+    -------
+    page : `~MarkupPy.markup.page`
+        the formatted HTML for this block
+
+    See Also
+    --------
+    write_channel
+        for the HTML of each channel, which is rendered only once
+    """
+    page = markup.page()
+    page.div(class_='panel well panel-%s' % context)
+    # -- make heading
+    page.div(class_='panel-heading clearfix')
+    page.h3(': '.join([blockkey, block['name']]), class_='panel-title')
+    page.div.close()  # panel-heading
+
+    # -- make body
+    page.ul(class_='list-group')
+
+    # -- range over channels in this block
+    for i, channel in enumerate(block['channels']):
+        page.add(write_channel(channel, i, context, tableclass=tableclass))
 
     # close and return
     page.ul.close()
@@ -607,7 +773,7 @@ def write_null_page(reason, context='default'):
 
 
 @wrap_html
-def write_about_page(configfiles):
+def write_about_page(configfiles, timing=None):
     """Write a page explaining how a Qscan analysis was completed
 
     Parameters
@@ -621,6 +787,10 @@ def write_about_page(configfiles):
     configfiles : `list` of `str`
         list of paths of the configuration files to embed
 
+    timing : `dict`, optional
+        summary of processing time by stage, as returned by
+        `~gwdetchar.omega.timing.Timer.summary`, default: `None`
+
     outdir : `str`, optional
         the output directory for the HTML
 
@@ -630,8 +800,11 @@ def write_about_page(configfiles):
         the path of the HTML written for this analysis
     """
     # set up page
+    page = markup.page()
     if len(configfiles) == 1:
-        page = htmlio.about_this_page(configfiles[0])
+        page.add(htmlio.about_this_page(configfiles[0]))
     else:
-        page = htmlio.about_this_page(configfiles)
+        page.add(htmlio.about_this_page(configfiles))
+    if timing:
+        page.add(write_timing(timing))
     return page
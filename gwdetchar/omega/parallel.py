@@ -0,0 +1,870 @@
+# coding=utf-8
+# Copyright (C) Alex Urban (2019)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with GW DetChar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Parallel processing utilities for omega scans
+"""
+
+import os
+import pickle
+import tempfile
+import tracemalloc
+import warnings
+
+from collections import (OrderedDict, deque)
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import Pool
+
+from gwpy.timeseries import TimeSeriesDict
+
+from . import (checkpoint, core, plot, timing)
+from ..io.datafind import (check_flag, get_data)
+from ..utils import lru_cached
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+__credits__ = 'Duncan Macleod <duncan.macleod@ligo.org>'
+
+CONDITIONED_KEYS = ('whitened', 'highpassed', 'raw')
+
+# resolution and plot types of quick-look scans
+QUICKLOOK_NT = 350
+QUICKLOOK_NF = 175
+QUICKLOOK_PLOTS = ('qscan_whitened',)
+
+# largest read (channels times seconds) shared by several blocks
+READ_BUDGET = 4096
+
+# objects shared with every job in a worker process, keyed by file
+_SHARED = OrderedDict()
+
+
+# -- utilities ----------------------------------------------------------------
+
+def _init_worker():
+    """Prepare a worker process
+
+    Any memory tracing inherited from the parent process is stopped, so
+    that it is only done (by `_trace_memory`) where asked for.
+    """
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _share(obj):
+    """Write an object to a temporary file, to be loaded by `_load_shared`
+
+    Returns the path of the file, which should be removed once all jobs
+    that use it have finished.
+    """
+    fd, path = tempfile.mkstemp(prefix='gwdetchar-omega-', suffix='.pkl')
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _load_shared(path):
+    """Load an object written by `_share`, at most once in each process
+    """
+    def _load():
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    return lru_cached(_SHARED, 1, path, _load)
+
+
+def _scan_channel(args):
+    """Thin wrapper around `scan_channel` for use with `multiprocessing`
+    """
+    index, channel, xoft, kwargs = args
+    kwargs = dict(kwargs)
+    for (key, path) in kwargs.pop('shared', {}).items():
+        kwargs[key] = _load_shared(path)
+    return (index,) + scan_channel(channel, xoft, **kwargs)[:2]
+
+
+def _wait(index, channel, significant, renders):
+    """Block until all plots for a channel have rendered
+    """
+    for result in renders:
+        result.get()  # re-raises any rendering error
+    return (index, channel, significant)
+
+
+@contextmanager
+def _open_pool(pool, processes, **kwargs):
+    """Yield an existing pool, or a new one that is closed on exit
+    """
+    if pool is not None:
+        yield pool
+        return
+    pool = Pool(processes=processes, **kwargs)
+    try:
+        yield pool
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _checkpoint_path(store, channel, gps, fftlength, duration, **kwargs):
+    """Path of the checkpoint for a channel
+    """
+    return checkpoint.checkpoint_path(store, channel, checkpoint.config_hash(
+        gps, channel, fftlength, duration, **kwargs))
+
+
+def _conditioned_path(cache, channel, fftlength, resample=None, fused=False):
+    """Path of the cached conditioned data for a channel
+    """
+    return os.path.join(cache, '{}-{}-{}-{}{}.h5'.format(
+        channel.name.replace(':', '-'), fftlength, resample or 0,
+        channel.frange[0], '-fused' if fused else ''))
+
+
+def _read_group(group, gps, skip=(), ignore_state_flags=False, span=None,
+                cache=None, timer=None, segment_cache=None, fused=False,
+                **kwargs):
+    """Check state flags for, and read data for, a group of blocks
+    """
+    timer = timer or timing.NullTimer()
+    skip = set(skip)
+    active = []
+    for block in group:
+        if block.flag and not ignore_state_flags:
+            with timer.stage('check_flag', block=block.key):
+                active.append(
+                    check_flag(block.flag, gps, block.duration, pad=1,
+                               cache=segment_cache))
+        else:
+            active.append(True)
+    # read every unscanned channel from active blocks in one pass,
+    # except those already conditioned over a shared span
+    chans = []
+    for (block, isactive) in zip(group, active):
+        chans.extend(c.name for c in block.channels if isactive and
+                     c.name not in skip and c.name not in chans and not (
+                         cache and os.path.isfile(_conditioned_path(
+                             cache, c, block.fftlength, block.resample,
+                             fused=fused))))
+    data = {}
+    if chans:
+        duration = max(b.duration for (b, a) in zip(group, active) if a)
+        (start, end) = span or (gps, gps)
+        with timer.stage('get_data', block=','.join(
+                b.key for (b, a) in zip(group, active) if a)):
+            data = get_data(
+                chans, start - duration/2. - 1, end + duration/2. + 1,
+                frametype=group[0].frametype, source=group[0].source,
+                **kwargs)
+    out = []
+    for (block, isactive) in zip(group, active):
+        names = [c.name for c in block.channels if c.name not in skip]
+        if not (isactive and names):
+            out.append((block, isactive, None))
+            continue
+        if span is None:  # crop to this block
+            start = gps - block.duration/2. - 1
+            end = gps + block.duration/2. + 1
+            out.append((block, True, TimeSeriesDict(
+                (name, data[name].crop(start, end)) for name in names
+                if name in data)))
+        else:  # keep the shared span for conditioning
+            out.append((block, True, TimeSeriesDict(
+                (name, data[name]) for name in names if name in data)))
+    return out
+
+
+def condition_shared(channel, xoft, fftlength, cache, resample=None,
+                     fused=False):
+    """Condition data for a channel once, caching the result on disk
+
+    Parameters
+    ----------
+    channel : `OmegaChannel`
+        `OmegaChannel` object corresponding to this data stream
+
+    xoft : `~gwpy.timeseries.TimeSeries` or `None`
+        the raw data to condition, need only be given if this channel
+        has not yet been cached
+
+    fftlength : `float`
+        FFT integration length (in seconds) for ASD estimation
+
+    cache : `str`
+        path to a directory in which to cache conditioned data
+
+    resample : `int`, optional
+        desired sampling rate (Hz) of the output if different from the input,
+        default: no resampling
+
+    fused : `bool`, optional
+        whether to condition data with `~gwdetchar.omega.whiten_highpass`,
+        default: `False`
+
+    Returns
+    -------
+    conditioned : `tuple` of `~gwpy.timeseries.TimeSeries`
+        the whitened, high-passed, and (possibly resampled) raw data,
+        as returned by `~gwdetchar.omega.conditioner`
+
+    Notes
+    -----
+    This is intended for scans of several nearby times that share one
+    contiguous span of data, which is then conditioned only once per
+    channel. Cached data are keyed by `fftlength`, `resample`, `fused`, and
+    the low-frequency cutoff of `channel`.
+    """
+    path = _conditioned_path(cache, channel, fftlength, resample=resample,
+                             fused=fused)
+    if os.path.isfile(path):
+        out = TimeSeriesDict.read(path, CONDITIONED_KEYS, format='hdf5')
+        return tuple(out[key] for key in CONDITIONED_KEYS)
+    conditioned = core.conditioner(
+        xoft.astype('float64'), fftlength, resample=resample,
+        f_low=channel.frange[0], fused=fused)
+    # write then move, so that a partial file is never read, to a unique
+    # temporary file in case another process is writing the same channel
+    fd, tmp = tempfile.mkstemp(prefix='.', suffix='.h5', dir=cache)
+    os.close(fd)
+    try:
+        TimeSeriesDict(zip(CONDITIONED_KEYS, conditioned)).write(
+            tmp, format='hdf5', overwrite=True)
+        os.rename(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return conditioned
+
+
+def condition_channels(channels, data, fftlength, resample=None,
+                       fused=False):
+    """Condition the data for many channels at once
+
+    Parameters
+    ----------
+    channels : `list` of `OmegaChannel`
+        the channels to condition, e.g. those of one block
+
+    data : `~gwpy.timeseries.TimeSeriesDict`
+        the raw data for (some of) `channels`
+
+    fftlength : `float`
+        FFT integration length (in seconds) for ASD estimation
+
+    resample : `int`, optional
+        desired sampling rate (Hz) of the output if different from the input,
+        default: no resampling
+
+    fused : `bool`, optional
+        whether to condition data with `~gwdetchar.omega.whiten_highpass`,
+        default: `False`
+
+    Returns
+    -------
+    conditioned : `dict`
+        a copy of `data`, in which the raw data for each channel are replaced
+        by the tuple returned by `~gwdetchar.omega.conditioner`, ready to
+        pass to `scan_channels`
+
+    Notes
+    -----
+    Channels sharing a low-frequency cutoff are conditioned together by
+    `~gwdetchar.omega.condition_block`. If that fails with a `ValueError`
+    or `KeyError`, the raw data for those channels are returned as-is, so
+    that each is conditioned (or skipped) by `scan_channel` as usual.
+    """
+    groups = OrderedDict()
+    for channel in channels:
+        if channel.name in data:
+            groups.setdefault(channel.frange[0], []).append(channel.name)
+    out = dict(data)
+    for (f_low, names) in groups.items():
+        try:
+            out.update(core.condition_block(
+                OrderedDict((name, data[name]) for name in names),
+                fftlength, resample=resample, f_low=f_low, fused=fused))
+        except (ValueError, KeyError):
+            continue
+    return out
+
+
+def plan_reads(blocks, budget=READ_BUDGET):
+    """Group blocks of channels that can share a single data read
+
+    Parameters
+    ----------
+    blocks : `list` of `OmegaChannelList`
+        the blocks of channels to read
+
+    budget : `float`, optional
+        the largest size of a read shared by several blocks, as the number
+        of channels times the longest block `duration` (seconds),
+        default: `READ_BUDGET`
+
+    Returns
+    -------
+    groups : `list` of `list` of `OmegaChannelList`
+        runs of consecutive blocks sharing a `frametype` and `source`,
+        in the order of `blocks`
+
+    Notes
+    -----
+    Each group is read once, over the span required by its longest block,
+    and each block is then given a cropped view of those data. A block is
+    added to the group before it only if the size of that read would not
+    then exceed `budget`, so that shared reads stay bounded in memory, and
+    blocks are never reordered. A block larger than `budget` is read on
+    its own.
+    """
+    groups = []
+    for block in blocks:
+        if groups:
+            group = groups[-1]
+            nchan = sum(len(b.channels) for b in group) + len(block.channels)
+            duration = max([b.duration for b in group] + [block.duration])
+            if ((block.frametype, block.source) ==
+                    (group[0].frametype, group[0].source) and
+                    nchan * duration <= budget):
+                group.append(block)
+                continue
+        groups.append([block])
+    return groups
+
+
+def quicklook_order(blocks, primary=None, key='GW'):
+    """Order blocks of channels for a quick-look scan
+
+    Parameters
+    ----------
+    blocks : `list` of `OmegaChannelList`
+        the blocks of channels to scan
+
+    primary : `str`, optional
+        name of the primary channel, default: `None`
+
+    key : `str`, optional
+        key of the block of gravitational-wave channels, default: ``'GW'``
+
+    Returns
+    -------
+    blocks : `list` of `OmegaChannelList`
+        the blocks containing `primary` first, then the block `key` and
+        those whose ``parent`` is `key`, then all others, each otherwise
+        in their input order
+    """
+    def _rank(block):
+        if primary in [c.name for c in block.channels]:
+            return 0
+        if key in (block.key, block.parent):
+            return 1
+        return 2
+
+    return sorted(blocks, key=_rank)
+
+
+def scan_channel(channel, xoft, gps, fftlength, resample=None,
+                 fthresh=1e-10, search=0.5, prefilter=True, correlate=None,
+                 dt=0.1, colormap='viridis', pool=None, cache=None,
+                 duration=None, store=None, lowmem=False, fused=False,
+                 nt=1400, nf=700, plottypes=None):
+    """Scan, plot, and characterise a single channel
+
+    Parameters
+    ----------
+    channel : `OmegaChannel`
+        `OmegaChannel` object corresponding to this data stream
+
+    xoft : `~gwpy.timeseries.TimeSeries`, `tuple`, or `None`
+        the `TimeSeries` data to analyze, or a tuple of data already
+        conditioned by `condition_channels`, may be `None` only if
+        conditioned data for this channel are found in `cache`
+
+    gps : `float`
+        the GPS time (seconds) to scan
+
+    fftlength : `float`
+        FFT integration length (in seconds) for ASD estimation
+
+    resample : `int`, optional
+        desired sampling rate (Hz) of the output if different from the input,
+        default: no resampling
+
+    fthresh : `float`, optional
+        threshold on false alarm rate (Hz) for this channel to be considered
+        interesting, default: 1e-10
+
+    search : `float`, optional
+        time window (seconds) around `gps` in which to find peak energies,
+        default: 0.5
+
+    prefilter : `bool`, optional
+        whether to screen data for significance with a coarse Q-tiling
+        before the full-resolution scan, default: `True`
+
+    correlate : `~gwdetchar.omega.MatchedFilter`, optional
+        a matched-filter built from the conditioned primary channel,
+        default: `None`
+
+    dt : `float`, optional
+        maximum acceptable time delay (seconds) from the primary channel,
+        used only if `correlate` is not `None`, default: 0.1
+
+    colormap : `str`, optional
+        matplotlib colormap to use, default: viridis
+
+    pool : `multiprocessing.Pool`, optional
+        a pool of processes in which to render plots asynchronously, so that
+        rendering overlaps with the next scan, default: render in-process
+
+    cache : `str`, optional
+        path to a directory of data conditioned over a span shared with
+        other scans, see `condition_shared`, default: condition `xoft`
+        for this scan only
+
+    duration : `float`, optional
+        duration (seconds) of data to scan around `gps`, used to crop data
+        from `cache` and to key checkpoints in `store`, default: all of
+        `xoft`
+
+    store : `str`, optional
+        path to a directory of checkpoints (see
+        `~gwdetchar.omega.checkpoint`), if this channel is found there then
+        its signal processing is skipped, otherwise its products are saved
+        there, default: do not checkpoint
+
+    lowmem : `bool`, optional
+        whether to release intermediate data products as soon as they are
+        no longer needed, interpolate spectrograms in single precision, and
+        record the peak memory traced while processing this channel as
+        ``channel.peak_memory`` (bytes), default: `False`
+
+    fused : `bool`, optional
+        whether to high-pass and whiten data in a single frequency-domain
+        pass, see `~gwdetchar.omega.whiten_highpass`, default: `False`
+
+    nt : `int`, optional
+        number of points on the time axis of the interpolated spectrograms,
+        default: 1400
+
+    nf : `int`, optional
+        number of points on the (log-sampled) frequency axis of the
+        interpolated spectrograms, default: 700
+
+    plottypes : `list` of `str`, optional
+        the types of plot to make, see `~gwdetchar.omega.plot.PLOT_TYPES`,
+        default: all types
+
+    Notes
+    -----
+    The records of a `~gwdetchar.omega.timing.Timer` covering each stage
+    of processing are stored as ``channel.timing``, so that they are
+    returned along with `channel` from worker processes.
+
+    Returns
+    -------
+    channel : `OmegaChannel` or `None`
+        the input channel with its loudest tile features stored in-place,
+        or `None` if the scan failed
+
+    significant : `bool`
+        whether the channel was found to be significant
+
+    renders : `list` of `~multiprocessing.pool.AsyncResult`
+        pending plot renders, empty unless `pool` is given
+
+    Notes
+    -----
+    Channels that fail to scan with a `ValueError` or `KeyError` are
+    skipped with a `UserWarning`.
+    """
+    timer = timing.Timer()
+    channel.timing = timer.records
+    with _trace_memory(channel, enable=lowmem):
+        if store is not None:
+            path = _checkpoint_path(store, channel, gps, fftlength, duration,
+                                    resample=resample, search=search,
+                                    fthresh=fthresh, fused=fused)
+        stored = store is not None and os.path.isfile(path)
+        try:  # scan the channel
+            if stored:
+                with timer.stage('read_checkpoint', channel=channel.name):
+                    series = checkpoint.read_checkpoint(
+                        path, gps, channel.pranges, nt=nt, nf=nf,
+                        lowmem=lowmem)
+            else:
+                if cache is not None:
+                    with timer.stage('conditioner', channel=channel.name):
+                        xoft = condition_shared(channel, xoft, fftlength,
+                                                cache, resample=resample,
+                                                fused=fused)
+                    if duration is not None:
+                        xoft = tuple(ts.crop(gps - duration/2. - 1,
+                                             gps + duration/2. + 1)
+                                     for ts in xoft)
+                elif not isinstance(xoft, tuple):
+                    xoft = xoft.astype('float64')
+                series = core.scan(
+                    gps, channel, xoft, fftlength, resample=resample,
+                    fthresh=fthresh, search=search, nt=nt, nf=nf,
+                    prefilter=prefilter, lowmem=lowmem, timer=timer,
+                    fused=fused)
+        except (ValueError, KeyError) as exc:
+            warnings.warn("Skipping {}: [{}] {}".format(
+                channel.name, type(exc), str(exc)), UserWarning)
+            return (None, False, [])
+        if store is not None and not stored:
+            with timer.stage('write_checkpoint', channel=channel.name):
+                checkpoint.write_checkpoint(
+                    path, series, gps, search=search,
+                    pranges=channel.pranges)
+        xoft = None  # conditioned data are now held only by `series`
+        if series is not None:  # a list, so `_characterise` can release it
+            series = list(series)
+        return _characterise(channel, series, gps, correlate=correlate,
+                             dt=dt, colormap=colormap, pool=pool,
+                             lowmem=lowmem, timer=timer, plottypes=plottypes)
+
+
+@contextmanager
+def _trace_memory(channel, enable=True):
+    """Record the peak memory allocated within this context as
+    ``channel.peak_memory`` (bytes)
+    """
+    if not enable:
+        yield
+        return
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        with timing.trace_memory() as memory:
+            yield
+    finally:
+        if memory['peak'] is None:  # cannot reset the traced peak
+            memory['peak'] = tracemalloc.get_traced_memory()[1]
+        channel.peak_memory = memory['peak']
+        if started:
+            tracemalloc.stop()
+
+
+def _characterise(channel, series, gps, correlate=None, dt=0.1,
+                  colormap='viridis', pool=None, lowmem=False, timer=None,
+                  plottypes=None):
+    """Plot and characterise the loudest tile of a scanned channel
+
+    If `lowmem` is `True` then the `series` list is emptied once plotting
+    jobs are built from copies of the cropped data, so that its full-length
+    products can be released before rendering.
+    """
+    if series is None:  # channel is insignificant
+        return (channel, False, [])
+    timer = timer or timing.NullTimer()
+    if correlate is not None:
+        with timer.stage('cross_correlate', channel=channel.name):
+            correlation = core.cross_correlate(series[2], correlate)
+        channel.save_loudest_tile_features(
+            series[3], correlation, gps=gps, dt=dt)
+        del correlation
+    else:
+        channel.save_loudest_tile_features(series[3])
+    with timer.stage('write_qscan_plots', channel=channel.name):
+        jobs = plot.qscan_plot_jobs(
+            gps, channel, series, colormap=colormap, copy=lowmem,
+            plottypes=plottypes)
+        if lowmem:
+            del series[:]
+        renders = plot.render_qscan_plots(jobs, pool=pool)
+    return (channel, True, renders)
+
+
+def is_stored(channel, gps, fftlength, resample=None, fthresh=1e-10,
+              search=0.5, cache=None, duration=None, store=None, fused=False,
+              **kwargs):
+    """Determine whether a channel can be scanned without reading its data
+
+    Parameters
+    ----------
+    channel : `OmegaChannel`
+        `OmegaChannel` object corresponding to this data stream
+
+    gps : `float`
+        the GPS time (seconds) to scan
+
+    fftlength : `float`
+        FFT integration length (in seconds) for ASD estimation
+
+    **kwargs : `dict`, optional
+        the remaining keyword arguments to `scan_channel`, of which only
+        `resample`, `fthresh`, `search`, `cache`, `duration`, `store`, and
+        `fused` are used
+
+    Returns
+    -------
+    stored : `bool`
+        `True` if this channel has a checkpoint in `store`, or conditioned
+        data in `cache`
+    """
+    if store is not None and os.path.isfile(_checkpoint_path(
+            store, channel, gps, fftlength, duration, resample=resample,
+            search=search, fthresh=fthresh, fused=fused)):
+        return True
+    return bool(cache) and os.path.isfile(_conditioned_path(
+        cache, channel, fftlength, resample=resample, fused=fused))
+
+
+def worker_pool(nproc=1, nproc_plot=1):
+    """Start a pool of processes to be re-used by `scan_channels`
+
+    Parameters
+    ----------
+    nproc : `int`, optional
+        number of parallel processes to use for scanning, default: 1
+
+    nproc_plot : `int`, optional
+        number of processes to use for rendering plots when channels are
+        scanned serially, default: 1
+
+    Returns
+    -------
+    pool : `multiprocessing.Pool` or `None`
+        a pool of `nproc` processes (or `nproc_plot`, if `nproc` is 1),
+        or `None` if neither is greater than 1
+
+    Notes
+    -----
+    `multiprocessing` forks its worker processes, which can deadlock if
+    another thread of this process holds a lock (e.g. for I/O, or in
+    `h5py`) at the time. Start this pool before any such thread, e.g.
+    before the first call to `prefetch_blocks`, and pass it to every call
+    to `scan_channels`, which otherwise starts a pool of its own each time.
+
+    The pool holds no state of any one scan, so it can be re-used by any
+    number of scans (of any GPS time or configuration) before it is
+    closed, and its workers keep their cached Q-plane tilings throughout.
+    """
+    processes = nproc if nproc > 1 else nproc_plot
+    if processes > 1:
+        return Pool(processes=processes, initializer=_init_worker)
+    return None
+
+
+def scan_channels(channels, data, gps, fftlength, nproc=1, nproc_plot=1,
+                  pool=None, **kwargs):
+    """Scan a list of channels, optionally in parallel
+
+    Parameters
+    ----------
+    channels : `list` of `OmegaChannel`
+        the channels to scan
+
+    data : `~gwpy.timeseries.TimeSeriesDict`
+        collection of data for (at least) every channel in `channels`
+
+    gps : `float`
+        the GPS time (seconds) to scan
+
+    fftlength : `float`
+        FFT integration length (in seconds) for ASD estimation
+
+    nproc : `int`, optional
+        number of parallel processes to use, default: 1
+
+    nproc_plot : `int`, optional
+        number of processes to use for rendering plots when channels are
+        scanned serially, default: 1
+
+    pool : `multiprocessing.Pool`, optional
+        a pool of processes started by `worker_pool` with the same `nproc`
+        and `nproc_plot`, to use instead of starting a new one, default:
+        `None`
+
+    **kwargs : `dict`, optional
+        additional keyword arguments to `scan_channel`
+
+    Yields
+    ------
+    index : `int`
+        the position of this result in `channels`
+
+    channel : `OmegaChannel` or `None`
+        the scanned channel, or `None` if the scan failed
+
+    significant : `bool`
+        whether the channel was found to be significant
+
+    Notes
+    -----
+    When `nproc > 1`, results are yielded in the order in which workers
+    finish, not necessarily the order of `channels`; use `index` to recover
+    the input order. Each worker then renders its own plots, and
+    `nproc_plot` is ignored.
+
+    When scanning serially with `nproc_plot > 1`, plots are rendered by a
+    separate pool of processes while the next channel is scanned. Each
+    channel is yielded only once all of its plots have been written, in
+    the order of `channels`.
+
+    Channels missing from `data` are skipped with a `UserWarning`, unless
+    they are found by `is_stored`.
+    """
+    kwargs.update(gps=gps, fftlength=fftlength)
+    data = data or {}
+    jobs = []
+    for i, channel in enumerate(channels):
+        try:
+            xoft = data[channel.name]
+        except KeyError as exc:
+            if is_stored(channel, **kwargs):
+                jobs.append((i, channel, None, kwargs))
+                continue
+            warnings.warn("Skipping {}: [{}] {}".format(
+                channel.name, type(exc), str(exc)), UserWarning)
+            yield (i, None, False)
+            continue
+        jobs.append((i, channel, xoft, kwargs))
+    if nproc > 1 and len(jobs) > 1:
+        # send the matched-filter (and its caches) to each worker only once,
+        # through a file, so that workers need not be started for this call
+        correlate = kwargs.pop('correlate', None)
+        if correlate is not None:
+            kwargs['shared'] = {'correlate': _share(correlate)}
+        try:
+            with _open_pool(pool, min(nproc, len(jobs)),
+                            initializer=_init_worker) as workers:
+                for result in workers.imap_unordered(_scan_channel, jobs):
+                    yield result
+        finally:
+            if correlate is not None:
+                os.remove(kwargs['shared']['correlate'])
+    elif nproc_plot > 1 or pool is not None:
+        pending = []
+        with _open_pool(pool, nproc_plot,
+                        initializer=_init_worker) as workers:
+            for (i, channel, xoft, kw) in jobs:
+                pending.append((i,) + scan_channel(
+                    channel, xoft, pool=workers, **kw))
+                # yield channels whose plots have finished rendering
+                while pending and all(r.ready() for r in pending[0][3]):
+                    yield _wait(*pending.pop(0))
+            for result in pending:
+                yield _wait(*result)
+    else:
+        for result in map(_scan_channel, jobs):
+            yield result
+
+
+def prefetch_blocks(blocks, gps, ahead=1, skip=(), ignore_state_flags=False,
+                    span=None, cache=None, timer=None, segment_cache=None,
+                    fused=False, **kwargs):
+    """Iterate over blocks of channels, reading data ahead in the background
+
+    Parameters
+    ----------
+    blocks : `list` of `OmegaChannelList`
+        the blocks of channels to read
+
+    gps : `float`
+        the GPS time (seconds) to scan
+
+    ahead : `int`, optional
+        number of read groups (see `plan_reads`) to read in the background
+        while the current group is being processed, default: 1
+
+    skip : `list` of `str`, optional
+        names of channels that need not be read, e.g. those checkpointed
+        from a previous run, default: read all channels
+
+    ignore_state_flags : `bool`, optional
+        whether to ignore the `state-flag` of each block, default: `False`
+
+    span : `tuple` of `float`, optional
+        GPS ``(start, end)`` times of a cluster of scans sharing data, if
+        given then data are read (and yielded) over this span, padded by
+        each block's duration, default: read around `gps` only
+
+    cache : `str`, optional
+        path to a directory of conditioned data, see `condition_shared`,
+        channels already cached there are not read, default: `None`
+
+    timer : `~gwdetchar.omega.timing.Timer`, optional
+        a timer in which to record the ``'check_flag'`` and ``'get_data'``
+        stages of each group, default: do not record
+
+    segment_cache : `str`, optional
+        path to a directory in which to cache state flag segments, see
+        `~gwdetchar.io.segments.query_flag`, default: do not cache
+
+    fused : `bool`, optional
+        whether channels in `cache` were conditioned with
+        `~gwdetchar.omega.whiten_highpass`, default: `False`
+
+    **kwargs : `dict`, optional
+        additional keyword arguments to
+        `~gwdetchar.io.datafind.get_data`, except `nproc`, which is
+        always 1
+
+    Yields
+    ------
+    block : `OmegaChannelList`
+        the next block of channels, grouped as in `plan_reads`
+
+    active : `bool`
+        whether the state flag for this block was active for the full
+        `block.duration`
+
+    data : `~gwpy.timeseries.TimeSeriesDict` or `None`
+        data for every channel in `block` not listed in `skip`, or `None`
+        if the block is not active or every channel is listed in `skip`
+
+    Notes
+    -----
+    Each group of blocks given by `plan_reads` is read with a single call
+    to `~gwdetchar.io.datafind.get_data`. Reads are performed
+    one at a time in a single background thread, so that besides the group
+    being processed at most `ahead` further groups are read or held in
+    memory. Any error raised while reading a group is re-raised when its
+    first block is due to be yielded.
+
+    Each group is read by a single process, since reading with several
+    would fork them from the background thread while another thread may
+    hold a lock (see `worker_pool`).
+    """
+    kwargs['nproc'] = 1
+    groups = iter(plan_reads(blocks))
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+
+        def _submit():
+            group = next(groups, None)
+            if group is not None:
+                pending.append(executor.submit(
+                    _read_group, group, gps, skip=skip,
+                    ignore_state_flags=ignore_state_flags, span=span,
+                    cache=cache, timer=timer, segment_cache=segment_cache,
+                    fused=fused, **kwargs))
+
+        for _ in range(ahead + 1):
+            _submit()
+        try:
+            while pending:
+                results = pending.popleft().result()
+                while results:
+                    yield results.pop(0)
+                _submit()
+        finally:  # do not wait on queued reads if stopped early
+            for future in pending:
+                future.cancel()
@@ -32,6 +32,13 @@ rcParams.update({
     'savefig.transparent': False,
 })
 
+# types of plot made for each plot time duration of a channel
+PLOT_TYPES = (
+    'qscan_whitened', 'qscan_autoscaled', 'qscan_highpassed',
+    'timeseries_raw', 'timeseries_highpassed', 'timeseries_whitened',
+    'eventgram_highpassed', 'eventgram_whitened', 'eventgram_autoscaled',
+)
+
 
 # -- internal formatting tools ------------------------------------------------
 
@@ -207,8 +214,26 @@ def spectral_plot(data, gps, span, channel, output, colormap='viridis',
     plot.close()
 
 
-def write_qscan_plots(gps, channel, series, colormap='viridis'):
-    """Custom plot utility for a full omega scan
+def _spectral_plot_with_q(data, q, *args, **kwargs):
+    """Thin wrapper around `spectral_plot` that restores the Q of a
+    `Spectrogram`, which does not survive pickling
+    """
+    data.q = q
+    return spectral_plot(data, *args, **kwargs)
+
+
+def _crop(data, gps, span, copy=False):
+    """Crop a `TimeSeries` or `Spectrogram` to a plotting span, retaining Q
+    """
+    out = data.crop(gps-span/2, gps+span/2, copy=copy)
+    if hasattr(data, 'q'):
+        out.q = data.q
+    return out
+
+
+def qscan_plot_jobs(gps, channel, series, colormap='viridis', copy=False,
+                    plottypes=None):
+    """List the plotting calls required for a full omega scan
 
     Parameters
     ----------
@@ -223,49 +248,131 @@ def write_qscan_plots(gps, channel, series, colormap='viridis'):
 
     colormap : `str`, optional
         matplotlib colormap to use, default: viridis
+
+    copy : `bool`, optional
+        whether to copy the cropped data, rather than return views, so that
+        `series` can be released before the jobs are run, default: `False`
+
+    plottypes : `list` of `str`, optional
+        the types of plot to make, each a key of ``channel.plots``,
+        default: all of `PLOT_TYPES`
+
+    Returns
+    -------
+    jobs : `list` of `tuple`
+        a list of `(function, args, kwargs)` for each plot, in which the data
+        have already been cropped to the relevant span, so that each job
+        is cheap to send to another process
     """
+    plottypes = PLOT_TYPES if plottypes is None else plottypes
     # unpack series objects
     xoft, hpxoft, wxoft, qgram, rqgram, qspec, rqspec = series
-    # range over plot types
-    fnames = channel.plots
-    for span, png1, png2, png3, png4, png5, png6, png7, png8, png9 in zip(
-        channel.pranges, fnames['qscan_whitened'],
-        fnames['qscan_autoscaled'], fnames['qscan_highpassed'],
-        fnames['timeseries_raw'], fnames['timeseries_highpassed'],
-        fnames['timeseries_whitened'], fnames['eventgram_highpassed'],
-        fnames['eventgram_whitened'], fnames['eventgram_autoscaled']
-    ):
-        # plot whitened qscan
-        spectral_plot(
-            qspec, gps, span, channel.name, str(png1), clim=(0, 25),
-            colormap=colormap)
-        # plot autoscaled, whitened qscan
-        spectral_plot(qspec, gps, span, channel.name, str(png2),
-                      colormap=colormap)
-        # plot raw qscan
-        spectral_plot(
-            rqspec, gps, span, channel.name, str(png3), clim=(0, 25),
-            colormap=colormap)
-        # plot raw timeseries
-        timeseries_plot(xoft, gps, span, channel.name, str(png4),
-                        ylabel='Amplitude')
-        # plot highpassed timeseries
-        timeseries_plot(hpxoft, gps, span, channel.name, str(png5),
-                        ylabel='Highpassed Amplitude')
-        # plot whitened timeseries
-        timeseries_plot(wxoft, gps, span, channel.name, str(png6),
-                        ylabel='Whitened Amplitude')
-        # plot raw eventgram
+    # eventgrams do not depend on the span
+    (table, rtable) = (None, None)
+    if 'eventgram_highpassed' in plottypes:
         rtable = rqgram.table(snrthresh=channel.snrthresh)
-        spectral_plot(
-            rtable, gps, span, channel.name, str(png7), clim=(0, 25),
-            colormap=colormap)
-        # plot whitened eventgram
+    if {'eventgram_whitened', 'eventgram_autoscaled'} & set(plottypes):
         table = qgram.table(snrthresh=channel.snrthresh)
-        spectral_plot(
-            table, gps, span, channel.name, str(png8), clim=(0, 25),
-            colormap=colormap)
-        # plot autoscaled whitened eventgram
-        spectral_plot(table, gps, span, channel.name, str(png9),
-                      colormap=colormap)
-    return
+    # range over plot types
+    fnames = channel.plots
+    jobs = []
+    for (i, span) in enumerate(channel.pranges):
+        args = (gps, span, channel.name)
+        wspec = _crop(qspec, gps, span, copy=copy)
+        rspec = _crop(rqspec, gps, span, copy=copy)
+        (raw, highpassed, whitened) = (
+            _crop(ts, gps, span, copy=copy) for ts in (xoft, hpxoft, wxoft))
+        for (ptype, func, data, kwargs) in [
+            # plot whitened qscan
+            ('qscan_whitened', _spectral_plot_with_q, (wspec, wspec.q),
+             {'clim': (0, 25), 'colormap': colormap}),
+            # plot autoscaled, whitened qscan
+            ('qscan_autoscaled', _spectral_plot_with_q, (wspec, wspec.q),
+             {'colormap': colormap}),
+            # plot raw qscan
+            ('qscan_highpassed', _spectral_plot_with_q, (rspec, rspec.q),
+             {'clim': (0, 25), 'colormap': colormap}),
+            # plot raw timeseries
+            ('timeseries_raw', timeseries_plot, (raw,),
+             {'ylabel': 'Amplitude'}),
+            # plot highpassed timeseries
+            ('timeseries_highpassed', timeseries_plot, (highpassed,),
+             {'ylabel': 'Highpassed Amplitude'}),
+            # plot whitened timeseries
+            ('timeseries_whitened', timeseries_plot, (whitened,),
+             {'ylabel': 'Whitened Amplitude'}),
+            # plot raw eventgram
+            ('eventgram_highpassed', spectral_plot, (rtable,),
+             {'clim': (0, 25), 'colormap': colormap}),
+            # plot whitened eventgram
+            ('eventgram_whitened', spectral_plot, (table,),
+             {'clim': (0, 25), 'colormap': colormap}),
+            # plot autoscaled whitened eventgram
+            ('eventgram_autoscaled', spectral_plot, (table,),
+             {'colormap': colormap}),
+        ]:
+            if ptype in plottypes:
+                jobs.append((func, data + args + (str(fnames[ptype][i]),),
+                             kwargs))
+    return jobs
+
+
+def write_qscan_plots(gps, channel, series, colormap='viridis', pool=None):
+    """Custom plot utility for a full omega scan
+
+    Parameters
+    ----------
+    gps : `float`
+        reference GPS time (in seconds) to serve as the origin
+
+    channel : `OmegaChannel`
+        channel corresponding to these data
+
+    series : `tuple`
+        a collection of `TimeSeries`, `Spectrogram`, and `QGram` objects
+
+    colormap : `str`, optional
+        matplotlib colormap to use, default: viridis
+
+    pool : `multiprocessing.Pool`, optional
+        a pool of processes in which to render plots asynchronously,
+        default: render serially in this process
+
+    Returns
+    -------
+    renders : `list` of `~multiprocessing.pool.AsyncResult`
+        pending plot renders, one per output file, or an empty list if
+        `pool` is `None`
+    """
+    jobs = qscan_plot_jobs(gps, channel, series, colormap=colormap)
+    return render_qscan_plots(jobs, pool=pool)
+
+
+def render_qscan_plots(jobs, pool=None):
+    """Render plotting jobs for a full omega scan
+
+    Parameters
+    ----------
+    jobs : `list` of `tuple`
+        a list of `(function, args, kwargs)` for each plot, as returned by
+        `qscan_plot_jobs`, which is emptied as jobs are rendered or submitted
+
+    pool : `multiprocessing.Pool`, optional
+        a pool of processes in which to render plots asynchronously,
+        default: render serially in this process
+
+    Returns
+    -------
+    renders : `list` of `~multiprocessing.pool.AsyncResult`
+        pending plot renders, one per output file, or an empty list if
+        `pool` is `None`
+    """
+    renders = []
+    jobs.reverse()  # release the data for each job once it is handled
+    while jobs:
+        (func, args, kwargs) = jobs.pop()
+        if pool is None:
+            func(*args, **kwargs)
+        else:
+            renders.append(pool.apply_async(func, args, kwargs))
+    return renders
@@ -0,0 +1,222 @@
+# coding=utf-8
+# Copyright (C) Alex Urban (2019)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with GW DetChar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""A persistent, file-queue based service for omega scans
+
+Scan requests are JSON files placed in the ``new`` sub-directory of a queue
+directory. A running service claims each request by moving it to ``active``,
+runs `gwdetchar-omega` within its own (warm) process, then moves the request
+to ``done`` or ``failed``. Module imports, parsed configuration files, frame
+file queries and channel indices, and the pools of worker processes (with
+their cached Q-plane tilings) are all kept warm between requests.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import traceback
+import tracemalloc
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+
+QUEUE_DIRS = ('new', 'active', 'done', 'failed')
+CACHE_DIR = 'cache'
+
+
+# -- utilities ----------------------------------------------------------------
+
+def init_queue(queue):
+    """Create (if needed) the sub-directories of a scan request queue
+
+    Parameters
+    ----------
+    queue : `str`
+        path to the queue directory
+
+    Returns
+    -------
+    dirs : `dict`
+        the absolute path of each sub-directory, keyed by name
+    """
+    queue = os.path.abspath(os.path.expanduser(queue))
+    dirs = {d: os.path.join(queue, d) for d in QUEUE_DIRS}
+    for path in dirs.values():
+        if not os.path.isdir(path):
+            os.makedirs(path)
+    return dirs
+
+
+def submit(queue, gps, flags=[], outdir=None):
+    """Submit an omega scan request to a queue
+
+    Parameters
+    ----------
+    queue : `str`
+        path to the queue directory
+
+    gps : `float`
+        GPS time to scan
+
+    flags : `list` of `str`, optional
+        command-line flags to pass to `gwdetchar-omega`, see
+        `~gwdetchar.omega.batch.get_command_line_flags`
+
+    outdir : `str`, optional
+        output directory for this scan, default: the `gwdetchar-omega`
+        default
+
+    Returns
+    -------
+    path : `str`
+        the path of the new request file
+    """
+    dirs = init_queue(queue)
+    argv = [str(gps)] + list(flags)
+    if outdir is not None:
+        argv.extend(('--output-directory', os.path.abspath(outdir)))
+    name = '{:.6f}_{}.json'.format(time.time(), gps)
+    path = os.path.join(dirs['new'], name)
+    # write then move, so that a service never reads a partial request,
+    # staging the request in the queue directory itself, which no service
+    # ever lists
+    fd, tmp = tempfile.mkstemp(prefix='.', suffix='.json',
+                               dir=os.path.dirname(dirs['new']))
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'argv': argv}, f)
+    os.rename(tmp, path)
+    return path
+
+
+def run_scan(argv, pools=None, target=None):
+    """Run `gwdetchar-omega` within the current process
+
+    Parameters
+    ----------
+    argv : `list` of `str`
+        command-line arguments for `gwdetchar-omega`
+
+    pools : `dict`, optional
+        pools of worker processes to re-use, and to which any new pool is
+        added, see `gwdetchar.omega.__main__.main`
+
+    target : `callable`, optional
+        the function to run with `argv` and `pools`, default:
+        `gwdetchar.omega.__main__.main`
+
+    Returns
+    -------
+    status : `int`
+        the exit status of the scan, `0` on success
+
+    Notes
+    -----
+    Modules imported by the scan, and any data cached by them in this process
+    (e.g. parsed configuration files or Q-plane tilings), persist across
+    calls, as do the worker processes in `pools`. The working directory is
+    restored on exit, and memory tracing is stopped if the scan started it
+    (e.g. with ``--low-memory``) but failed before stopping it.
+    """
+    if target is None:
+        from .__main__ import main as target
+    cwd = os.getcwd()
+    tracing = tracemalloc.is_tracing()
+    try:
+        target(list(argv), pools=pools)
+    except SystemExit as exc:
+        if exc.code is None:
+            return 0
+        return exc.code if isinstance(exc.code, int) else 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        os.chdir(cwd)
+        if tracemalloc.is_tracing() and not tracing:
+            tracemalloc.stop()
+    return 0
+
+
+def serve(queue, interval=1., once=False, logger=None, target=None):
+    """Process omega scan requests from a queue until interrupted
+
+    Parameters
+    ----------
+    queue : `str`
+        path to the queue directory
+
+    interval : `float`, optional
+        time (seconds) to wait between polls of an empty queue,
+        default: 1
+
+    once : `bool`, optional
+        stop once the queue is empty, then remove any data cached in the
+        queue's ``cache`` sub-directory by clustered scans, default: `False`
+
+    logger : `logging.Logger`, optional
+        logger to report on requests, default: do not log
+
+    target : `callable`, optional
+        the function to run for each request, see `run_scan`
+
+    Returns
+    -------
+    nscans : `int`
+        the number of requests processed
+
+    Notes
+    -----
+    Each pool of worker processes is started by the first request that
+    needs it, then re-used by every later request with the same number of
+    processes, until the service stops.
+    """
+    dirs = init_queue(queue)
+    pools = {}
+    nscans = 0
+    try:
+        while True:
+            names = sorted(f for f in os.listdir(dirs['new'])
+                           if f.endswith('.json'))
+            for name in names:
+                active = os.path.join(dirs['active'], name)
+                try:  # claim this request
+                    os.rename(os.path.join(dirs['new'], name), active)
+                except OSError:  # claimed by another service
+                    continue
+                with open(active, 'r') as f:
+                    argv = json.load(f)['argv']
+                if logger is not None:
+                    logger.info('Processing request {}'.format(name))
+                status = run_scan(argv, pools=pools, target=target)
+                os.rename(active, os.path.join(
+                    dirs['done'] if status == 0 else dirs['failed'], name))
+                if logger is not None:
+                    logger.info('Request {} finished with status {}'.format(
+                        name, status))
+                nscans += 1
+            if once and not names:
+                shutil.rmtree(os.path.join(os.path.dirname(dirs['new']),
+                                           CACHE_DIR), ignore_errors=True)
+                return nscans
+            if not names:
+                time.sleep(interval)
+    finally:
+        for pool in pools.values():
+            pool.close()
+            pool.join()
@@ -42,6 +42,7 @@ FLAGS = [
     '--disable-correlation',
     '--disable-checkpoint',
     '--ignore-state-flags',
+    '--disable-prefilter',
 ]
 
 CONDORCMDS = [
@@ -58,10 +59,20 @@ def test_get_command_line_flags():
     ifo = 'X1'
     flags = batch.get_command_line_flags(
         ifo, disable_correlation=True, disable_checkpoint=True,
-        ignore_state_flags=True)
+        ignore_state_flags=True, disable_prefilter=True)
     nptest.assert_array_equal(flags, FLAGS)
 
 
+def test_cluster_times():
+    times = [1187008882, 1187008900, 1187008862, 1187009010, 1187008942]
+    clusters = batch.cluster_times(times, 60)
+    assert clusters == [
+        [1187008862, 1187008882, 1187008900],
+        [1187008942],
+        [1187009010],
+    ]
+
+
 def test_get_condor_arguments():
     gps = 1126259462
     condorcmds = batch.get_condor_arguments(
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) Alex Urban (2019)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gwdetchar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for `gwdetchar.omega.checkpoint`
+"""
+
+import os
+import shutil
+
+import numpy
+
+from numpy import testing as nptest
+
+from .. import (checkpoint, config, core)
+from .test_core import (CONFIGURATION, FFTLENGTH, INPUT)
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+
+
+# global test objects
+
+CHANNEL = config.OmegaChannel(
+    channelname='L1:TEST-STRAIN', section='test', **CONFIGURATION)
+
+SERIES = core.scan(
+    0, CHANNEL, INPUT, FFTLENGTH, resample=2048)
+
+
+# -- unit tests ---------------------------------------------------------------
+
+def test_config_hash():
+    chash = checkpoint.config_hash(0, CHANNEL, FFTLENGTH, 32)
+    assert len(chash) == 16
+    assert checkpoint.config_hash(0, CHANNEL, FFTLENGTH, 32) == chash
+    assert checkpoint.config_hash(
+        0, CHANNEL, FFTLENGTH, 32, resample=2048) != chash
+    assert checkpoint.config_hash(
+        0, CHANNEL, FFTLENGTH, 32, fused=True) != chash
+    path = checkpoint.checkpoint_path('store', CHANNEL, chash)
+    assert path == os.path.join('store', 'L1-TEST-STRAIN-{}.h5'.format(chash))
+
+
+def test_checkpoint(tmpdir):
+    store = str(tmpdir)
+    path = os.path.join(store, 'test.h5')
+    checkpoint.write_checkpoint(path, SERIES, 0, pranges=CHANNEL.pranges)
+    assert os.listdir(store) == ['test.h5']
+    series = checkpoint.read_checkpoint(path, 0, CHANNEL.pranges)
+    assert len(series) == len(SERIES)
+    for (a, b) in zip(series[:3], SERIES[:3]):
+        nptest.assert_array_equal(a.value, b.value)
+        assert a.t0 == b.t0
+    for (a, b) in zip(series[3:5], SERIES[3:5]):
+        assert a.peak == b.peak
+        assert a.plane.q == b.plane.q
+    for (a, b) in zip(series[5:], SERIES[5:]):
+        nptest.assert_array_equal(a.value, b.value)
+        assert a.dtype == b.dtype
+        assert a.q == b.q
+    # spectrograms can be read in single precision
+    series = checkpoint.read_checkpoint(path, 0, CHANNEL.pranges, lowmem=True)
+    assert series[5].dtype == numpy.float32
+    # new plot durations are re-interpolated
+    series = checkpoint.read_checkpoint(path, 0, [2])
+    assert abs(series[5].span) == 2
+    shutil.rmtree(store, ignore_errors=True)
+
+
+def test_checkpoint_insignificant(tmpdir):
+    path = str(tmpdir.join('test.h5'))
+    checkpoint.write_checkpoint(path, None, 0)
+    assert checkpoint.read_checkpoint(path, 0, CHANNEL.pranges) is None
+    shutil.rmtree(str(tmpdir), ignore_errors=True)
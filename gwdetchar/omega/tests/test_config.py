@@ -87,6 +87,23 @@ def test_get_default_configuration():
     assert nfile == [os.path.expanduser('~detchar/etc/omega/O2/Network.ini')]
 
 
+def test_parse_configuration(tmpdir):
+    cfile = str(tmpdir.join('config.ini'))
+    with open(cfile, 'w') as f:
+        f.write(CONFIGURATION)
+    config._CONFIGS.clear()
+    cp = config.parse_configuration([cfile], ifo='X1')
+    assert cp.sections() == CP.sections()
+    assert dict(cp['GW']) == dict(CP['GW'])
+    assert len(config._CONFIGS) == 1
+    # each parser is new, so may be modified freely
+    cp.remove_section('primary')
+    cp2 = config.parse_configuration([cfile], ifo='X1')
+    assert cp2.sections() == ['primary', 'GW']
+    assert len(config._CONFIGS) == 1
+    config._CONFIGS.clear()
+
+
 def test_get_fancyplots():
     fp = config.get_fancyplots(
         channel='X1:TEST-STRAIN', plottype='test-plot', duration=4)
@@ -176,6 +193,22 @@ def test_omega_channel():
     assert channel.snrthresh == 5
     assert channel.always_plot is True
     assert channel.pranges == [4]
+    assert channel.provisional is False
+
+
+def test_quicklook():
+    channel = config.OmegaChannel(
+        'X1:TEST-STRAIN', 'GW', **dict(GW.params, **{
+            'plot-time-durations': '8,1,4'}))
+    quick = channel.quicklook()
+    assert quick.name == channel.name
+    assert quick.provisional is True
+    assert quick.pranges == [1]
+    for (key, plots) in quick.plots.items():
+        assert plots == [channel.plots[key][1]]
+    # the original is unchanged
+    assert channel.provisional is False
+    assert channel.pranges == [8, 1, 4]
 
 
 def test_save_loudest_tile_features():
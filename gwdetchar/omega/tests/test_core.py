@@ -23,8 +23,9 @@ import numpy
 from numpy import testing as nptest
 from scipy import signal
 
-from gwpy.timeseries import TimeSeries
-from gwpy.signal.qtransform import QGram
+from gwpy.segments import Segment
+from gwpy.timeseries import (TimeSeries, TimeSeriesDict)
+from gwpy.signal.qtransform import (QGram, q_scan)
 from gwpy.spectrogram import Spectrogram
 
 from .. import (core, config)
@@ -37,7 +38,7 @@ __author__ = 'Alex Urban <alexander.urban@ligo.org>'
 FFTLENGTH = 8
 
 NOISE = TimeSeries(
-    numpy.random.normal(loc=1, scale=.5, size=16384 * 68),
+    numpy.random.RandomState(0).normal(loc=1, scale=.5, size=16384 * 68),
     sample_rate=16384, epoch=-34).zpk([], [0], 1)
 GLITCH = TimeSeries(
     signal.gausspulse(numpy.arange(-1, 1, 1./16384), bw=100),
@@ -53,9 +54,123 @@ CONFIGURATION = {
 CHANNEL = config.OmegaChannel(
     channelname='X1:TEST-STRAIN', section='test', **CONFIGURATION)
 
+SEARCH = Segment(-0.25, 0.25)
+
 
 # -- unit tests ---------------------------------------------------------------
 
+def test_get_tiling():
+    core._TILINGS.clear()
+    tiling = core.get_tiling(64, 2048, qrange=(4, 64), frange=(4, 1024))
+    assert core.get_tiling(64., 2048., (4., 64.), (4., 1024.)) is tiling
+    assert len(core._TILINGS) == 1
+
+    # test least-recently-used eviction
+    for fhigh in range(core.TILING_CACHE_SIZE):
+        core.get_tiling(64, 2048, qrange=(4, 64), frange=(4, 512 + fhigh))
+    assert len(core._TILINGS) == core.TILING_CACHE_SIZE
+    assert core.get_tiling(64, 2048, (4, 64), (4, 1024)) is not tiling
+    core._TILINGS.clear()
+
+
+def test_interpolate_qgrams():
+    core._GRIDS.clear()
+    data = INPUT.resample(2048)
+    (qgram, _) = core.q_scan(data, qrange=CHANNEL.qrange,
+                             frange=CHANNEL.frange, search=SEARCH)
+    rqgram = core.q_plane(
+        NOISE.resample(2048).fft().value, qgram.plane.q, qgram.plane.frange,
+        abs(data.span), 2048, epoch=data.t0.value, search=SEARCH)
+    outseg = Segment(-2, 2)
+    specs = core.interpolate_qgrams((qgram, rqgram), 4/1400., 700, outseg)
+    # compare against the unbatched implementation
+    for (qg, spec) in zip((qgram, rqgram), specs):
+        spec2 = qg.interpolate(tres=4/1400., fres=700, logf=True,
+                               outseg=outseg)
+        assert isinstance(spec, Spectrogram)
+        assert spec.shape == spec2.shape == (1400, 700)
+        assert spec.q == spec2.q == qgram.plane.q
+        assert spec.dtype == spec2.dtype
+        nptest.assert_allclose(spec.frequencies.value,
+                               spec2.frequencies.value)
+        nptest.assert_allclose(spec.value, spec2.value, rtol=1e-5,
+                               atol=1e-5 * spec2.value.max())
+    # the grid is shared
+    assert len(core._GRIDS) == 1
+    core.interpolate_qgrams((qgram,), 4/1400., 700, outseg)
+    assert len(core._GRIDS) == 1
+    core._GRIDS.clear()
+
+
+def test_q_scan():
+    # compare against the uncached implementation
+    data = NOISE.resample(2048)
+    (qgram, far) = core.q_scan(data, qrange=CHANNEL.qrange,
+                               frange=CHANNEL.frange, search=SEARCH)
+    (qgram2, far2) = q_scan(data, qrange=CHANNEL.qrange,
+                            frange=CHANNEL.frange, search=SEARCH)
+    nptest.assert_allclose(far, far2)
+    assert qgram.peak == qgram2.peak
+    assert qgram.plane.q == qgram2.plane.q
+    for (row, row2) in zip(qgram.energies, qgram2.energies):
+        nptest.assert_array_equal(row.value, row2.value)
+
+
+def test_q_plane():
+    data = NOISE.resample(2048)
+    (qgram, _) = core.q_scan(data, qrange=CHANNEL.qrange,
+                             frange=CHANNEL.frange, search=SEARCH)
+    (q, frange) = (qgram.plane.q, qgram.plane.frange)
+    kwargs = {'epoch': data.t0.value, 'search': SEARCH}
+
+    # test reuse of a cached plane
+    assert core._find_plane(
+        q, frange, abs(data.span), 2048, 0.2) is qgram.plane
+    rqgram = core.q_plane(data.fft().value, q, frange, abs(data.span), 2048,
+                          **kwargs)
+    assert rqgram.plane is qgram.plane
+    assert rqgram.peak == qgram.peak
+
+    # compare against a full scan over a single plane
+    (rqgram2, _) = q_scan(data, qrange=(q, q), frange=frange, search=SEARCH)
+    core._TILINGS.clear()
+    rqgram3 = core.q_plane(data.fft().value, q, frange, abs(data.span), 2048,
+                           **kwargs)
+    for qg in (rqgram2, rqgram3):
+        assert qg.plane.q == q
+        assert qg.peak == rqgram.peak
+        for (row, row2) in zip(rqgram.energies, qg.energies):
+            nptest.assert_array_equal(row.value, row2.value)
+
+
+def test_screen_significance():
+    white = TimeSeries(numpy.random.RandomState(1).normal(size=2048 * 68),
+                       sample_rate=2048, epoch=-34)
+    kwargs = {
+        'duration': abs(white.span),
+        'sampling': 2048,
+        'qrange': CHANNEL.qrange,
+        'frange': CHANNEL.frange,
+        'epoch': white.t0.value,
+        'search': SEARCH,
+    }
+    (_, far) = core.q_scan(white.fft().value, **kwargs)
+    # test that the screen never rejects what a full scan would accept
+    assert core.screen_significance(
+        white.fft().value, fthresh=far * 1.01, **kwargs)
+    assert core.screen_significance(
+        white.fft().value, fthresh=1e-10, coarse=0.2, **kwargs)
+    assert not core.screen_significance(
+        white.fft().value, fthresh=1e-10, **kwargs)
+
+    # test that a loud glitch passes
+    glitch = white.inject(TimeSeries(
+        signal.gausspulse(numpy.arange(-1, 1, 1./2048), fc=100) * 10,
+        sample_rate=2048, epoch=-1))
+    assert core.screen_significance(
+        glitch.fft().value, fthresh=1e-10, **kwargs)
+
+
 def test_highpass():
     # high-pass filter the input
     hp = core.highpass(INPUT, f_low=4)
@@ -65,6 +180,17 @@ def test_highpass():
     nptest.assert_almost_equal(hp.value.mean(), 0, decimal=5)
 
 
+def test_get_highpass():
+    core._FILTERS.clear()
+    sos = core.get_highpass(12, 4 / 1.5, 4096)
+    assert core.get_highpass(12., 4 / 1.5, 4096.) is sos
+    nptest.assert_array_equal(sos, signal.butter(
+        12, 4 / 1.5, btype='highpass', output='sos', fs=4096))
+    assert core.get_highpass(12, 4 / 1.5, 2048) is not sos
+    assert len(core._FILTERS) == 2
+    core._FILTERS.clear()
+
+
 def test_whiten():
     # whiten the input
     whitened = core.whiten(INPUT, fftlength=FFTLENGTH)
@@ -102,6 +228,52 @@ def test_conditioner_with_highpass():
     nptest.assert_almost_equal(wxoft.value.mean(), 0, decimal=2)
 
 
+def test_conditioner_fused():
+    # the fused conditioner should agree with the default path
+    wxoft, hpxoft, xoft = core.conditioner(
+        INPUT, fftlength=FFTLENGTH, resample=2048, f_low=4)
+    fwxoft, fhpxoft, fxoft = core.conditioner(
+        INPUT, fftlength=FFTLENGTH, resample=2048, f_low=4, fused=True)
+    assert xoft.is_compatible(fwxoft)
+    assert xoft.is_compatible(fhpxoft)
+    nptest.assert_array_equal(xoft.value, fxoft.value)
+
+    def _rms(a, b):  # relative RMS difference away from the edges
+        (a, b) = (a.crop(-32, 32).value, b.crop(-32, 32).value)
+        return numpy.sqrt(((a - b) ** 2).mean() / (a ** 2).mean())
+
+    # tolerances stated by `core.whiten_highpass`: 0.1% RMS high-passed,
+    # and 2% RMS whitened above 2 * f_low
+    assert _rms(hpxoft, fhpxoft) < 1e-3
+    assert _rms(wxoft.highpass(8), fwxoft.highpass(8)) < 2e-2
+
+
+def test_condition_block():
+    data = TimeSeriesDict([
+        ('X1:TEST-A', INPUT),
+        ('X1:TEST-B', INPUT * 2),
+        ('X1:TEST-C', INPUT.resample(8192)),
+    ])
+    conditioned = core.condition_block(
+        data, fftlength=FFTLENGTH, resample=2048, f_low=4)
+    assert list(conditioned.keys()) == list(data.keys())
+    for (name, series) in data.items():
+        expected = core.conditioner(
+            series, fftlength=FFTLENGTH, resample=2048, f_low=4)
+        assert len(conditioned[name]) == 3
+        for (a, b) in zip(conditioned[name], expected):
+            assert a.is_compatible(b)
+            assert a.name == series.name
+            nptest.assert_allclose(a.value, b.value, rtol=0,
+                                   atol=1e-6 * abs(b.value).max())
+
+    # test again without a high-pass filter
+    conditioned = core.condition_block(data, fftlength=FFTLENGTH)
+    (wxoft, xoft) = conditioned['X1:TEST-C']
+    assert xoft.sample_rate.value == 8192
+    nptest.assert_array_equal(xoft.value, data['X1:TEST-C'].value)
+
+
 def test_primary():
     # condition a data stream for use as a matched-filter
     length = 6
@@ -135,6 +307,20 @@ def test_cross_correlate():
     assert corr3.abs().times[corr3.argmax()].value == tmax.value
 
 
+def test_matched_filter():
+    wxoft = core.whiten(INPUT, fftlength=FFTLENGTH)
+    whoft = core.primary(0, length=6, hoft=INPUT, fftlength=FFTLENGTH)
+    mfilter = core.MatchedFilter(whoft)
+    # compare against a fresh correlation at each sample rate
+    for (xoft, hoft) in [(wxoft, whoft), (wxoft.resample(2048), whoft)]:
+        corr = mfilter.correlate(xoft)
+        nptest.assert_allclose(
+            corr.value, core.cross_correlate(xoft, hoft).value, atol=1e-8)
+        assert corr.is_compatible(core.cross_correlate(xoft, hoft))
+        assert core.cross_correlate(xoft, mfilter) is not corr
+    assert sorted(mfilter._filters) == [2048, 16384]
+
+
 def test_scan():
     # get omega scan products
     xoft, hpxoft, wxoft, qgram, rqgram, qspec, rqspec = core.scan(
@@ -159,3 +345,16 @@ def test_scan():
     empty = core.scan(gps=0, channel=CHANNEL, xoft=NOISE, resample=2048,
                       fftlength=FFTLENGTH)
     assert empty is None
+    empty = core.scan(gps=0, channel=CHANNEL, xoft=NOISE, resample=2048,
+                      fftlength=FFTLENGTH, prefilter=False)
+    assert empty is None
+    CHANNEL.always_plot = True
+
+
+def test_scan_lowmem():
+    series = core.scan(gps=0, channel=CHANNEL, xoft=INPUT, resample=2048,
+                       fftlength=FFTLENGTH, lowmem=True)
+    (qgram, qspec, rqspec) = (series[3], series[5], series[6])
+    assert qspec.dtype == rqspec.dtype == numpy.float32
+    assert qspec.shape == (1400, 700)
+    assert qspec.q == rqspec.q == qgram.plane.q
@@ -19,9 +19,14 @@
 """Tests for `gwdetchar.omega.html`
 """
 
+import copy
 import os
 import shutil
 from io import StringIO
+from collections import OrderedDict
+
+from gwpy.table import Table
+from gwpy.testing.compat import mock
 
 from .. import (config, html)
 from ..._version import get_versions
@@ -263,6 +268,56 @@ def test_write_summary_table(tmpdir):
     shutil.rmtree(wdir)
 
 
+def test_append_summary_row(tmpdir):
+    tmpdir.mkdir('data')
+    wdir = str(tmpdir)
+    os.chdir(wdir)
+    html.write_summary_table(ANALYZED, correlated=True)
+    html.append_summary_row(GW.channels[0], correlated=True)
+    table = Table.read(os.path.join('data', 'summary.csv'))
+    assert len(table) == 2
+    assert list(table['Channel']) == [GW.channels[0].name] * 2
+    assert table.colnames == list(
+        html.SUMMARY_COLUMNS + html.CORRELATION_COLUMNS)
+    for col in table.colnames:
+        assert table[0][col] == table[1][col]
+    shutil.rmtree(wdir)
+
+
+def test_append_summary_row_header(tmpdir):
+    tmpdir.mkdir('data')
+    wdir = str(tmpdir)
+    os.chdir(wdir)
+    # an initial write without correlation, then correlated rows
+    html.write_summary_table({}, correlated=False)
+    html.append_summary_row(GW.channels[0], correlated=True)
+    html.append_summary_row(GW.channels[0], correlated=True)
+    table = Table.read(os.path.join('data', 'summary.csv'))
+    assert table.colnames == list(
+        html.SUMMARY_COLUMNS + html.CORRELATION_COLUMNS)
+    assert list(table['Channel']) == [GW.channels[0].name] * 2
+    # uncorrelated rows from before are dropped, as they cannot be checkpoints
+    html.write_summary_table(ANALYZED, correlated=False)
+    html.append_summary_row(GW.channels[0], correlated=True)
+    table = Table.read(os.path.join('data', 'summary.csv'))
+    assert list(table['Channel']) == [GW.channels[0].name]
+    shutil.rmtree(wdir)
+
+
+def test_write_summary_table_provisional(tmpdir):
+    tmpdir.mkdir('data')
+    wdir = str(tmpdir)
+    os.chdir(wdir)
+    quick = GW.channels[0].quicklook()
+    html.write_summary_table({'GW': {
+        'name': 'Gravitational-Wave Strain',
+        'channels': GW.channels + [quick],
+    }}, correlated=True)
+    table = Table.read(os.path.join('data', 'summary.csv'))
+    assert list(table['Channel']) == [c.name for c in GW.channels]
+    shutil.rmtree(wdir)
+
+
 def test_write_summary():
     page = html.write_summary('L1', 0, incomplete=True)
     assert parse_html(str(page)) == parse_html(
@@ -324,6 +379,28 @@ def test_write_block():
     assert parse_html(str(page)) == parse_html(BLOCK_HTML)
 
 
+def test_write_block_provisional():
+    block = {'name': 'Gravitational-Wave Strain',
+             'channels': [GW.channels[0].quicklook()]}
+    page = html.write_block('GW', block, 'info')
+    assert 'provisional, quick-look result' in page
+    assert 'dropdown-menu' not in page
+
+
+def test_write_channel():
+    channel = copy.copy(GW.channels[0])
+    page = html.write_channel(channel, 0, 'info')
+    assert page in html.write_block(
+        'GW', {'name': 'Gravitational-Wave Strain', 'channels': [channel]},
+        'info')
+    # the channel is rendered only once
+    with mock.patch('gwdetchar.io.html.table', return_value='') as table:
+        assert html.write_channel(channel, 0, 'info') == page
+        table.assert_not_called()
+        html.write_channel(channel, 1, 'info')
+        table.assert_called_once()
+
+
 # -- end-to-end tests ---------------------------------------------------------
 
 def test_write_qscan_page(tmpdir):
@@ -351,6 +428,37 @@ def test_write_null_page(tmpdir):
     shutil.rmtree(str(tmpdir), ignore_errors=True)
 
 
+def test_write_timing():
+    timing = OrderedDict([('q_scan', OrderedDict([
+        ('count', 2), ('wall', 1.5), ('cpu', 1.25), ('rss', 2**21),
+        ('peak', 2**20)]))])
+    page = html.write_timing(timing)
+    h1 = parse_html(str(page))
+    h2 = parse_html(
+        '<div class="row">\n<div class="col-md-12">\n'
+        '<h2>Processing time</h2>\n<p>The total wall time, CPU time (of '
+            'the thread running it), and memory used by each stage of this '
+            'analysis are listed below. The RSS growth is the largest '
+            'increase in the peak resident memory of the process during any '
+            'call. The python heap is the largest increase in memory '
+            'allocated by python, recorded only with --low-memory on python '
+            '3.9 or later. Records for each channel and block are available '
+            'in <a href="../data/timing.json">data/timing.json</a>.</p>\n'
+        '<table class="table table-condensed table-hover table-bordered '
+            'table-responsive">\n'
+        '<thead>\n<tr>\n<th scope="col">Stage</th>\n'
+        '<th scope="col">Calls</th>\n<th scope="col">Wall time (s)</th>\n'
+        '<th scope="col">CPU time (s)</th>\n'
+        '<th scope="col">RSS growth (MiB)</th>\n'
+        '<th scope="col">Python heap (MiB)</th>\n</tr>\n</thead>\n'
+        '<tbody>\n<tr>\n<td>q_scan</td>\n<td>2</td>\n<td>1.50</td>\n'
+        '<td>1.25</td>\n<td>2.0</td>\n<td>1.0</td>\n</tr>\n</tbody>\n'
+        '</table>\n'
+        '</div>\n</div>'
+    )
+    assert h1 == h2
+
+
 def test_write_about_page(tmpdir):
     base = str(tmpdir)
     config = os.path.join(base, 'config.ini')
@@ -359,3 +467,19 @@ def test_write_about_page(tmpdir):
     os.chdir(base)
     html.write_about_page('L1', 0, [config], outdir='about')
     shutil.rmtree(base, ignore_errors=True)
+
+
+def test_write_about_page_timing(tmpdir):
+    base = str(tmpdir)
+    config = os.path.join(base, 'config.ini')
+    with open(config, 'w') as fobj:
+        fobj.write(CONFIGURATION)
+    os.chdir(base)
+    timing = OrderedDict([('q_scan', OrderedDict([
+        ('count', 2), ('wall', 1.5), ('cpu', 1.25), ('rss', 2**21),
+        ('peak', 2**20)]))])
+    index = html.write_about_page('L1', 0, [config], timing=timing,
+                                  outdir='about')
+    with open(index, 'r') as f:
+        assert 'Processing time' in f.read()
+    shutil.rmtree(base, ignore_errors=True)
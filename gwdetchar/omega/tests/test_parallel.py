@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) Alex Urban (2019)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gwdetchar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for `gwdetchar.omega.parallel`
+"""
+
+import os
+import shutil
+import warnings
+import pytest
+
+import numpy
+
+from gwpy.testing.compat import mock
+from gwpy.timeseries import TimeSeriesDict
+
+from matplotlib import use
+use('agg')
+
+from .. import (config, core, parallel)
+from .test_core import (CONFIGURATION, FFTLENGTH, INPUT)
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+
+
+# global test objects
+
+CHANNELS = [config.OmegaChannel(
+    channelname='L1:TEST-STRAIN_{}'.format(i), section='test',
+    **CONFIGURATION) for i in range(3)]
+
+DATA = TimeSeriesDict([(c.name, INPUT) for c in CHANNELS[:2]])
+
+
+# -- unit tests ---------------------------------------------------------------
+
+def test_scan_channel(tmpdir):
+    tmpdir.mkdir('plots')
+    wdir = str(tmpdir)
+    os.chdir(wdir)
+    correlate = core.primary(0, length=6, hoft=INPUT, fftlength=FFTLENGTH)
+    (channel, significant, renders) = parallel.scan_channel(
+        CHANNELS[0], INPUT, 0, FFTLENGTH, resample=2048, correlate=correlate)
+    assert significant is True
+    assert renders == []
+    assert channel.name == CHANNELS[0].name
+    assert abs(channel.t) < 0.1
+    assert hasattr(channel, 'corr')
+    for png in channel.plots['qscan_whitened']:
+        assert os.path.isfile(str(png))
+    shutil.rmtree(wdir, ignore_errors=True)
+
+
+def test_condition_shared(tmpdir):
+    cache = str(tmpdir)
+    channel = CHANNELS[0]
+    conditioned = parallel.condition_shared(
+        channel, INPUT, FFTLENGTH, cache, resample=2048)
+    assert len(conditioned) == 3
+    assert len(os.listdir(cache)) == 1
+    # second call reads from the cache
+    cached = parallel.condition_shared(
+        channel, None, FFTLENGTH, cache, resample=2048)
+    for (a, b) in zip(conditioned, cached):
+        assert a.span == b.span
+        numpy.testing.assert_array_equal(a.value, b.value)
+    # fused conditioning is cached separately
+    parallel.condition_shared(
+        channel, INPUT, FFTLENGTH, cache, resample=2048, fused=True)
+    assert len(os.listdir(cache)) == 2
+    assert parallel.is_stored(channel, 0, FFTLENGTH, resample=2048,
+                              cache=cache, fused=True)
+    shutil.rmtree(cache, ignore_errors=True)
+
+
+def test_condition_channels(tmpdir):
+    tmpdir.mkdir('plots')
+    wdir = str(tmpdir)
+    os.chdir(wdir)
+    conditioned = parallel.condition_channels(
+        CHANNELS, DATA, FFTLENGTH, resample=2048)
+    assert sorted(conditioned.keys()) == sorted(DATA.keys())
+    for name in DATA:
+        assert len(conditioned[name]) == 3
+        assert conditioned[name][0].sample_rate.value == 2048
+    # conditioned data are scanned as-is
+    (channel, significant, _) = parallel.scan_channel(
+        CHANNELS[0], conditioned[CHANNELS[0].name], 0, FFTLENGTH)
+    assert significant is True
+    assert 'conditioner' not in [r['stage'] for r in channel.timing]
+    shutil.rmtree(wdir, ignore_errors=True)
+
+
+def test_scan_channel_shared(tmpdir):
+    tmpdir.mkdir('plots')
+    wdir = str(tmpdir)
+    cache = str(tmpdir.mkdir('cache'))
+    os.chdir(wdir)
+    (channel, significant, _) = parallel.scan_channel(
+        CHANNELS[1], INPUT, 0, FFTLENGTH, resample=2048, cache=cache,
+        duration=32)
+    assert significant is True
+    assert channel.name == CHANNELS[1].name
+    # the cached channel need not be read again
+    with warnings.catch_warnings(record=True) as record:
+        warnings.simplefilter('always')
+        results = list(parallel.scan_channels(
+            CHANNELS[1:2], TimeSeriesDict(), 0, FFTLENGTH, resample=2048,
+            cache=cache, duration=32))
+    assert not record
+    assert results[0][2] is True
+    shutil.rmtree(wdir, ignore_errors=True)
+
+
+def test_scan_channel_quicklook(tmpdir):
+    tmpdir.mkdir('plots')
+    wdir = str(tmpdir)
+    os.chdir(wdir)
+    channel = CHANNELS[0].quicklook()
+    (channel, significant, _) = parallel.scan_channel(
+        channel, INPUT, 0, FFTLENGTH, resample=2048,
+        nt=parallel.QUICKLOOK_NT, nf=parallel.QUICKLOOK_NF,
+        plottypes=parallel.QUICKLOOK_PLOTS)
+    assert significant is True
+    assert channel.provisional is True
+    assert sorted(os.listdir('plots')) == sorted(
+        os.path.basename(str(png)) for png in
+        channel.plots['qscan_whitened'])
+    shutil.rmtree(wdir, ignore_errors=True)
+
+
+def test_scan_channel_store(tmpdir):
+    tmpdir.mkdir('plots')
+    wdir = str(tmpdir)
+    store = str(tmpdir.mkdir('store'))
+    os.chdir(wdir)
+    (channel, significant, _) = parallel.scan_channel(
+        CHANNELS[2], INPUT, 0, FFTLENGTH, resample=2048, store=store)
+    assert significant is True
+    assert len(os.listdir(store)) == 1
+    features = (channel.t, channel.f, channel.Q, channel.energy)
+    # the stored channel is re-plotted without its data
+    assert parallel.is_stored(CHANNELS[2], 0, FFTLENGTH, resample=2048,
+                              store=store)
+    with mock.patch('gwdetchar.omega.core.scan') as scan:
+        results = list(parallel.scan_channels(
+            CHANNELS[2:], None, 0, FFTLENGTH, resample=2048, store=store,
+            colormap='plasma'))
+    scan.assert_not_called()
+    assert results[0][2] is True
+    assert (results[0][1].t, results[0][1].f, results[0][1].Q,
+            results[0][1].energy) == features
+    shutil.rmtree(wdir, ignore_errors=True)
+
+
+def test_scan_channel_lowmem(tmpdir):
+    tmpdir.mkdir('plots')
+    wdir = str(tmpdir)
+    os.chdir(wdir)
+    channel = config.OmegaChannel(
+        channelname='L1:TEST-STRAIN_LOWMEM', section='test', **CONFIGURATION)
+    (channel, significant, _) = parallel.scan_channel(
+        channel, INPUT, 0, FFTLENGTH, resample=2048, lowmem=True)
+    assert significant is True
+    assert channel.peak_memory > 0
+    assert [r['stage'] for r in channel.timing] == [
+        'conditioner', 'q_scan', 'interpolate', 'write_qscan_plots']
+    for png in channel.plots['qscan_whitened']:
+        assert os.path.isfile(str(png))
+    shutil.rmtree(wdir, ignore_errors=True)
+
+
+@pytest.mark.parametrize('nproc, nproc_plot', [(1, 1), (2, 1), (1, 2)])
+def test_scan_channels(tmpdir, nproc, nproc_plot):
+    tmpdir.mkdir('plots')
+    wdir = str(tmpdir)
+    os.chdir(wdir)
+    correlate = core.MatchedFilter(core.primary(
+        0, length=6, hoft=INPUT, fftlength=FFTLENGTH))
+    with pytest.warns(UserWarning, match='Skipping L1:TEST-STRAIN_2'):
+        results = sorted(parallel.scan_channels(
+            CHANNELS, DATA, 0, FFTLENGTH, nproc=nproc,
+            nproc_plot=nproc_plot, resample=2048, correlate=correlate),
+            key=lambda x: x[0])
+    assert [r[0] for r in results] == [0, 1, 2]
+    assert [r[2] for r in results] == [True, True, False]
+    assert results[0][1].name == CHANNELS[0].name
+    assert hasattr(results[0][1], 'corr')
+    assert results[2][1] is None
+    for png in results[1][1].plots['eventgram_autoscaled']:
+        assert os.path.isfile(str(png))
+    shutil.rmtree(wdir, ignore_errors=True)
+
+
+def test_scan_channels_pool(tmpdir):
+    tmpdir.mkdir('plots')
+    wdir = str(tmpdir)
+    os.chdir(wdir)
+    assert parallel.worker_pool(nproc=1, nproc_plot=1) is None
+    correlate = core.MatchedFilter(core.primary(
+        0, length=6, hoft=INPUT, fftlength=FFTLENGTH))
+    pool = parallel.worker_pool(nproc=2)
+    try:
+        # the pool is re-used, and left open, with or without correlation
+        for matched in (correlate, None):
+            results = sorted(parallel.scan_channels(
+                CHANNELS[:2], DATA, 0, FFTLENGTH, nproc=2, resample=2048,
+                correlate=matched, pool=pool), key=lambda x: x[0])
+            assert [r[0] for r in results] == [0, 1]
+            assert [r[2] for r in results] == [True, True]
+            assert hasattr(results[0][1], 'corr') is (matched is not None)
+    finally:
+        pool.close()
+        pool.join()
+    shutil.rmtree(wdir, ignore_errors=True)
+
+
+@mock.patch('gwdetchar.omega.parallel.check_flag')
+@mock.patch('gwdetchar.omega.parallel.get_data', return_value=DATA)
+def test_prefetch_blocks(get_data, check_flag):
+    check_flag.side_effect = lambda flag, *args, **kwargs: flag.endswith('1')
+    blocks = [config.OmegaChannelList(
+        'test{}'.format(i), channels='L1:TEST-STRAIN_{}'.format(i),
+        **dict(CONFIGURATION, **{'state-flag': 'L1:TEST-FLAG:{}'.format(i)}))
+        for i in range(3)]
+    results = list(parallel.prefetch_blocks(
+        blocks, 0, skip=['L1:TEST-STRAIN_2'], ignore_state_flags=False))
+    assert [r[0].key for r in results] == ['test0', 'test1', 'test2']
+    assert [r[1] for r in results] == [False, True, False]
+    assert list(results[1][2].keys()) == ['L1:TEST-STRAIN_1']
+    assert results[1][2]['L1:TEST-STRAIN_1'].span == (-17, 17)
+    get_data.assert_called_once_with(
+        ['L1:TEST-STRAIN_1'], -17, 17, frametype=None, source=None,
+        nproc=1)
+    # skip checkpointed channels and ignore state flags
+    get_data.reset_mock()
+    results = list(parallel.prefetch_blocks(
+        blocks, 0, ahead=2, skip=['L1:TEST-STRAIN_2'],
+        ignore_state_flags=True))
+    assert [r[1] for r in results] == [True, True, True]
+    assert results[2][2] is None
+    get_data.assert_called_once_with(
+        ['L1:TEST-STRAIN_0', 'L1:TEST-STRAIN_1'], -17, 17,
+        frametype=None, source=None, nproc=1)
+
+
+def test_plan_reads():
+    blocks = [config.OmegaChannelList(
+        'test{}'.format(i), channels='L1:TEST-STRAIN_{}'.format(i),
+        frametype=frametype, **CONFIGURATION)
+        for (i, frametype) in enumerate(
+            ('L1_R', 'L1_R', 'L1_HOFT_C00', 'L1_R', 'L1_R', 'L1_R'))]
+    blocks[5].duration = 128
+    # only consecutive blocks are merged, and in order
+    groups = parallel.plan_reads(blocks)
+    assert [[b.key for b in group] for group in groups] == [
+        ['test0', 'test1'], ['test2'], ['test3', 'test4', 'test5']]
+    # merged reads stay within budget
+    groups = parallel.plan_reads(blocks, budget=128)
+    assert [[b.key for b in group] for group in groups] == [
+        ['test0', 'test1'], ['test2'], ['test3', 'test4'], ['test5']]
+
+
+def test_quicklook_order():
+    blocks = [config.OmegaChannelList(
+        key, channels=channel, **dict(CONFIGURATION, **params))
+        for (key, channel, params) in (
+            ('AUX', 'L1:TEST-AUX', {}),
+            ('CAL', 'L1:TEST-CAL', {'parent': 'GW'}),
+            ('GW', 'L1:TEST-STRAIN', {}),
+            ('PRIMARY', 'L1:TEST-PRIMARY', {}),
+        )]
+    assert [b.key for b in parallel.quicklook_order(blocks)] == [
+        'CAL', 'GW', 'AUX', 'PRIMARY']
+    assert [b.key for b in parallel.quicklook_order(
+        blocks, primary='L1:TEST-PRIMARY')] == [
+        'PRIMARY', 'CAL', 'GW', 'AUX']
@@ -23,6 +23,8 @@ import os
 import shutil
 import tempfile
 
+from multiprocessing import Pool
+
 import numpy
 from scipy import signal
 
@@ -86,5 +88,58 @@ def test_write_qscan_plots(tmpdir):
     tmpdir.mkdir('plots')
     wdir = str(tmpdir)
     os.chdir(wdir)
-    plot.write_qscan_plots(gps=0, channel=CHANNEL, series=SERIES)
+    renders = plot.write_qscan_plots(gps=0, channel=CHANNEL, series=SERIES)
+    assert renders == []
+    shutil.rmtree(wdir, ignore_errors=True)
+
+
+def test_qscan_plot_jobs():
+    jobs = plot.qscan_plot_jobs(gps=0, channel=CHANNEL, series=SERIES)
+    assert len(jobs) == 9 * len(CHANNEL.pranges)
+    outputs = [str(args[-1]) for (_, args, _) in jobs]
+    for key in CHANNEL.plots:
+        for png in CHANNEL.plots[key]:
+            assert str(png) in outputs
+
+
+def test_qscan_plot_jobs_plottypes():
+    jobs = plot.qscan_plot_jobs(gps=0, channel=CHANNEL, series=SERIES,
+                                plottypes=['qscan_whitened'])
+    assert len(jobs) == len(CHANNEL.pranges)
+    assert [str(args[-1]) for (_, args, _) in jobs] == [
+        str(png) for png in CHANNEL.plots['qscan_whitened']]
+
+
+def test_write_qscan_plots_pool(tmpdir):
+    tmpdir.mkdir('plots')
+    wdir = str(tmpdir)
+    os.chdir(wdir)
+    pool = Pool(processes=2)
+    try:
+        renders = plot.write_qscan_plots(
+            gps=0, channel=CHANNEL, series=SERIES, pool=pool)
+        for result in renders:
+            result.get()
+    finally:
+        pool.close()
+        pool.join()
+    assert len(renders) == 9 * len(CHANNEL.pranges)
+    for key in CHANNEL.plots:
+        for png in CHANNEL.plots[key]:
+            assert os.path.isfile(str(png))
+    shutil.rmtree(wdir, ignore_errors=True)
+
+
+def test_render_qscan_plots(tmpdir):
+    tmpdir.mkdir('plots')
+    wdir = str(tmpdir)
+    os.chdir(wdir)
+    jobs = plot.qscan_plot_jobs(gps=0, channel=CHANNEL, series=SERIES,
+                                copy=True)
+    assert not numpy.shares_memory(jobs[0][1][0].value, SERIES[5].value)
+    assert plot.render_qscan_plots(jobs) == []
+    assert jobs == []
+    for key in CHANNEL.plots:
+        for png in CHANNEL.plots[key]:
+            assert os.path.isfile(str(png))
     shutil.rmtree(wdir, ignore_errors=True)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) Alex Urban (2019)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gwdetchar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for `gwdetchar.omega.service`
+"""
+
+import json
+import os
+import shutil
+import tracemalloc
+
+from gwpy.testing.compat import mock
+
+from .. import service
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+
+# a stand-in for a pool of worker processes
+POOL = mock.Mock()
+
+
+def _scan(args, pools=None):
+    """A stand-in for `gwdetchar-omega`, which writes its arguments to the
+    output directory, using (or starting) a single pool of workers
+    """
+    outdir = args[args.index('--output-directory') + 1]
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+    os.chdir(outdir)
+    pool = pools.setdefault(2, POOL)
+    with open('argv.json', 'w') as f:
+        json.dump({'argv': args, 'pool': id(pool)}, f)
+    if args[0] == '0':  # fail while tracing memory
+        tracemalloc.start()
+        raise SystemExit(1)
+
+
+# -- unit tests ---------------------------------------------------------------
+
+def test_submit(tmpdir):
+    queue = str(tmpdir)
+    os.chdir(queue)
+    path = service.submit(queue, 1126259462.4, flags=['--ifo', 'L1'],
+                          outdir='test')
+    assert os.path.dirname(path) == os.path.join(queue, 'new')
+    with open(path, 'r') as f:
+        request = json.load(f)
+    assert request['argv'] == [
+        '1126259462.4', '--ifo', 'L1',
+        '--output-directory', os.path.abspath('test')]
+    # nothing is left behind in any directory other than `new`
+    assert sorted(os.listdir(queue)) == sorted(service.QUEUE_DIRS)
+    assert os.listdir(os.path.join(queue, 'active')) == []
+    shutil.rmtree(queue, ignore_errors=True)
+
+
+def test_serve(tmpdir):
+    queue = str(tmpdir.mkdir('queue'))
+    outdir = str(tmpdir.join('out'))
+    os.chdir(str(tmpdir))
+    cwd = os.getcwd()
+    for gps in (1, 0):
+        service.submit(queue, gps, outdir=os.path.join(outdir, str(gps)))
+    assert service.serve(queue, once=True, target=_scan) == 2
+    # working directory is restored
+    assert os.getcwd() == cwd
+    assert not tracemalloc.is_tracing()
+    # successful and failed requests are sorted
+    assert len(os.listdir(os.path.join(queue, 'done'))) == 1
+    assert len(os.listdir(os.path.join(queue, 'failed'))) == 1
+    assert os.listdir(os.path.join(queue, 'new')) == []
+    # both requests are given the same pool of workers
+    results = []
+    for gps in (1, 0):
+        with open(os.path.join(outdir, str(gps), 'argv.json'), 'r') as f:
+            results.append(json.load(f))
+    assert results[0]['argv'][0] == '1'
+    assert results[0]['pool'] == results[1]['pool']
+    # and the pool is closed only once the service stops
+    POOL.close.assert_called_once_with()
+    POOL.join.assert_called_once_with()
+    shutil.rmtree(str(tmpdir), ignore_errors=True)
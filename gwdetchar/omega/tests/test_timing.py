@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) Alex Urban (2019)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gwdetchar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for `gwdetchar.omega.timing`
+"""
+
+import json
+import shutil
+import time
+import tracemalloc
+
+import numpy
+import pytest
+
+from .. import timing
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+
+
+# -- unit tests ---------------------------------------------------------------
+
+@pytest.mark.skipif(not timing.TRACE_MEMORY,
+                    reason='tracemalloc cannot reset its peak')
+def test_timer_peak():
+    timer = timing.Timer(memory=True)
+    assert tracemalloc.is_tracing()
+    with timer.stage('outer'):
+        with timer.stage('inner'):
+            data = numpy.ones(2**20)  # 8 MiB
+        del data
+        with timer.stage('empty'):
+            pass
+    timer.stop()
+    assert not tracemalloc.is_tracing()
+    (inner, empty, outer) = timer.records
+    assert inner['peak'] >= 8 * 2**20
+    assert empty['peak'] < 2**20
+    assert outer['peak'] >= inner['peak']
+    assert timer.summary()['inner']['peak'] == inner['peak']
+
+
+@pytest.mark.skipif(timing.resource is None,
+                    reason='cannot measure resident memory')
+def test_timer_rss():
+    timer = timing.Timer()
+    with timer.stage('allocate'):
+        # 128 MiB beyond any earlier peak
+        data = numpy.ones((timing.maxrss() + 2**27) // 8)
+    del data
+    with timer.stage('empty'):
+        pass
+    (allocate, empty) = timer.records
+    assert allocate['rss'] >= 2**27
+    assert empty['rss'] == 0
+    assert timer.summary()['allocate']['rss'] == allocate['rss']
+
+
+def test_timer():
+    timer = timing.Timer()
+    assert not tracemalloc.is_tracing()
+    with timer.stage('get_data', block='test'):
+        time.sleep(.01)
+    with pytest.raises(ValueError):
+        with timer.stage('q_scan', channel='X1:TEST'):
+            raise ValueError('test')
+    assert [r['stage'] for r in timer.records] == ['get_data', 'q_scan']
+    assert timer.records[0]['wall'] >= .01
+    assert timer.records[0]['block'] == 'test'
+    assert timer.records[1]['channel'] == 'X1:TEST'
+    # records from another timer
+    other = timing.Timer()
+    with other.stage('q_scan', channel='X1:TEST-2'):
+        pass
+    timer.extend(other.records, block='test')
+    assert timer.records[-1]['block'] == 'test'
+    assert 'block' not in other.records[0]
+    summary = timer.summary()
+    assert list(summary) == ['get_data', 'q_scan']
+    assert summary['q_scan']['count'] == 2
+    assert summary['get_data']['wall'] == timer.records[0]['wall']
+    assert summary['get_data']['peak'] is None
+
+
+def test_null_timer():
+    timer = timing.NullTimer()
+    with timer.stage('q_scan', channel='X1:TEST'):
+        pass
+    assert not timer.records
+
+
+def test_timer_write(tmpdir):
+    path = str(tmpdir.join('timing.json'))
+    timer = timing.Timer()
+    with timer.stage('html'):
+        pass
+    timer.write(path, gps=0)
+    with open(path, 'r') as f:
+        out = json.load(f)
+    assert list(out) == ['gps', 'summary', 'records']
+    assert out['summary']['html']['count'] == 1
+    assert out['records'][0]['stage'] == 'html'
+    shutil.rmtree(str(tmpdir), ignore_errors=True)
@@ -0,0 +1,263 @@
+# coding=utf-8
+# Copyright (C) Alex Urban (2019)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with GW DetChar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Per-stage timing and resource usage of omega scans
+"""
+
+import json
+import sys
+import threading
+import time
+import tracemalloc
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not POSIX
+    resource = None
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+
+# CPU time of the calling thread, where available (python 3.7+)
+thread_time = getattr(time, 'thread_time', time.process_time)
+
+# per-stage peak memory needs tracemalloc.reset_peak (python 3.9+)
+TRACE_MEMORY = hasattr(tracemalloc, 'reset_peak')
+
+# units (bytes) of `resource.getrusage` ``ru_maxrss``
+_MAXRSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+# [start, peak] traced memory of every `trace_memory` context in progress
+_OPEN = []
+_LOCK = threading.Lock()
+
+
+# -- utilities ----------------------------------------------------------------
+
+def maxrss():
+    """Return the peak resident set size (bytes) of this process so far
+
+    Returns
+    -------
+    maxrss : `int` or `None`
+        the high-water mark of resident memory, or `None` if it cannot be
+        measured on this platform
+    """
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT
+
+
+def _update_open():
+    """Record the traced memory peak since the last reset in all open contexts
+    """
+    peak = tracemalloc.get_traced_memory()[1]
+    for frame in _OPEN:
+        frame[1] = max(frame[1], peak)
+
+
+@contextmanager
+def trace_memory():
+    """Context manager to record the peak memory allocated within it
+
+    Yields
+    ------
+    result : `dict`
+        a `dict` whose ``'peak'`` is set on exit to the largest increase
+        (bytes) in memory traced by `tracemalloc` within this context, or
+        `None` if `tracemalloc` is not tracing, or cannot reset its peak
+
+    Notes
+    -----
+    Contexts may be nested, or run concurrently in many threads, but
+    since `tracemalloc` traces the whole process each includes memory
+    allocated by other threads while it runs.
+    """
+    result = {'peak': None}
+    if not (TRACE_MEMORY and tracemalloc.is_tracing()):
+        yield result
+        return
+    with _LOCK:
+        _update_open()
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        frame = [current, current]
+        _OPEN.append(frame)
+    try:
+        yield result
+    finally:
+        with _LOCK:
+            if tracemalloc.is_tracing():
+                _update_open()
+            _OPEN.remove(frame)
+        result['peak'] = frame[1] - frame[0]
+
+
+class Timer(object):
+    """Record the wall time, CPU time, and peak memory of named stages
+
+    Each record is a `dict` with keys ``'stage'``, ``'wall'`` and ``'cpu'``
+    (seconds), ``'rss'`` and ``'peak'`` (bytes), and any labels given to
+    `Timer.stage`, e.g. ``'channel'`` or ``'block'``.
+
+    Notes
+    -----
+    The ``'cpu'`` time is that of the thread running the stage, using
+    `time.thread_time` (or `time.process_time`, for all threads, before
+    python 3.7), so it excludes any work done in other threads, e.g. by
+    a multi-threaded FFT.
+
+    The ``'rss'`` is the growth of the peak resident set size of the process
+    during the stage (see `maxrss`), which is zero unless the stage took
+    the process to a new high-water mark. It is recorded on every POSIX
+    platform, at negligible cost, and covers all memory, including that
+    allocated outside python (e.g. by FFT libraries) or by other threads.
+
+    The ``'peak'`` memory is the largest increase in the python heap
+    (including `numpy` arrays) during the stage, see `trace_memory`.
+    It is recorded only while `tracemalloc` is tracing, e.g. if this `Timer`
+    was created with ``memory=True``, and is otherwise `None`, as it is
+    before python 3.9, which cannot reset the traced peak. Since tracing
+    slows down every allocation, call `Timer.stop` once done.
+
+    Parameters
+    ----------
+    memory : `bool`, optional
+        whether to start `tracemalloc`, if not already tracing, so that the
+        peak memory of each stage is recorded, default: `False`
+
+    Examples
+    --------
+    >>> timer = Timer()
+    >>> with timer.stage('q_scan', channel='L1:GDS-CALIB_STRAIN'):
+    ...     qgram, far = q_scan(data)
+    >>> timer.summary()['q_scan']['count']
+    1
+    """
+    def __init__(self, memory=False):
+        self.records = []
+        self._tracing = (memory and TRACE_MEMORY and
+                         not tracemalloc.is_tracing())
+        if self._tracing:
+            tracemalloc.start()
+
+    def stop(self):
+        """Stop tracing memory, if `tracemalloc` was started by this `Timer`
+        """
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    @contextmanager
+    def stage(self, name, **labels):
+        """Context manager to record a stage
+
+        Parameters
+        ----------
+        name : `str`
+            the name of this stage
+
+        **labels
+            any other (JSON-serialisable) labels to record
+        """
+        wall = time.time()
+        cpu = thread_time()
+        rss = maxrss()
+        try:
+            with trace_memory() as memory:
+                yield
+        finally:
+            record = OrderedDict([
+                ('stage', name),
+                ('wall', time.time() - wall),
+                ('cpu', thread_time() - cpu),
+                ('rss', None if rss is None else maxrss() - rss),
+                ('peak', memory['peak']),
+            ])
+            record.update(labels)
+            self.records.append(record)
+
+    def extend(self, records, **labels):
+        """Append records from another `Timer`, adding labels to each
+
+        Parameters
+        ----------
+        records : `list` of `dict`
+            the records of another `Timer`, e.g. from a worker process
+
+        **labels
+            labels to add to each record
+        """
+        for record in records:
+            record = OrderedDict(record)
+            record.update(labels)
+            self.records.append(record)
+
+    def summary(self):
+        """Summarise records by stage, in order of first appearance
+
+        Returns
+        -------
+        summary : `collections.OrderedDict`
+            for each stage, a `dict` with the number of records
+            (``'count'``), the total ``'wall'`` and ``'cpu'`` time, and the
+            maximum ``'rss'`` and ``'peak'`` memory (each `None` if not
+            recorded)
+        """
+        out = OrderedDict()
+        for record in self.records:
+            stage = out.setdefault(record['stage'], OrderedDict([
+                ('count', 0), ('wall', 0.), ('cpu', 0.), ('rss', None),
+                ('peak', None)]))
+            stage['count'] += 1
+            stage['wall'] += record['wall']
+            stage['cpu'] += record['cpu']
+            for key in ('rss', 'peak'):
+                if record.get(key) is not None:
+                    stage[key] = max(stage[key] or 0, record[key])
+        return out
+
+    def write(self, path, **metadata):
+        """Write a summary and all records to a JSON file
+
+        Parameters
+        ----------
+        path : `str`
+            the output file path, e.g. ``'data/timing.json'``
+
+        **metadata
+            any other (JSON-serialisable) information to record, e.g. the
+            GPS time of the scan
+        """
+        out = OrderedDict(metadata)
+        out['summary'] = self.summary()
+        out['records'] = list(self.records)
+        with open(path, 'w') as f:
+            json.dump(out, f, indent=2)
+
+
+class NullTimer(Timer):
+    """A `Timer` that records nothing
+
+    This is used wherever a `Timer` is optional and none was given.
+    """
+    @contextmanager
+    def stage(self, name, **labels):
+        yield
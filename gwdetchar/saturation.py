@@ -131,7 +131,7 @@ def find_limit_channels(channels, skip=None):
         useful = sorted(x for x in channels if re_software.search(x))
 
     # map limits to limen or swstat
-    limits = sorted(x[:-6] for x in useful if re_limit.search(x))
+    limits = set(x[:-6] for x in useful if re_limit.search(x))
     limens = sorted(x[:-6] for x in useful if re_limen.search(x)
                     and x[:-6] in limits)
     swstats = sorted(x[:-7] for x in useful if re_swstat.search(x)
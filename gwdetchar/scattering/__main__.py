@@ -120,9 +120,9 @@ def main(args=None):
     # set up spectrogram
     logger.debug('Setting up a Q-scan spectrogram of {}'.format(primary))
     hoft = get_data(primary, start=gps-34, end=gps+34,
-                    frametype=args.primary_frametype,
+                    frametype=args.primary_frametype, resample=256,
                     verbose='Reading primary channel:'.rjust(30))
-    hoft = highpass(hoft, f_low=thresh).resample(256)
+    hoft = highpass(hoft, f_low=thresh)
     qspecgram = hoft.q_transform(qrange=(4, 150), frange=(0, 60), gps=gps,
                                  fres=0.1, outseg=(gpsstart, gpsend), **ASD_KW)
     qspecgram.name = primary
@@ -131,12 +131,12 @@ def main(args=None):
     channels = [':'.join([ifo, c]) for c in MOTION_CHANNELS]
     data = get_data(
         channels, start=gpsstart, end=gpsend, frametype=args.aux_frametype,
-        verbose='Reading auxiliary sensors:'.rjust(30))
+        resample=128, verbose='Reading auxiliary sensors:'.rjust(30))
     count = 0  # running count of plots written
     for channel in channels:
         logger.info(' -- Processing {} -- '.format(channel))
         try:
-            motion = data[channel].detrend().resample(128)
+            motion = data[channel].detrend()
         except KeyError:
             logger.warning('Skipping {}'.format(channel))
             pass
@@ -34,6 +34,7 @@ from gwpy.segments import (Segment, SegmentList)
 from gwpy.testing.utils import assert_segmentlist_equal
 
 from .. import daq
+from ..io.toc import ChannelIndex
 
 OVERFLOW_SERIES = TimeSeries([0, 0, 0, 1, 1, 0, 0, 1, 0, 1], dx=.5)
 CUMULATIVE_SERIES = TimeSeries([0, 0, 0, 1, 2, 2, 2, 3, 3, 4], dx=.5)
@@ -78,10 +79,10 @@ def test_ligo_accum_overflow_channel():
 
 
 @mock.patch('gwdetchar.daq.find_urls')
-@mock.patch('gwdetchar.daq.get_channel_names')
+@mock.patch('gwdetchar.daq.get_channel_index')
 @mock.patch('gwdetchar.daq._ligo_model_overflow_channels_nds')
-def test_ligo_model_overflow_channels(nds, get_names, find_frames):
-    get_names.return_value = CHANNELS
+def test_ligo_model_overflow_channels(nds, get_index, find_frames):
+    get_index.return_value = ChannelIndex(CHANNELS)
 
     names = daq.ligo_model_overflow_channels(1, ifo='X1', accum=True)
     assert names == CHANNELS[1:5]
@@ -23,11 +23,14 @@ import pytest
 
 import numpy
 
+from collections import OrderedDict
+
 from gwpy.segments import (
     DataQualityFlag,
     DataQualityDict,
 )
 from gwpy.table import EventTable
+from gwpy.testing.compat import mock
 from gwpy.testing.utils import assert_table_equal
 
 from .. import utils
@@ -43,6 +46,19 @@ def test_natural_sort(in_, out):
     assert utils.natural_sort(in_) == out
 
 
+def test_lru_cached():
+    cache = OrderedDict()
+    build = mock.Mock(side_effect=lambda: object())
+    first = utils.lru_cached(cache, 2, 'a', build)
+    assert utils.lru_cached(cache, 2, 'a', build) is first
+    assert build.call_count == 1
+    utils.lru_cached(cache, 2, 'b', build)
+    utils.lru_cached(cache, 2, 'a', build)  # most recently used
+    utils.lru_cached(cache, 2, 'c', build)
+    assert list(cache) == ['a', 'c']
+    assert cache['a'] is first
+
+
 def test_table_from_segments():
     segs = DataQualityDict()
     segs["test1"] = DataQualityFlag(
@@ -58,6 +58,40 @@ parser = GWHTMLParser()
 
 # -- utilities ----------------------------------------------------------------
 
+def lru_cached(cache, size, key, build):
+    """Retrieve an item from a least-recently-used cache, building it if
+    needed
+
+    Parameters
+    ----------
+    cache : `collections.OrderedDict`
+        the cache, ordered from least to most recently used
+
+    size : `int`
+        the maximum number of items to hold in `cache`
+
+    key : `object`
+        the (hashable) key of this item
+
+    build : `callable`
+        function of no arguments to build the item, if it is not in `cache`
+
+    Returns
+    -------
+    item : `object`
+        the cached item, which is moved to the end of `cache`; once full,
+        the least recently used item is evicted
+    """
+    try:  # move to the end of the cache
+        item = cache.pop(key)
+    except KeyError:
+        item = build()
+        while cache and len(cache) >= size:
+            cache.popitem(last=False)
+    cache[key] = item
+    return item
+
+
 def parse_html(html):
     """Parse a string containing raw HTML code
     """
@@ -56,6 +56,7 @@ install_requires = [
     'gwdatafind',
     'gwpy>=0.13.0',
     'gwtrigfind',
+    'h5py',
     'MarkupPy>=1.14',
     'matplotlib>=2.0.0',
     'numpy>=1.10',
@@ -79,7 +80,7 @@ tests_require = [
 
 # -- run setup ----------------------------------------------------------------
 
-packagenames = find_packages()
+packagenames = find_packages(exclude=['benchmarks'])
 scripts = glob.glob(os.path.join('bin', '*'))
 
 # read description